@@ -0,0 +1,225 @@
+import argparse
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+from datetime import datetime
+sys.path.insert(0, os.getcwd()) #adding current directory to pythonpath
+from Benchmarks.synthetic_sales import write_sales
+from Scripts.ETL import ETL
+from Scripts.Profiler import profiler
+from Scripts.calculate_kpi import compute_kpis
+from Scripts.calculate_kpi import get_revenues_sum
+from Scripts.calculate_kpi import get_top_n_customers
+from Scripts.calculate_kpi import orders_per_month
+
+engines = ['arrow', 'stream', 'pandas']
+schemas = ['starschema', 'snowflakeschema', 'widetable']
+
+star_arguments = {'xlsx_sheet_name': 'Sales',
+                  'dimension_features_without_dimension_name_substring': {'PRODUCT': ['UNITPRICE'],
+                                                                          'CUSTOMER': [],
+                                                                          'ORDER':[]},
+                  'fact_table_columns_containing_dimension_name': ['ORDERPRIORITY', 'ORDERQUANTITY']}
+
+kpi_scenarios = {'monthly_revenue': lambda df: get_revenues_sum(df, variable = 'month'),
+                 'customer_segment_revenue': lambda df: get_revenues_sum(df, variable = 'customer segment'),
+                 'monthly_orders': lambda df: orders_per_month(df, aggregate_function = 'sum'),
+                 'monthly_average_order_volume': lambda df: orders_per_month(df, aggregate_function = 'average order volume'),
+                 'top_customers_by_revenue': lambda df: get_top_n_customers(df, sort_column = 'life time revenue'),
+                 'top_customers_by_order_volume': lambda df: get_top_n_customers(df, sort_column = 'life time order volume'),
+                 'compute_kpis': compute_kpis}
+
+def measure(name:str, rows:int, function, trace_memory:bool)->tuple:
+    """
+    Runs the function as profiler stage and returns its result and the
+    measurements of the stage.
+
+    Args:
+        name:str -> name of the scenario
+        rows:int -> number of generated rows
+        function -> function without arguments to measure
+        trace_memory:bool -> decides wheather to trace the python allocations
+    """
+    try:
+        profiler.start(trace_memory)
+        with profiler.stage(name, rows) as record:
+            result = function()
+    finally:
+        profiler.stop()
+
+    measurement = {key:record.get(key) for key in ['name', 'rows', 'wall_time', 'cpu_time', 'peak_rss',
+                                                   'peak_rss_delta', 'traced_memory_peak']}
+    measurement['stages'] = profiler.report()['totals']
+    print('{:>12} rows {:<32} {:9.3f}s wall {:9.3f}s cpu'.format(rows, name, record['wall_time'], record['cpu_time']))
+    return result, measurement
+
+def run_scenarios(rows:int,
+                  directory:str,
+                  seed:int = 0,
+                  engine:str = 'arrow',
+                  chunksize:int = 1000000,
+                  trace_memory:bool = False,
+                  schema:str = 'starschema')->list:
+    """
+    Generates a synthetic sales table of the given size and measures the
+    ingest, transform, merge and KPI scenarios on it. Returns the
+    measurements of the scenarios, the snowflake schema has no
+    merge_in_chunks scenario.
+
+    Args:
+        rows:int -> number of generated rows
+        directory:str -> directory of the generated and transformed tables
+        seed:int -> seed of the generator
+        engine:str -> 'arrow' reads a csv file with the arrow engine, 'stream'
+                      streams the csv file in chunks, 'pandas' reads an xlsx
+                      file (at most 1048575 rows)
+        chunksize:int -> rows per chunk of the stream engine and iter_merged_table
+        trace_memory:bool -> decides wheather to trace the python allocations
+        schema:str -> any of ['starschema', 'snowflakeschema', 'widetable']
+    """
+    if engine not in engines:
+        raise ValueError('Invalid engine provided: {}'.format(engine))
+    if schema not in schemas:
+        raise ValueError('Invalid schema provided: {}'.format(schema))
+
+    path = os.path.join(directory, 'sales_{}.{}'.format(rows, 'xlsx' if engine == 'pandas' else 'csv'))
+    write_sales(path, rows, seed)
+
+    arguments = dict(star_arguments, dataframe_xlsx_path = path)
+    if schema == 'widetable':
+        arguments = {key:arguments[key] for key in ['dataframe_xlsx_path', 'xlsx_sheet_name']}
+    if engine == 'arrow':
+        arguments['engine'] = 'arrow'
+    elif engine == 'stream':
+        arguments['chunksize'] = chunksize
+
+    etl = ETL(schema)
+    measurements = []
+
+    _, measurement = measure('ingest', rows, lambda: etl.init_params(**arguments), trace_memory)
+    measurements.append(measurement)
+
+    _, measurement = measure('transform', rows, lambda: etl.transform_table(directory, verbose = False), trace_memory)
+    measurements.append(measurement)
+
+    merged_df, measurement = measure('merge', rows, lambda: etl.get_merged_table(verbose = False), trace_memory)
+    measurements.append(measurement)
+
+    if schema != 'snowflakeschema':
+        _, measurement = measure('merge_in_chunks', rows,
+                                 lambda: sum(len(chunk) for chunk in etl.iter_merged_table(verbose = False, chunksize = chunksize)),
+                                 trace_memory)
+        measurements.append(measurement)
+
+    for name, function in kpi_scenarios.items():
+        _, measurement = measure(name, rows, lambda: function(merged_df), trace_memory)
+        measurements.append(measurement)
+
+    return measurements
+
+def compare_results(results:dict, baseline:dict, tolerance:float, min_seconds:float)->list:
+    """
+    Returns the scenarios whose wall time exceeds the wall time of the
+    same scenario and size in the baseline by more than the tolerance
+    and by more than min_seconds. Both have to be measured with the same 
+    engine and schema.
+
+    Args:
+        results:dict -> results of run_benchmarks()
+        baseline:dict -> saved results to compare to
+        tolerance:float -> allowed relative slow down (i.e. 0.25)
+        min_seconds:float -> slow downs below are treated as noise
+    """
+    if results['engine'] != baseline['engine']:
+        raise ValueError('The baseline was measured with the {} engine!'.format(baseline['engine']))
+    if results.get('schema', 'starschema') != baseline.get('schema', 'starschema'):
+        raise ValueError('The baseline was measured with the {} schema!'.format(baseline.get('schema', 'starschema')))
+
+    baseline_times = {(item['rows'], item['name']):item['wall_time'] for item in baseline['results']}
+    regressions = []
+
+    for item in results['results']:
+        baseline_time = baseline_times.get((item['rows'], item['name']))
+        if baseline_time is None:
+            continue
+        if item['wall_time'] > baseline_time * (1 + tolerance) and item['wall_time'] - baseline_time > min_seconds:
+            regressions.append({'rows': item['rows'], 'name': item['name'],
+                                'baseline_wall_time': baseline_time, 'wall_time': item['wall_time']})
+    return regressions
+
+def run_benchmarks(sizes:list,
+                   seed:int = 0,
+                   engine:str = 'arrow',
+                   chunksize:int = 1000000,
+                   trace_memory:bool = False,
+                   directory:str = None,
+                   schema:str = 'starschema')->dict:
+    """
+    Runs the scenarios for every size and returns the results as JSON
+    serializable dictionary.
+
+    Args:
+        sizes:list -> numbers of generated rows
+        seed:int -> seed of the generator
+        engine:str -> any of ['arrow', 'stream', 'pandas'], see run_scenarios()
+        chunksize:int -> rows per chunk of the stream engine and iter_merged_table
+        trace_memory:bool -> decides wheather to trace the python allocations
+        directory:str -> working directory, a removed temporary directory if None
+        schema:str -> layout of the saved tables, see run_scenarios()
+    """
+    results = {'created': datetime.now().isoformat(timespec='seconds'),
+               'python': platform.python_version(),
+               'platform': platform.platform(),
+               'cpus': os.cpu_count(),
+               'seed': seed,
+               'engine': engine,
+               'schema': schema,
+               'chunksize': chunksize,
+               'trace_memory': trace_memory,
+               'results': []}
+
+    for rows in sizes:
+        working_directory = directory or tempfile.mkdtemp(prefix='benchmark_')
+        try:
+            results['results'].extend(run_scenarios(rows, working_directory, seed, engine, chunksize, trace_memory, schema))
+        finally:
+            if directory is None:
+                shutil.rmtree(working_directory, ignore_errors=True)
+
+    return results
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description='Benchmarks the ETL and the KPIs on synthetic sales tables.')
+    parser.add_argument('--rows', type=int, nargs='+', default=[10000, 100000],
+                        help='numbers of generated rows, i.e. 10000 100000 1000000')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--engine', choices=engines, default='arrow')
+    parser.add_argument('--schema', choices=schemas, default='starschema', help='layout of the saved tables')
+    parser.add_argument('--chunksize', type=int, default=1000000)
+    parser.add_argument('--trace-memory', action='store_true', help='trace the python allocations (slower)')
+    parser.add_argument('--directory', help='keep the generated and transformed tables in this directory')
+    parser.add_argument('--output', default='benchmark_results.json', help='path of the results')
+    parser.add_argument('--baseline', help='results to compare to, i.e. Benchmarks/baseline.json')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed relative slow down')
+    parser.add_argument('--min-seconds', type=float, default=0.05, help='slow downs below are ignored')
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.rows, args.seed, args.engine, args.chunksize, args.trace_memory, args.directory, args.schema)
+
+    with open(args.output, 'w') as file:
+        json.dump(results, file, indent=2)
+    print('Results saved:{}'.format(args.output))
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            regressions = compare_results(results, json.load(file), args.tolerance, args.min_seconds)
+
+        for regression in regressions:
+            print('Regression: {} rows {} {:.3f}s -> {:.3f}s'.format(regression['rows'], regression['name'],
+                                                                     regression['baseline_wall_time'],
+                                                                     regression['wall_time']))
+        sys.exit(1 if regressions else 0)
@@ -0,0 +1,199 @@
+import numpy as np
+import os
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+from typing import Iterator
+
+# cardinalities of the Sales sheet of sales.xlsx (18782 rows)
+sales_rows = 18782
+sales_products = 120
+sales_customers = 999
+rows_per_order = 18782 / 17919
+
+block_rows = 1000000
+
+order_priorities = ['Medium', 'Low', 'Very Low', 'High', 'Critical', 'Same Day']
+order_priority_weights = [4900, 3266, 3266, 2450, 2450, 2450]
+customer_segments = ['Consumer', 'Home Office', 'Small Business', 'Corporate']
+customer_segment_weights = [12370, 2494, 2435, 1483]
+customer_regions = ['Nunavut', 'Northwest Territories', 'Atlantic', 'Prarie', 'West', 'Ontario', 'Quebec', 'Yukon']
+box_costs = {'Jumbo Box': 2.96, 'Jumbo Drum': 5.42, 'Large Box': 1.48, 'Medium Box': 1.18,
+             'Small Box': 0.56, 'Small Pack': 0.38, 'Wrap Bag': 0.34}
+discounts = [0.0, 0.01, 0.02, 0.03, 0.04, 0.05, 0.06, 0.07, 0.08, 0.09, 0.1, 0.11, 0.16, 0.17, 0.21, 0.25]
+
+def get_cardinalities(rows:int)->dict:
+    """
+    Returns the number of products, customers and orders of a synthetic
+    table with the given number of rows. Products are a fixed catalog,
+    customers and orders grow with the rows like in the Sales sheet.
+
+    Args:
+        rows:int -> number of rows
+    """
+    return {'products': sales_products,
+            'customers': max(1, int(round(rows * sales_customers / sales_rows))),
+            'orders': max(1, int(np.ceil(rows / rows_per_order)))}
+
+def generate_products(seed:int)->pd.core.frame.DataFrame:
+    """
+    Returns the product catalog, one row per product holding the columns
+    which depend on the product only.
+
+    Args:
+        seed:int -> seed of the random generator
+    """
+    rng = np.random.default_rng([seed, 0])
+    box_sizes = np.array(list(box_costs.keys()), dtype=object)
+    products = np.arange(sales_products)
+
+    return pd.DataFrame({'Product ID': ['PFS{}'.format(127009 + product) for product in products],
+                         'Product name': ['Product {}'.format(product) for product in products],
+                         'Unit Price': np.round(rng.lognormal(3.2, 0.9, sales_products), 2),
+                         'Box Size': box_sizes[rng.integers(0, len(box_sizes), sales_products)],
+                         'Product Category': ['Category {}'.format(category) for category in rng.integers(0, 20, sales_products)],
+                         'Product Base Margin': np.round(rng.uniform(0.35, 0.95, sales_products), 4)})
+
+def generate_customers(count:int, seed:int)->pd.core.frame.DataFrame:
+    """
+    Returns the customers, one row per customer holding the columns which
+    depend on the customer only.
+
+    Args:
+        count:int -> number of customers
+        seed:int -> seed of the random generator
+    """
+    rng = np.random.default_rng([seed, 1])
+    customers = np.arange(count)
+
+    return pd.DataFrame({'Customer Id': 100922001 + customers,
+                         'Customer Name': np.char.add('Customer ', customers.astype(str)).astype(object),
+                         'Customer Region': np.array(customer_regions, dtype=object)[rng.integers(0, len(customer_regions), count)],
+                         'Customer Segment': np.array(customer_segments, dtype=object)[
+                             rng.choice(len(customer_segments), count, p=np.array(customer_segment_weights)/sum(customer_segment_weights))]})
+
+def generate_block(block:int,
+                   rows:int,
+                   products:pd.core.frame.DataFrame,
+                   customers:pd.core.frame.DataFrame,
+                   seed:int,
+                   start_date:str = '2017-01-01',
+                   days:int = 365)->pd.core.frame.DataFrame:
+    """
+    Returns the rows of the given block. Every block owns its own orders,
+    so order ids never repeat across blocks and the order date stays a
+    function of the order id.
+
+    Args:
+        block:int -> number of the block
+        rows:int -> number of rows of the block
+        products:pd.core.frame.DataFrame -> product catalog
+        customers:pd.core.frame.DataFrame -> customers
+        seed:int -> seed of the random generator
+        start_date:str -> first order date
+        days:int -> number of days the order dates span
+    """
+    rng = np.random.default_rng([seed, 2, block])
+    orders = get_cardinalities(rows)['orders']
+    first_order = 200920 + block * get_cardinalities(block_rows)['orders']
+
+    # every order gets one row, the remaining rows are extra lines of random orders
+    order_rows = np.concatenate([rng.permutation(orders), rng.integers(0, orders, rows - orders)])
+    order_dates = np.datetime64(start_date, 'D') + rng.integers(0, days, orders)
+    product_rows = rng.integers(0, len(products), rows)
+    customer_rows = rng.integers(0, len(customers), rows)
+
+    product = products.iloc[product_rows].reset_index(drop=True)
+    customer = customers.iloc[customer_rows].reset_index(drop=True)
+    quantity = rng.integers(1, 33, rows)
+    discount = np.array(discounts)[rng.integers(0, len(discounts), rows)]
+    shipping_price = np.round(rng.uniform(0.5, 20.25, rows), 2)
+    shipping_cost = np.round(shipping_price * 0.7, 2)
+    box_cost = product['Box Size'].map(box_costs).values
+    total = np.round(quantity * product['Unit Price'].values, 2)
+    total_after_discount = np.round(total * (1 - discount), 2)
+    order_date = order_dates[order_rows]
+
+    return pd.DataFrame({'Product ID': product['Product ID'],
+                         'Order ID': first_order + order_rows,
+                         'Order Date': order_date.astype('datetime64[ns]'),
+                         'Product name': product['Product name'],
+                         'Order Priority': np.array(order_priorities, dtype=object)[
+                             rng.choice(len(order_priorities), rows, p=np.array(order_priority_weights)/sum(order_priority_weights))],
+                         'Order Quantity': quantity,
+                         'Unit Price': product['Unit Price'],
+                         'Discount': discount,
+                         'Shipping Price': shipping_price,
+                         'Total': total,
+                         'Total After Discount': total_after_discount,
+                         'Box Size': product['Box Size'],
+                         'Shipping Cost': shipping_cost,
+                         'Box Cost': box_cost,
+                         'Delivery Date': (order_date + rng.integers(1, 11, rows)).astype('datetime64[ns]'),
+                         'Product Category': product['Product Category'],
+                         'Product Base Margin': product['Product Base Margin'],
+                         'Customer Id': customer['Customer Id'],
+                         'Customer Name': customer['Customer Name'],
+                         'Customer Region': customer['Customer Region'],
+                         'Customer Segment': customer['Customer Segment'],
+                         'Revenue': np.round(total_after_discount * product['Product Base Margin'].values
+                                             - shipping_cost - box_cost, 2)})
+
+def iter_sales(rows:int, seed:int = 0)->Iterator[pd.core.frame.DataFrame]:
+    """
+    Yields a synthetic table with the columns of the Sales sheet in blocks
+    of at most block_rows rows. The data only depends on the number of rows
+    and the seed.
+
+    Args:
+        rows:int -> number of rows
+        seed:int -> seed of the random generator
+    """
+    if rows < 1:
+        raise ValueError('rows must be a positive integer!')
+
+    products = generate_products(seed)
+    customers = generate_customers(get_cardinalities(rows)['customers'], seed)
+
+    for block, first_row in enumerate(range(0, rows, block_rows)):
+        yield generate_block(block, min(block_rows, rows - first_row), products, customers, seed)
+
+def generate_sales(rows:int, seed:int = 0)->pd.core.frame.DataFrame:
+    """
+    Returns a synthetic table with the columns and cardinalities of the
+    Sales sheet, see iter_sales().
+
+    Args:
+        rows:int -> number of rows
+        seed:int -> seed of the random generator
+    """
+    return pd.concat(iter_sales(rows, seed), ignore_index=True)
+
+def write_sales(path:str, rows:int, seed:int = 0)->str:
+    """
+    Writes a synthetic table (see iter_sales) block by block to the given
+    csv or xlsx file and returns the path. Only one block is held in memory
+    for csv files, xlsx files are limited to the rows of an excel sheet.
+
+    Args:
+        path:str -> path of the csv or xlsx file
+        rows:int -> number of rows
+        seed:int -> seed of the random generator
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    if not path.lower().endswith('.csv'):
+        generate_sales(rows, seed).to_excel(path, sheet_name='Sales', index=False)
+        return path
+
+    with open(path, 'wb') as file:
+        for block_number, block in enumerate(iter_sales(rows, seed)):
+            # the csv writer of pyarrow can't format dates, they are written as ISO strings
+            for column in ['Order Date', 'Delivery Date']:
+                block[column] = np.datetime_as_string(block[column].values, unit='D')
+            pa_csv.write_csv(pa.Table.from_pandas(block, preserve_index=False), file,
+                             pa_csv.WriteOptions(include_header=block_number == 0))
+
+    return path
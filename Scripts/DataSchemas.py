@@ -1,28 +1,464 @@
+import glob
+import os
+import numpy as np
 import pandas as pd
+import pyarrow as pa
 from abc import ABC, abstractmethod
+from typing import Iterator
+from Scripts.Profiler import profiler
+from Scripts.utils import append_table_to_parquet
+from Scripts.utils import append_table_to_partitioned_parquet
+from Scripts.utils import convert_date_column
+from Scripts.utils import drop_duplicate_arrow_rows
+from Scripts.utils import get_arrow_categorical_columns
+from Scripts.utils import get_categorical_columns
+from Scripts.utils import get_sources
+from Scripts.utils import hash_rows
+from Scripts.utils import iter_sources
+from Scripts.utils import read_arrow_table
+from Scripts.utils import read_source_columns
+from Scripts.utils import read_table_in_chunks
+from Scripts.utils import read_xlsx
+from Scripts.utils import remove_spaces_and_uppercase_df_columns
+from Scripts.utils import save_arrow_table_as_parquet
+from Scripts.utils import save_tables_as_parquet
 
 class DataSchemas(ABC):
     """
-    A class used to define a common API for a set of schema subclasses
+    A class used to define a common API for a set of schema subclasses. 
+    It holds the execution core the schemas share: loading the sources 
+    (reading, column normalization, categorical typing), iterating them 
+    in batches, and projecting, deduplicating, typing and writing the 
+    saved tables, one method per path (save_tables() for loaded dataframes, 
+    save_arrow_table() for pyarrow tables and append_batch() for streamed 
+    batches).
 
     ...
 
     Attributes
     ----------
     name
+    compact_column_schema
+    column_schema
+    batch_column_types
+    categorical_max_cardinality_ratio
 
     Methods
     -------
+    set_column_schema()
+    pin_batch_column_types()
+    load_source()
+    iter_batches()
+    read_batches()
+    iter_source_batches()
+    get_source_columns()
+    get_ingest_report()
+    get_saved_directory()
+    get_saved_table_files()
+    project_table()
+    drop_duplicate_rows()
+    hash_batch_rows()
+    drop_written_rows()
+    save_tables()
+    save_arrow_table()
+    append_batch()
     init_params()
     transform_table()
     get_transformed_tables()
     merge_tables()
 
     """
+    # money columns (i.e. REVENUE) keep float64, float32 sums drift by cents
+    compact_column_schema = {'ORDERID': 'int32', 'CUSTOMERID': 'int32',
+                             'ORDERQUANTITY': 'int16', 'DISCOUNT': 'float32',
+                             'ORDERDATE': 'date32', 'DELIVERYDATE': 'date32'}
+    column_schema = {}
+    batch_column_types = {}
+    categorical_max_cardinality_ratio = 0.01
+
     @property
     def name(self):
         raise NotImplementedError
 
+    def set_column_schema(self, column_schema:dict)->None:
+        """
+        Declares the storage types of the saved columns (i.e. 
+        {'ORDERQUANTITY':'int16', 'DISCOUNT':'float32', 'ORDERDATE':'date32'}). 
+        The types are applied once when the tables are written, so the 
+        saved files keep compact types and dates need no parsing on read. 
+        Columns which are not declared keep their inferred types. The casts 
+        are safe, ids out of the int32 range or dates with a time part raise 
+        an error instead of being truncated.
+
+        Args:
+            column_schema:dict -> pyarrow type or type alias per column name, 
+                                  'compact' for compact_column_schema, the 
+                                  inferred types of all columns are kept if None
+        """
+        if column_schema == 'compact':
+            column_schema = self.compact_column_schema
+        column_schema = column_schema or {}
+
+        self.column_schema = {column: pa.type_for_alias(arrow_type) if isinstance(arrow_type, str) else arrow_type
+                              for column, arrow_type in column_schema.items()}
+
+    def pin_batch_column_types(self, df:pd.core.frame.DataFrame)->None:
+        """
+        Pins the storage type of every source column for the streamed 
+        batches, so the parquet writers don't take their schema from 
+        whichever batch comes first. Columns declared in column_schema keep 
+        their type, the others take the type inferred from the given first 
+        batch and columns without any value in it are stored as strings, 
+        numeric columns which can be empty in a whole batch have to be 
+        declared in column_schema.
+
+        Args:
+            df:pd.core.frame.DataFrame -> first batch of the source
+        """
+        inferred_schema = pa.Schema.from_pandas(df, preserve_index=False)
+        self.batch_column_types = {}
+
+        for column in df.columns:
+            arrow_type = inferred_schema.field(column).type
+            if df[column].isnull().all() and not pa.types.is_timestamp(arrow_type):
+                arrow_type = pa.string()
+            self.batch_column_types[column] = self.column_schema.get(column, arrow_type)
+
+    def load_source(self,
+                    dataframe_xlsx_path,
+                    xlsx_sheet_name,
+                    chunksize:int = None,
+                    engine:str = 'pandas',
+                    infer_categories:bool = False,
+                    column_schema:dict = None,
+                    ingest_workers:int = None)->None:
+        """
+        Loads the source as dataframe (or pyarrow table with the arrow 
+        engine) with normalized column names, or only remembers it if it 
+        is streamed in batches (chunksize or more than one source). See 
+        the init_params() of the subclasses for the arguments.
+        """
+        self.sources = get_sources(dataframe_xlsx_path, xlsx_sheet_name)
+        self.dataframe_path, self.xlsx_sheet_name = self.sources[0]
+        self.dataframe_name = self.xlsx_sheet_name.upper() if isinstance(xlsx_sheet_name, str) else xlsx_sheet_name[0].upper()
+        self.ingest_workers = ingest_workers
+        self.ingest_report = []
+        self.chunksize = chunksize
+        self.engine = engine
+        self.save_directory = None
+        self.dataframe, self.table = None, None
+        self.categorical_columns = []
+        self.set_column_schema(column_schema)
+
+        if engine not in ['pandas', 'arrow']:
+            raise ValueError('Invalid engine provided: {}'.format(engine))
+
+        if chunksize or len(self.sources) > 1:
+            pass
+        elif engine == 'arrow':
+            with profiler.stage('read') as record:
+                self.table = read_arrow_table(self.dataframe_path, self.xlsx_sheet_name)
+                record['rows'] = self.table.num_rows
+
+            if infer_categories:
+                with profiler.stage('infer_categories', self.table.num_rows):
+                    self.categorical_columns = get_arrow_categorical_columns(self.table, self.categorical_max_cardinality_ratio)
+                    for column in self.categorical_columns:
+                        position = self.table.column_names.index(column)
+                        self.table = self.table.set_column(position, column, self.table.column(column).dictionary_encode())
+        else:
+            with profiler.stage('read') as record:
+                self.dataframe = read_xlsx(self.dataframe_path, self.xlsx_sheet_name)
+                record['rows'] = len(self.dataframe)
+
+            with profiler.stage('normalize_columns', len(self.dataframe)):
+                remove_spaces_and_uppercase_df_columns(self.dataframe)
+
+            if infer_categories:
+                with profiler.stage('infer_categories', len(self.dataframe)):
+                    self.categorical_columns = get_categorical_columns(self.dataframe, self.categorical_max_cardinality_ratio)
+                    self.dataframe = self.dataframe.astype({column:'category' for column in self.categorical_columns})
+
+    def iter_batches(self)->Iterator[pd.core.frame.DataFrame]:
+        """
+        Yields the batches of read_batches() and pins the storage types 
+        of the source columns on the first one, see pin_batch_column_types().
+        """
+        self.batch_column_types = {}
+        for batch in self.read_batches():
+            if not self.batch_column_types:
+                self.pin_batch_column_types(batch)
+            yield batch
+
+    def read_batches(self)->Iterator[pd.core.frame.DataFrame]:
+        """
+        Yields the source table as bounded size dataframes with 
+        normalized column names. Yields the loaded dataframe as a 
+        single batch if the schema was not initialized with chunksize,
+        the record batches of the pyarrow table with the arrow engine
+        and the parsed sources if more than one source was given.
+        """
+        if len(self.sources) > 1:
+            yield from self.iter_source_batches()
+            return
+
+        if self.dataframe is not None:
+            yield self.dataframe
+            return
+
+        if self.table is not None:
+            for batch in self.table.to_batches():
+                yield batch.to_pandas()
+            return
+
+        for batch in read_table_in_chunks(self.dataframe_path, self.xlsx_sheet_name, self.chunksize):
+            remove_spaces_and_uppercase_df_columns(batch)
+            convert_date_column(batch)
+            yield batch
+        
+    def iter_source_batches(self)->Iterator[pd.core.frame.DataFrame]:
+        """
+        Yields the sources parsed by a pool of ingest_workers processes in 
+        the order they finish, split into batches of chunksize rows if 
+        chunksize was given. Sources which fail to parse or whose columns 
+        differ from the ones of the first source (see get_source_columns()) 
+        are skipped and reported. Every source gets an entry in 
+        ingest_report, see get_ingest_report().
+        """
+        self.ingest_report = []
+        columns = self.get_source_columns()
+        is_read = False
+
+        for path, sheet_name, df, error, seconds in iter_sources(self.sources, self.ingest_workers):
+            if error is None and set(df.columns) != set(columns):
+                error = 'Columns differ from the first source: {}'.format(sorted(set(df.columns) ^ set(columns)))
+
+            self.ingest_report.append({'path': path, 'sheet_name': sheet_name, 'seconds': seconds,
+                                       'rows': None if error else len(df), 'error': error})
+            if error:
+                print(self.name, ': skipped {} ({}): {}'.format(path, sheet_name, error))
+                continue
+
+            df, is_read = df[columns], True
+            chunksize = self.chunksize or max(len(df), 1)
+            for start in range(0, len(df), chunksize):
+                yield df.iloc[start:start+chunksize]
+
+        if not is_read:
+            raise Exception('None of the {} sources could be read!'.format(len(self.sources)))
+
+    def get_source_columns(self)->list:
+        """
+        Returns the columns every source has to provide, the header of the 
+        first source in the order of the given paths whose header can be 
+        read. Only the header rows are read, so the expected columns don't 
+        depend on which source is parsed first.
+        """
+        for path, sheet_name in self.sources:
+            try:
+                return read_source_columns(path, sheet_name)
+            except Exception as error:
+                print(self.name, ': no header in {} ({}): {}'.format(path, sheet_name, repr(error)))
+
+        raise Exception('None of the {} sources could be read!'.format(len(self.sources)))
+
+    def get_ingest_report(self)->list:
+        """
+        Returns a dictionary per source of the last transform holding its 
+        path, sheet name, parsing seconds, rows and error (None if it was 
+        read), empty if a single source was given.
+        """
+        return list(self.ingest_report)
+
+    def get_saved_directory(self,
+                            folder_directory:str = None,
+                            dataframe_name:str = None)->str:
+        """
+        Returns the directory of the tables saved by this schema, the 
+        directory of the last transform if no directory is provided.
+
+        Args:
+            folder_directory:str   -> directory to save output
+            dataframe_name:str     -> name of the saved table/datafrmae
+        """
+        if folder_directory and dataframe_name:
+            return os.path.join(folder_directory, dataframe_name, self.name)
+        return self.save_directory
+
+    def get_saved_table_files(self, saved_directory:str, pattern:str = '*.parquet')->dict:
+        """
+        Returns the saved parquet files per table name (i.e. dim_CUSTOMER), 
+        numbered parts of incremental runs belong to the same table.
+
+        Args:
+            saved_directory:str -> directory of the saved tables
+            pattern:str         -> glob pattern of the table files
+        """
+        table_files = {}
+        for file in sorted(glob.glob(os.path.join(saved_directory, pattern))):
+            table_files.setdefault(os.path.basename(file).split('.')[0], []).append(file)
+        return table_files
+
+    def project_table(self, table, columns:list):
+        """
+        Returns the given columns of the pandas dataframe or pyarrow table 
+        in the given order.
+
+        Args:
+            table         -> pd.core.frame.DataFrame or pa.Table
+            columns:list  -> columns to select
+        """
+        if isinstance(table, pa.Table):
+            return table.select(columns)
+        return table[columns]
+
+    def drop_duplicate_rows(self, table, subset:list = None, outname:str = None):
+        """
+        Returns the first row of every distinct combination of the subset 
+        columns (all columns if None) of the pandas dataframe or pyarrow 
+        table in the order of the table, dataframes keep their index.
+
+        Args:
+            table         -> pd.core.frame.DataFrame or pa.Table
+            subset:list   -> columns to compare
+            outname:str   -> name of the saved table, recorded by the profiler
+        """
+        with profiler.stage('drop_duplicates', len(table)) as record:
+            if outname:
+                record['table'] = outname
+            if isinstance(table, pa.Table):
+                return drop_duplicate_arrow_rows(table, subset)
+            return table.drop_duplicates(subset=subset)
+
+    def hash_batch_rows(self, df:pd.core.frame.DataFrame)->np.ndarray:
+        """
+        Returns the uint64 hash of every row of the batch computed from its 
+        values in the pinned column types (see pin_batch_column_types()), 
+        so equal rows of batches whose inferred dtypes differ (i.e. a text 
+        column without values in one batch or an integer column with 
+        missing values in another) get the same hash.
+
+        Args:
+            df:pd.core.frame.DataFrame -> batch to hash
+        """
+        columns = {}
+        for column in df.columns:
+            arrow_type = self.batch_column_types.get(column)
+            if arrow_type is None:
+                continue
+            if pa.types.is_string(arrow_type) and df[column].dtype != object:
+                columns[column] = df[column].astype(object).where(df[column].notnull(), None)
+            elif (pa.types.is_integer(arrow_type) or pa.types.is_floating(arrow_type)) and df[column].dtype != 'float64':
+                columns[column] = df[column].astype('float64')
+
+        return hash_rows(df.assign(**columns) if columns else df)
+
+    def drop_written_rows(self, 
+                          df:pd.core.frame.DataFrame, 
+                          written_rows:pd.Index, 
+                          outname:str = None)->tuple:
+        """
+        Returns the rows of the batch which are neither duplicated within 
+        the batch nor written by an earlier batch, compared through the 
+        uint64 hashes of their values, together with the hashes of the 
+        written rows extended by the returned rows, see hash_batch_rows().
+
+        Args:
+            df:pd.core.frame.DataFrame -> batch to deduplicate
+            written_rows:pd.Index      -> unique hashes of the rows of the earlier batches
+            outname:str                -> name of the saved table, recorded by the profiler
+        """
+        with profiler.stage('drop_duplicates', len(df)) as record:
+            if outname:
+                record['table'] = outname
+            row_hashes = self.hash_batch_rows(df)
+            is_new_row = ~pd.Index(row_hashes).duplicated() & (written_rows.get_indexer(row_hashes) == -1)
+            if is_new_row.all():
+                return df, written_rows.append(pd.Index(row_hashes))
+            return df[is_new_row], written_rows.append(pd.Index(row_hashes[is_new_row]))
+
+    def save_tables(self, tables:list, verbose:bool, workers:int = None)->None:
+        """
+        Deduplicates, types (see set_column_schema()) and writes the given 
+        (outname, df, drop_duplicates) tuples to the saved directory, in a 
+        pool of processes with more than one worker.
+
+        Args:
+            tables:list  -> (outname, df, drop_duplicates) tuples
+            verbose:bool -> decides wheather to print putput
+            workers:int  -> number of processes saving the tables
+        """
+        save_tables_as_parquet(self.save_directory, tables, verbose, workers, self.column_schema)
+
+    def save_arrow_table(self,
+                         outname:str,
+                         table:pa.Table,
+                         verbose:bool,
+                         subset:list = None,
+                         partition_columns:list = None,
+                         row_group_size:int = None,
+                         drop_duplicates:bool = True)->None:
+        """
+        Deduplicates on the subset columns (all columns if None), types and 
+        writes the pyarrow table to the saved directory, as hive style 
+        partitioned parquet directory if partition columns are given.
+
+        Args:
+            outname:str             -> output file name
+            table:pa.Table          -> table to save
+            verbose:bool            -> decides wheather to print putput
+            subset:list             -> columns to deduplicate on
+            partition_columns:list  -> columns to partition the table by
+            row_group_size:int      -> maximum number of rows per row group
+            drop_duplicates:bool    -> decides wheather to drop duplicated rows,
+                                       can be skipped if the rows are already unique
+        """
+        if drop_duplicates:
+            table = self.drop_duplicate_rows(table, subset, outname)
+        save_arrow_table_as_parquet(self.save_directory, outname, table, verbose, 
+                                    partition_columns, row_group_size, self.column_schema)
+
+    def append_batch(self,
+                     writers:dict,
+                     outname:str,
+                     df:pd.core.frame.DataFrame,
+                     drop_duplicates:bool = True,
+                     partition_columns:list = None,
+                     basename:str = None,
+                     row_group_size:int = None)->None:
+        """
+        Deduplicates, types and appends the batch to the parquet file of 
+        the saved directory, or to the hive style partitioned parquet 
+        directory if partition columns are given. The writers are opened 
+        on the first batch, the caller is responsible for closing them. 
+        Source columns are stored with the types pinned on the first 
+        batch (see pin_batch_column_types()), a batch whose values don't 
+        fit them raises an error.
+
+        Args:
+            writers:dict            -> open parquet writers keyed by output file name
+            outname:str             -> output file or directory name
+            df:pd.core.frame.DataFrame -> batch to append
+            drop_duplicates:bool    -> decides wheather to drop duplicated rows,
+                                       can be skipped if the rows are already unique
+            partition_columns:list  -> columns to partition the table by
+            basename:str            -> file name written inside every partition
+            row_group_size:int      -> maximum number of rows per row group
+        """
+        if drop_duplicates:
+            df = self.drop_duplicate_rows(df, outname=outname)
+
+        column_types = dict(self.column_schema, **self.batch_column_types)
+        try:
+            if partition_columns:
+                append_table_to_partitioned_parquet(writers, self.save_directory, outname, df, partition_columns,
+                                                    basename, row_group_size, column_types)
+            else:
+                append_table_to_parquet(writers, self.save_directory, outname, df, row_group_size, column_types)
+        except (pa.ArrowInvalid, pa.ArrowNotImplementedError) as error:
+            raise ValueError('Batch of {} doesn\'t fit the column types of the first batch, declare them in column_schema: {}'.format(
+                outname, repr(error)))
+
     @abstractmethod
     def init_params(self):
         pass
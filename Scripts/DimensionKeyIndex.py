@@ -0,0 +1,106 @@
+import os
+import numpy as np
+import pandas as pd
+from Scripts.utils import create_directory
+
+class DimensionKeyIndex():
+    """
+    A class used to map the natural key of a dimension (i.e. PRODUCTID) to a
+    compact int32 surrogate key. Natural keys are kept in insertion order in a
+    hash based pandas Index, the surrogate key of a member is its position + 1,
+    so already assigned keys never change while the index grows.
+
+    ...
+
+    Attributes
+    ----------
+    dimension_name:str
+    natural_key:str
+    surrogate_key:str
+    index:pd.Index
+
+    Methods
+    -------
+    load()
+    save()
+    lookup()
+    assign()
+    """
+
+    file_name_template = 'key_index_{}.parquet'
+
+    def __init__(self, dimension_name:str):
+        self.dimension_name = dimension_name
+        self.natural_key = dimension_name+'ID'
+        self.surrogate_key = dimension_name+'KEY'
+        self.index = pd.Index([])
+
+    def __len__(self):
+        return len(self.index)
+
+    @classmethod
+    def load(cls, directory:str, dimension_name:str)->'DimensionKeyIndex':
+        """
+        Returns the persisted key index of the dimension from the given
+        directory or an empty one if it was never saved.
+
+        Args:
+            directory:str       -> directory containing the key indexes
+            dimension_name:str  -> name of the dimension (i.e. PRODUCT)
+        """
+        key_index = cls(dimension_name)
+        path = os.path.join(directory, cls.file_name_template.format(dimension_name))
+
+        if os.path.exists(path):
+            saved = pd.read_parquet(path, engine='pyarrow').sort_values(key_index.surrogate_key)
+            key_index.index = pd.Index(saved[key_index.natural_key].values)
+
+        return key_index
+
+    def save(self, directory:str)->None:
+        """
+        Persists the key index as parquet file in the given directory.
+
+        Args:
+            directory:str -> directory containing the key indexes
+        """
+        create_directory(directory)
+        path = os.path.join(directory, self.file_name_template.format(self.dimension_name))
+        pd.DataFrame({self.natural_key: self.index.values,
+                      self.surrogate_key: np.arange(1, len(self.index)+1, dtype='int32')}).to_parquet(path, index=False)
+
+    def lookup(self, natural_keys:pd.core.series.Series)->np.ndarray:
+        """
+        Returns the int32 surrogate keys of the given natural keys,
+        0 for keys which are not part of the index.
+
+        Args:
+            natural_keys:pd.core.series.Series -> natural key values
+        """
+        return (self.index.get_indexer(natural_keys.values)+1).astype('int32')
+
+    def assign(self, natural_keys:pd.core.series.Series)->tuple:
+        """
+        Assigns surrogate keys to the natural keys which are not part of
+        the index yet and returns the surrogate keys of all given natural
+        keys together with a boolean mask of the newly added ones.
+
+        Args:
+            natural_keys:pd.core.series.Series -> natural key values
+        """
+        positions = self.index.get_indexer(natural_keys.values)
+        is_new = positions == -1
+
+        if is_new.any():
+            new_keys = pd.unique(natural_keys.values[is_new])
+
+            if len(self.index)+len(new_keys) > np.iinfo('int32').max:
+                raise OverflowError('Surrogate keys of dimension {} exceed int32 range!'.format(self.dimension_name))
+
+            if len(self.index):
+                self.index = self.index.append(pd.Index(new_keys))
+            else:
+                self.index = pd.Index(new_keys)
+            positions = self.index.get_indexer(natural_keys.values)
+
+        return (positions+1).astype('int32'), is_new
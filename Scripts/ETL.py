@@ -1,5 +1,7 @@
 import pandas as pd
+from .SnowflakeSchema import SnowflakeSchema
 from .StarSchema import StarSchema
+from .WideTable import WideTable
 
 class ETL():
     """
@@ -11,6 +13,7 @@ class ETL():
     schema_obj:object
     schema_name:str
     schema_arguments:dict
+    transform_arguments:dict
     
     Methods
     -------
@@ -18,6 +21,12 @@ class ETL():
     transform_table()
     get_transformed_tables()
     get_merged_table()
+    get_aggregates()
+    get_lazy_dimension_tables()
+    get_sql_engine()
+    get_ingest_report()
+    iter_merged_table()
+    compute_aggregates()
     """
 
     schema_obj = None
@@ -25,8 +34,26 @@ class ETL():
     schema_arguments =  {'starschema':[ 'dataframe_xlsx_path',
                                         'xlsx_sheet_name',
                                         'dimension_features_without_dimension_name_substring',
-                                        'fact_table_columns_containing_dimension_name']
+                                        'fact_table_columns_containing_dimension_name'],
+                         'snowflakeschema':[ 'dataframe_xlsx_path',
+                                             'xlsx_sheet_name',
+                                             'dimension_features_without_dimension_name_substring',
+                                             'fact_table_columns_containing_dimension_name'],
+                         'widetable':[ 'dataframe_xlsx_path',
+                                       'xlsx_sheet_name']
                         }
+    transform_arguments = {'starschema':[ 'surrogate_keys',
+                                          'incremental',
+                                          'partition_fact_by',
+                                          'build_aggregates',
+                                          'workers',
+                                          'scd2'],
+                           'snowflakeschema':[ 'surrogate_keys',
+                                               'partition_fact_by',
+                                               'build_aggregates',
+                                               'workers'],
+                           'widetable':[ 'build_aggregates']
+                          }
 
 
     def __init__(self, schema_name:str):
@@ -40,6 +67,10 @@ class ETL():
 
         if schema_name.lower()=='starschema':
             return StarSchema()
+        elif schema_name.lower()=='snowflakeschema':
+            return SnowflakeSchema()
+        elif schema_name.lower()=='widetable':
+            return WideTable()
         else:
             raise NotImplementedError 
 
@@ -50,7 +81,8 @@ class ETL():
         Args:
         
             ***Star Schema***
-            dataframe_path:str -> Path of the provided xlsx data
+            dataframe_path:str -> Path of the provided xlsx data, a glob pattern 
+                                  or a list of paths
             
             dimension_features_without_dimension_name_substring:dict -> dimension features which 
                                                                         doesn't contain dimension 
@@ -59,9 +91,36 @@ class ETL():
             fact_table_columns_containing_dimension_name:list -> fact table features which 
                                                                  contain dimension name as 
                                                                  substring.                                                                 
+
+            chunksize:int -> (optional) stream the source in batches of 
+                             chunksize rows instead of loading it at once.
+
+            engine:str -> (optional) 'arrow' keeps the source as pyarrow table
+                          and writes the tables without pandas, default 'pandas'.
+
+            infer_categories:bool -> (optional) store low-cardinality text columns
+                                     as categoricals, kept in the saved tables.
+
+            column_schema:dict -> (optional) storage type per column (i.e. 
+                                  {'ORDERID':'int32', 'ORDERDATE':'date32'}) or 'compact' 
+                                  for compact ids, counts and dates, inferred types by default.
+
+            ingest_workers:int -> (optional) number of processes parsing the sources
+                                  at the same time when dataframe_xlsx_path is a list
+                                  or glob of files (or xlsx_sheet_name a list of sheets).
+
+            ***Snowflake Schema***
+            the arguments of the star schema and
+
+            snowflake_features:dict -> (optional) dimension attributes normalized into
+                                       their own tables (i.e. {'PRODUCT': ['PRODUCTCATEGORY'],
+                                       'CUSTOMER': ['CUSTOMERREGION']}).
+
+            ***Wide Table***
+            the arguments of the star schema except the dimension features
         """
 
-        invalid_arguments = set(self.schema_arguments[self.schema_name]) - set(kwargs.keys())
+        invalid_arguments = set(self.schema_arguments[self.schema_name.lower()]) - set(kwargs.keys())
 
         if self.schema_name.lower() == "starschema" and\
            not invalid_arguments:
@@ -69,25 +128,83 @@ class ETL():
             self.schema_obj.init_params(kwargs['dataframe_xlsx_path'],
                                         kwargs['xlsx_sheet_name'],
                                         kwargs['dimension_features_without_dimension_name_substring'],
-                                        kwargs['fact_table_columns_containing_dimension_name'])
+                                        kwargs['fact_table_columns_containing_dimension_name'],
+                                        kwargs.get('chunksize'),
+                                        kwargs.get('engine', 'pandas'),
+                                        kwargs.get('infer_categories', False),
+                                        kwargs.get('column_schema'),
+                                        kwargs.get('ingest_workers'))
+
+        elif self.schema_name.lower() == "snowflakeschema" and\
+             not invalid_arguments:
+
+            self.schema_obj.init_params(kwargs['dataframe_xlsx_path'],
+                                        kwargs['xlsx_sheet_name'],
+                                        kwargs['dimension_features_without_dimension_name_substring'],
+                                        kwargs['fact_table_columns_containing_dimension_name'],
+                                        kwargs.get('chunksize'),
+                                        kwargs.get('engine', 'pandas'),
+                                        kwargs.get('infer_categories', False),
+                                        kwargs.get('column_schema'),
+                                        kwargs.get('ingest_workers'),
+                                        kwargs.get('snowflake_features'))
+
+        elif self.schema_name.lower() == "widetable" and\
+             not invalid_arguments:
+
+            self.schema_obj.init_params(kwargs['dataframe_xlsx_path'],
+                                        kwargs['xlsx_sheet_name'],
+                                        kwargs.get('chunksize'),
+                                        kwargs.get('engine', 'pandas'),
+                                        kwargs.get('infer_categories', False),
+                                        kwargs.get('column_schema'),
+                                        kwargs.get('ingest_workers'))
         else:
             raise ValueError("Invalid Parameter detected while initializing the {} parameters.".format(self.schema_name))
             
-    def transform_table(self, save_directory:str = 'output', verbose:bool = True)->None:
+    def transform_table(self, save_directory:str = 'output', verbose:bool = True, **kwargs)->None:
         """
         Transform table according to the provided scheme.
 
         Args:
             save_directory:str   -> directory to save output
             verbose:bool         ->  decides wheather to print putput
+
+            ***Star Schema***
+            surrogate_keys:bool  -> (optional) link the fact table through 
+                                    int32 surrogate keys
+            incremental:bool     -> (optional) append only the rows which are 
+                                    not saved yet instead of rewriting all tables
+            partition_fact_by:str-> (optional) date column to partition the 
+                                    fact table by year and month
+            build_aggregates:bool-> (optional) save pre-aggregated KPI cubes 
+                                    next to the tables
+            workers:int          -> (optional) number of processes saving the
+                                    tables at the same time
+            scd2:bool            -> (optional) keep the history of the dimension 
+                                    members as slowly changing (type 2) dimensions
+
+            ***Snowflake Schema***
+            the arguments of the star schema except incremental and scd2
+
+            ***Wide Table***
+            build_aggregates:bool-> (optional) save pre-aggregated KPI cubes 
+                                    next to the table
         """
 
-        self.schema_obj.transform_table(save_directory, verbose)
+        invalid_arguments = set(kwargs.keys()) - set(self.transform_arguments[self.schema_name.lower()])
+
+        if invalid_arguments:
+            raise ValueError("Invalid Parameter detected while transforming the {} tables: {}".format(
+                self.schema_name, sorted(invalid_arguments)))
+
+        self.schema_obj.transform_table(save_directory, verbose, **kwargs)
         
     def get_transformed_tables(self,  
                                folder_directory:str=None,
                                dataframe_name:str=None,
-                               verbose:bool = True)->tuple:
+                               verbose:bool = True,
+                               **kwargs)->tuple:
         """
         Returns transformed tables (i.e. fact tables, dimension tables)
 
@@ -95,14 +212,21 @@ class ETL():
             folder_directory:str   -> directory to save output
             dataframe_name:str     -> name of the saved table/datafrmae
             verbose:bool           ->  decides wheather to print putput
+
+            ***Star Schema***
+            filters:list           -> (optional) (column, operator, value) tuples 
+                                      pushed down to the tables containing the column
+            columns:list           -> (optional) columns to read, unused dimension 
+                                      tables are skipped
         """
 
-        return self.schema_obj.get_transformed_tables(folder_directory, dataframe_name, verbose)
+        return self.schema_obj.get_transformed_tables(folder_directory, dataframe_name, verbose, **kwargs)
         
     def get_merged_table(self,  
                          folder_directory:str=None,
                          dataframe_name:str=None,
-                         verbose:bool = True)->pd.core.frame.DataFrame:
+                         verbose:bool = True,
+                         **kwargs)->pd.core.frame.DataFrame:
         """
         Returns merged table from the transformed tables.
 
@@ -110,6 +234,110 @@ class ETL():
             folder_directory:str   -> directory to save output
             dataframe_name:str     -> name of the saved table/datafrmae
             verbose:bool           ->  decides wheather to print putput
+
+            ***Star Schema***
+            filters:list           -> (optional) (column, operator, value) tuples 
+                                      pushed down to the tables containing the column
+            columns:list           -> (optional) columns to read, unused dimension 
+                                      tables are skipped
+        """
+
+        return self.schema_obj.get_merged_table(folder_directory, dataframe_name, verbose, **kwargs)
+
+    def get_aggregates(self,
+                       folder_directory:str=None,
+                       dataframe_name:str=None)->object:
+        """
+        Returns the pre-aggregated KPI cubes saved by transform_table or 
+        None if they were not built.
+
+        Args:
+            folder_directory:str   -> directory to save output
+            dataframe_name:str     -> name of the saved table/datafrmae
+        """
+
+        return self.schema_obj.get_aggregates(folder_directory, dataframe_name)
+
+    def get_lazy_dimension_tables(self,
+                                  folder_directory:str=None,
+                                  dataframe_name:str=None)->dict:
+        """
+        Returns the dimension tables as memory-mapped LazyDimension objects 
+        which load rows by key on demand.
+
+        Args:
+            folder_directory:str   -> directory to save output
+            dataframe_name:str     -> name of the saved table/datafrmae
+        """
+
+        return self.schema_obj.get_lazy_dimension_tables(folder_directory, dataframe_name)
+
+    def get_sql_engine(self,
+                       folder_directory:str=None,
+                       dataframe_name:str=None,
+                       backend:str=None,
+                       threads:int=None)->object:
+        """
+        Returns an SQL engine (DuckDB or sqlite) over the saved tables.
+
+        Args:
+            folder_directory:str   -> directory to save output
+            dataframe_name:str     -> name of the saved table/datafrmae
+            backend:str            -> any of ['duckdb', 'sqlite'], duckdb if installed if None
+            threads:int            -> number of threads of the duckdb executor, all cores if None
+        """
+
+        return self.schema_obj.get_sql_engine(folder_directory, dataframe_name, backend, threads)
+
+    def get_ingest_report(self)->list:
+        """
+        Returns the path, sheet name, parsing seconds, rows and error of 
+        every source of the last transform.
+        """
+
+        return self.schema_obj.get_ingest_report()
+
+    def iter_merged_table(self,
+                          folder_directory:str=None,
+                          dataframe_name:str=None,
+                          verbose:bool = True,
+                          **kwargs):
+        """
+        Yields the merged table in bounded size chunks instead of building 
+        it in memory.
+
+        Args:
+            folder_directory:str   -> directory to save output
+            dataframe_name:str     -> name of the saved table/datafrmae
+            verbose:bool           ->  decides wheather to print putput
+
+            ***Star Schema***
+            filters:list           -> (optional) (column, operator, value) tuples 
+            columns:list           -> (optional) columns to return
+            chunksize:int          -> (optional) maximum number of fact rows per chunk
+        """
+
+        return self.schema_obj.iter_merged_table(folder_directory, dataframe_name, verbose, **kwargs)
+
+    def compute_aggregates(self,
+                           folder_directory:str=None,
+                           dataframe_name:str=None,
+                           verbose:bool = True,
+                           **kwargs)->object:
+        """
+        Computes the KPI cubes of the transformed tables in a pool of 
+        processes and returns them.
+
+        Args:
+            folder_directory:str   -> directory to save output
+            dataframe_name:str     -> name of the saved table/datafrmae
+            verbose:bool           ->  decides wheather to print putput
+
+            ***Star Schema***
+            filters:list           -> (optional) (column, operator, value) tuples 
+            cubes:list             -> (optional) names of the cubes to compute
+            workers:int            -> (optional) number of processes aggregating 
+                                      the row groups of the fact table
         """
 
-        return self.schema_obj.get_merged_table(folder_directory, dataframe_name, verbose)
\ No newline at end of file
+        return self.schema_obj.compute_aggregates(folder_directory, dataframe_name, verbose, **kwargs)
@@ -0,0 +1,223 @@
+import os
+import pandas as pd
+from Scripts.utils import aggregate_by_period
+from Scripts.utils import create_directory
+from Scripts.utils import replace_date_to_month_column
+from Scripts.utils import top_n_positions
+
+class KPIAggregates():
+    """
+    A class used to hold pre-aggregated cubes of the sales KPIs: monthly
+    revenue and order counts, revenue per customer segment and lifetime
+    totals per customer. Cubes computed from separate batches of rows can
+    be merged, so they are maintained incrementally as new rows arrive and
+    the KPIs are answered in O(months) or O(customers) instead of O(rows).
+
+    ...
+
+    Attributes
+    ----------
+    columns:list
+    cube_names:list
+    cubes:list
+    monthly:pd.core.frame.DataFrame
+    customer_segments:pd.core.series.Series
+    customers:pd.core.frame.DataFrame
+
+    Methods
+    -------
+    update()
+    merge()
+    load()
+    save()
+    get_monthly_table()
+    get_revenues_sum()
+    orders_per_month()
+    get_top_n_customers()
+    """
+
+    columns = ['ORDERDATE', 'ORDERID', 'REVENUE', 'CUSTOMERID', 'CUSTOMERNAME', 'CUSTOMERSEGMENT']
+
+    file_names = {'monthly': 'agg_MONTHLY.parquet',
+                  'customer_segments': 'agg_CUSTOMERSEGMENT.parquet',
+                  'customers': 'agg_CUSTOMER.parquet'}
+
+    cube_names = ['monthly', 'customer_segments', 'customers']
+
+    def __init__(self, cubes:list = None):
+        """
+        Args:
+            cubes:list -> names of the cubes to maintain (see cube_names), all 
+                          cubes if None. A KPI only needs the columns of
+                          its own cube, i.e. ORDERDATE and REVENUE for monthly.
+        """
+        invalid_cubes = set(cubes or []) - set(self.cube_names)
+        if invalid_cubes:
+            raise ValueError('Invalid cube provided: {}'.format(sorted(invalid_cubes)))
+
+        self.cubes = [cube for cube in self.cube_names if cubes is None or cube in cubes]
+        self.monthly = pd.DataFrame({'REVENUE': pd.Series([], dtype='float64'),
+                                     'ORDERSPERMONTH': pd.Series([], dtype='int64')},
+                                    index=pd.DatetimeIndex([], name='ORDERDATE'))
+        self.customer_segments = pd.Series([], dtype='float64', name='REVENUE',
+                                           index=pd.Index([], name='CUSTOMERSEGMENT'))
+        self.customers = pd.DataFrame({'CUSTOMERNAME': pd.Series([], dtype='object'),
+                                       'LIFETIMEREVENUE': pd.Series([], dtype='float64'),
+                                       'LIFETIMEORDERVOLUME': pd.Series([], dtype='int64')},
+                                      index=pd.Index([], name='CUSTOMERID'))
+
+    def update(self, df:pd.core.frame.DataFrame)->'KPIAggregates':
+        """
+        Aggregates the given rows (i.e. a batch of the source table or the
+        merged table) and adds them to the cubes. Returns the object itself.
+
+        Args:
+            df:pd.core.frame.DataFrame -> rows containing ORDERDATE, ORDERID, REVENUE,
+                                          CUSTOMERID, CUSTOMERNAME and CUSTOMERSEGMENT
+        """
+        partial = KPIAggregates(self.cubes)
+
+        if 'monthly' in self.cubes:
+            partial.monthly = aggregate_by_period(df, 'ORDERDATE', ['REVENUE'], 'ORDERSPERMONTH').set_index('ORDERDATE')
+
+        if 'customer_segments' in self.cubes:
+            partial.customer_segments = df.groupby('CUSTOMERSEGMENT', observed=True)['REVENUE'].sum()
+
+        if 'customers' in self.cubes:
+            partial.customers = df.groupby('CUSTOMERID').agg(CUSTOMERNAME=('CUSTOMERNAME', 'first'),
+                                                             LIFETIMEREVENUE=('REVENUE', 'sum'),
+                                                             LIFETIMEORDERVOLUME=('ORDERID', 'count'))
+        return self.merge(partial)
+
+    def merge(self, other:'KPIAggregates')->'KPIAggregates':
+        """
+        Adds the cubes of the other object to the cubes of this object.
+        Returns the object itself.
+
+        Args:
+            other:KPIAggregates -> cubes to add
+        """
+        if len(self.monthly) == 0:
+            self.monthly = other.monthly.copy()
+        elif len(other.monthly):
+            self.monthly = self.monthly.add(other.monthly, fill_value=0).astype({'ORDERSPERMONTH':'int64'})
+
+        if len(self.customer_segments) == 0:
+            self.customer_segments = other.customer_segments.copy()
+        elif len(other.customer_segments):
+            self.customer_segments = self.customer_segments.add(other.customer_segments, fill_value=0)
+
+        if len(self.customers) == 0:
+            self.customers = other.customers.copy()
+        elif len(other.customers):
+            names = self.customers['CUSTOMERNAME'].combine_first(other.customers['CUSTOMERNAME'])
+            totals = self.customers[['LIFETIMEREVENUE', 'LIFETIMEORDERVOLUME']].add(
+                other.customers[['LIFETIMEREVENUE', 'LIFETIMEORDERVOLUME']], fill_value=0)
+            self.customers = totals.astype({'LIFETIMEORDERVOLUME':'int64'})
+            self.customers.insert(0, 'CUSTOMERNAME', names)
+        return self
+
+    @classmethod
+    def load(cls, directory:str)->'KPIAggregates':
+        """
+        Returns the cubes saved in the given directory or None if they
+        were never saved.
+
+        Args:
+            directory:str -> directory containing the saved cubes
+        """
+        paths = {key:os.path.join(directory, name) for key, name in cls.file_names.items()}
+        if not all(os.path.exists(path) for path in paths.values()):
+            return None
+
+        aggregates = cls()
+        aggregates.monthly = pd.read_parquet(paths['monthly'], engine='pyarrow')
+        aggregates.customer_segments = pd.read_parquet(paths['customer_segments'], engine='pyarrow')['REVENUE']
+        aggregates.customers = pd.read_parquet(paths['customers'], engine='pyarrow')
+        return aggregates
+
+    def save(self, directory:str)->None:
+        """
+        Saves the cubes as parquet files in the given directory.
+
+        Args:
+            directory:str -> output directory
+        """
+        create_directory(directory)
+        self.monthly.to_parquet(os.path.join(directory, self.file_names['monthly']))
+        self.customer_segments.to_frame().to_parquet(os.path.join(directory, self.file_names['customer_segments']))
+        self.customers.to_parquet(os.path.join(directory, self.file_names['customers']))
+
+    def get_monthly_table(self)->pd.core.frame.DataFrame:
+        """
+        Returns the monthly cube with one row per month between the first
+        and the last month, months without orders included.
+        """
+        if len(self.monthly) == 0:
+            return self.monthly.reset_index()
+
+        months = pd.date_range(self.monthly.index.min(), self.monthly.index.max(), freq='MS', name='ORDERDATE')
+        monthly = self.monthly.reindex(months, fill_value=0).astype({'ORDERSPERMONTH':'int64'})
+        return monthly.reset_index()
+
+    def get_revenues_sum(self, variable:str = 'customersegment')->pd.core.frame.DataFrame:
+        """
+        Returns total revenues according to the given column (i.e.
+        customersegment or month) in the layout of calculate_kpi.get_revenues_sum.
+
+        Args:
+            variable:str -> case and space(' ')  insensitive column name matches
+                            any of ['CUSTOMERSEGMENT', 'MONTH']
+        """
+        variable = variable.upper().replace(' ', '')
+
+        if variable=='CUSTOMERSEGMENT':
+            result = self.customer_segments.sort_index().sort_values(ascending=False)
+            return result.rename_axis(variable).reset_index(name='REVENUE')
+        elif variable =='MONTH':
+            return replace_date_to_month_column(self.get_monthly_table()[['ORDERDATE', 'REVENUE']])
+        else:
+            raise ValueError("Invalid column provided!!")
+
+    def orders_per_month(self, aggregate_function:str='sum')->pd.core.frame.DataFrame:
+        """
+        Returns total orders per month according to the given aggtegate function
+        (i.e. sum or averageordervolume) in the layout of calculate_kpi.orders_per_month.
+
+        Args:
+            aggregate_function:str -> case and space(' ') insensitive column name matches any of
+                                      can contain ['sum', 'averageordervolume']
+        """
+        aggregate_function = aggregate_function.lower().replace(' ', '')
+        monthly = self.get_monthly_table()
+
+        if aggregate_function=='sum':
+            return replace_date_to_month_column(monthly[['ORDERDATE', 'ORDERSPERMONTH']])
+        elif aggregate_function=='averageordervolume':
+            result = monthly[['ORDERDATE']].copy()
+            result['AVERAGEGORDERVOLUMEPERMONTH'] = monthly['ORDERSPERMONTH'].expanding().mean()
+            return replace_date_to_month_column(result)
+        else:
+            raise NotImplementedError
+
+    def get_top_n_customers(self, n:int = 10, sort_column:str = 'LIFETIMEREVENUE')->pd.core.frame.DataFrame:
+        """
+        Returns top n customers according to the given sort column (i.e.
+        LIFETIMEREVENUE or LIFETIMEORDERVOLUME) in the layout of
+        calculate_kpi.get_top_n_customers.
+
+        Args:
+            n:int  -> selects top n customers
+            sort_column:str -> case and space(' ') insensitive column name matches any of
+                               ['LIFETIMEREVENUE', 'LIFETIMEORDERVOLUME']
+        """
+        sort_column = sort_column.upper().replace(' ', '')
+
+        if sort_column not in ['LIFETIMEREVENUE', 'LIFETIMEORDERVOLUME']:
+            raise NotImplementedError
+
+        positions = top_n_positions(self.customers[sort_column].values, n, self.customers.index.values)
+        result = self.customers.iloc[positions]
+        return pd.DataFrame({'CUSTOMERID': result.index,
+                             'CUSTOMERNAME': result['CUSTOMERNAME'].values,
+                             sort_column: result[sort_column].values})
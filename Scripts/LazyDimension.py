@@ -0,0 +1,159 @@
+import os
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.feather as feather
+from Scripts.utils import filters_to_expression
+
+class LazyDimension():
+    """
+    A class used to access a saved dimension table (i.e. dim_CUSTOMER)
+    without loading it into pandas. The parquet parts of the table are
+    copied once into an uncompressed Arrow IPC (Feather) file which is
+    memory-mapped, so only the pages of the rows and columns which are
+    looked up are read. The key -> row offset index of a column is built
+    on its first lookup from that column only.
+
+    ...
+
+    Attributes
+    ----------
+    name:str
+    files:list
+    path:str
+    table:pa.Table
+    indexes:dict
+
+    Methods
+    -------
+    columns
+    refresh()
+    get_index()
+    get_keys()
+    take()
+    lookup()
+    join()
+    to_pandas()
+    """
+
+    def __init__(self, name:str, files:list, cache_directory:str):
+        self.name = name
+        self.files = sorted(files)
+        self.path = os.path.join(cache_directory, name+'.arrow')
+        self.indexes = {}
+        self.refresh()
+
+    def __len__(self):
+        return self.table.num_rows
+
+    @property
+    def columns(self)->list:
+        return [name for name in self.table.column_names if not name.startswith('__index_level_')]
+
+    def refresh(self)->None:
+        """
+        Rewrites the Arrow IPC copy if it is missing or older than one of
+        the parquet parts and memory-maps it.
+        """
+        source_mtime = max(os.path.getmtime(file) for file in self.files)
+
+        if not os.path.exists(self.path) or os.path.getmtime(self.path) < source_mtime:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            table = ds.dataset(self.files, format='parquet').to_table()
+            temporary_path = self.path+'.{}.tmp'.format(os.getpid())
+            feather.write_feather(table, temporary_path, compression='uncompressed')
+            os.replace(temporary_path, self.path)
+
+        self.table = pa.ipc.open_file(pa.memory_map(self.path)).read_all()
+        self.indexes = {}
+
+    def get_index(self, key_column:str)->pd.Index:
+        """
+        Returns the hash index mapping the values of the key column to
+        their row offsets, built on the first call.
+
+        Args:
+            key_column:str -> column to look up by (i.e. CUSTOMERID)
+        """
+        if key_column not in self.indexes:
+            self.indexes[key_column] = pd.Index(self.table.column(key_column).to_pandas())
+        return self.indexes[key_column]
+
+    def get_keys(self, key_column:str, filters:list)->pd.Index:
+        """
+        Returns the values of the key column of the members matching all 
+        given filters.
+
+        Args:
+            key_column:str -> column to return (i.e. CUSTOMERID)
+            filters:list   -> (column, operator, value) tuples
+        """
+        keys = ds.dataset(self.table).to_table(columns=[key_column], filter=filters_to_expression(filters))
+        return pd.Index(keys.column(key_column).to_pandas())
+
+    def take(self, positions:np.ndarray, attributes:list)->pd.core.frame.DataFrame:
+        """
+        Returns the given attributes of the rows at the given offsets, 
+        only these rows are converted to pandas.
+
+        Args:
+            positions:np.ndarray -> row offsets (i.e. returned by get_index().get_indexer())
+            attributes:list      -> columns to return
+        """
+        return self.table.select(attributes).take(pa.array(positions)).to_pandas(date_as_object=False)
+
+    def lookup(self, key_column:str, keys:pd.core.indexes.base.Index, attributes:list)->pd.core.frame.DataFrame:
+        """
+        Returns the given attributes of the members with the given keys
+        in the order of the keys, only their rows are converted to pandas.
+
+        Args:
+            key_column:str  -> column to look up by (i.e. CUSTOMERID)
+            keys:pd.Index   -> keys of the members to look up
+            attributes:list -> columns to return
+        """
+        positions = self.get_index(key_column).get_indexer(keys)
+
+        if (positions == -1).any():
+            raise KeyError('Keys missing in {} found!'.format(self.name))
+
+        return self.take(positions, attributes)
+
+    def join(self, other:'LazyDimension', key_column:str)->None:
+        """
+        Replaces the key column referencing the other dimension (i.e. 
+        PRODUCTCATEGORYKEY of a snowflake dim_PRODUCT) by the attributes 
+        of the other dimension in place. The joined table is held in 
+        memory instead of being memory-mapped.
+
+        Args:
+            other:LazyDimension -> dimension referenced by the key column
+            key_column:str      -> key column of both dimensions
+        """
+        positions = other.get_index(key_column).get_indexer(self.table.column(key_column).to_pandas())
+
+        if (positions == -1).any():
+            raise KeyError('Keys missing in {} found!'.format(other.name))
+
+        attributes = other.table.select([column for column in other.columns if column != key_column]).take(pa.array(positions))
+        columns, names = [], []
+        for name in self.columns:
+            if name == key_column:
+                columns.extend(attributes.columns)
+                names.extend(attributes.column_names)
+            else:
+                columns.append(self.table.column(name))
+                names.append(name)
+
+        self.table = pa.Table.from_arrays(columns, names=names)
+        self.indexes = {}
+
+    def to_pandas(self, columns:list = None)->pd.core.frame.DataFrame:
+        """
+        Returns the given columns (all columns if None) as dataframe.
+
+        Args:
+            columns:list -> columns to return
+        """
+        return self.table.select(columns or self.columns).to_pandas(date_as_object=False)
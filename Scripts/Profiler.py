@@ -0,0 +1,212 @@
+import functools
+import json
+import os
+import platform
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+class Profiler():
+    """
+    A class used to record where a run spends its time and memory. The
+    stages of StarSchema (reading, column normalization, copies, dimension
+    projection, deduplication, parquet encoding, reload) and the KPI
+    functions are wrapped with stage() or profile(), which record nothing
+    until start() is called. Every finished stage records its wall time,
+    CPU time, peak RSS, traced memory (with trace_memory) and row counts,
+    report() returns them as JSON serializable run report.
+
+    Stages run in worker processes (i.e. with workers) are not recorded.
+
+    ...
+
+    Attributes
+    ----------
+    enabled:bool
+    trace_memory:bool
+    verbose:bool
+    records:list
+    stack:list
+    started:str
+
+    Methods
+    -------
+    start()
+    stop()
+    reset()
+    stage()
+    profile()
+    report()
+    save_report()
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.trace_memory = False
+        self.verbose = False
+        self.records = []
+        self.stack = []
+        self.started = None
+
+    def start(self, trace_memory:bool = False, verbose:bool = False)->None:
+        """
+        Clears the recorded stages and starts recording.
+
+        Args:
+            trace_memory:bool -> decides wheather to trace the python allocations
+                                 of every stage with tracemalloc, slows the run down
+            verbose:bool      -> decides wheather to print every finished stage
+        """
+        self.reset()
+        self.enabled = True
+        self.trace_memory = trace_memory
+        self.verbose = verbose
+        self.started = datetime.now().isoformat(timespec='seconds')
+
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def stop(self)->None:
+        """
+        Stops recording, the recorded stages are kept for report().
+        """
+        if self.trace_memory and tracemalloc.is_tracing():
+            tracemalloc.stop()
+        self.enabled = False
+
+    def reset(self)->None:
+        """
+        Clears the recorded stages.
+        """
+        self.records = []
+        self.stack = []
+
+    def get_peak_rss(self)->int:
+        """
+        Returns the peak resident set size of the process in bytes or
+        None if it can't be measured on this platform.
+        """
+        if resource is None:
+            return None
+        peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is reported in bytes on macOS and in kilobytes elsewhere
+        return peak_rss if platform.system() == 'Darwin' else peak_rss * 1024
+
+    @contextmanager
+    def stage(self, name:str, rows:int = None):
+        """
+        Records the wrapped block as stage of the given name, nested stages
+        keep the name of their parent. Yields the record, so the row count
+        can be set inside the block (i.e. record['rows'] = len(df)).
+
+        Args:
+            name:str -> name of the stage (i.e. read, drop_duplicates)
+            rows:int -> number of rows processed by the stage
+        """
+        record = {'name': name, 'rows': rows}
+
+        if not self.enabled:
+            yield record
+            return
+
+        record['parent'] = self.stack[-1]['name'] if self.stack else None
+        record['depth'] = len(self.stack)
+        self.stack.append(record)
+
+        peak_rss = self.get_peak_rss()
+        traced_memory = tracemalloc.get_traced_memory()[0] if self.trace_memory else None
+        wall_time, cpu_time = time.perf_counter(), time.process_time()
+
+        try:
+            yield record
+        except Exception as error:
+            record['error'] = repr(error)
+            raise
+        finally:
+            record['wall_time'] = time.perf_counter() - wall_time
+            record['cpu_time'] = time.process_time() - cpu_time
+            record['peak_rss'] = self.get_peak_rss()
+            record['peak_rss_delta'] = None if peak_rss is None else record['peak_rss'] - peak_rss
+
+            if traced_memory is not None:
+                current, peak = tracemalloc.get_traced_memory()
+                record['traced_memory_delta'] = current - traced_memory
+                record['traced_memory_peak'] = peak
+
+            self.stack.pop()
+            self.records.append(record)
+
+            if self.verbose:
+                print('Stage: {}{} {:.3f}s wall {:.3f}s cpu{}'.format('  '*record['depth'], name,
+                                                                     record['wall_time'], record['cpu_time'],
+                                                                     '' if record['rows'] is None else ' {} rows'.format(record['rows'])))
+
+    def profile(self, name:str = None):
+        """
+        Returns a decorator recording every call of the decorated function
+        as stage, named after its module and the function (i.e. 
+        calculate_kpi.get_revenues_sum) if no name is given. The rows of
+        a dataframe passed as first argument and of a returned dataframe are
+        recorded as rows and output_rows.
+
+        Args:
+            name:str -> name of the stage
+        """
+        def decorator(function):
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return function(*args, **kwargs)
+
+                rows = len(args[0]) if args and hasattr(args[0], 'columns') else None
+                stage_name = name or '{}.{}'.format(function.__module__.split('.')[-1], function.__name__)
+                with self.stage(stage_name, rows) as record:
+                    result = function(*args, **kwargs)
+                    if hasattr(result, 'columns'):
+                        record['output_rows'] = len(result)
+                return result
+            return wrapper
+        return decorator
+
+    def report(self)->dict:
+        """
+        Returns the run report holding the recorded stages in the order
+        they finished and their totals per stage name.
+        """
+        totals = {}
+        for record in self.records:
+            total = totals.setdefault(record['name'], {'calls': 0, 'wall_time': 0.0, 'cpu_time': 0.0, 'rows': 0})
+            total['calls'] += 1
+            total['wall_time'] += record['wall_time']
+            total['cpu_time'] += record['cpu_time']
+            total['rows'] += record['rows'] or 0
+
+        return {'started': self.started,
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'pid': os.getpid(),
+                'peak_rss': self.get_peak_rss(),
+                'stages': list(self.records),
+                'totals': totals}
+
+    def save_report(self, path:str)->None:
+        """
+        Saves the run report as JSON file.
+
+        Args:
+            path:str -> path of the JSON file
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        with open(path, 'w') as file:
+            json.dump(self.report(), file, indent=2)
+
+profiler = Profiler()
@@ -0,0 +1,251 @@
+import glob
+import os
+import sqlite3
+import pandas as pd
+import pyarrow.dataset as ds
+from Scripts.utils import get_join_column
+from Scripts.utils import replace_date_to_month_column
+
+try:
+    import duckdb
+except ImportError:
+    duckdb = None
+
+# month_start is the first day of the month of ORDERDATE in the dialect of the backend
+kpi_queries = {'monthly': """
+                   SELECT {month_start} AS ORDERDATE, SUM(f.REVENUE) AS REVENUE, COUNT(*) AS ORDERSPERMONTH
+                   FROM fact_{name} f JOIN dim_ORDER o ON f.{order_key} = o.{order_key}
+                   GROUP BY 1 ORDER BY 1""",
+               'customer_segments': """
+                   SELECT c.CUSTOMERSEGMENT, SUM(f.REVENUE) AS REVENUE
+                   FROM fact_{name} f JOIN dim_CUSTOMER c ON f.{customer_key} = c.{customer_key}
+                   GROUP BY c.CUSTOMERSEGMENT ORDER BY REVENUE DESC""",
+               'LIFETIMEREVENUE': """
+                   SELECT c.CUSTOMERID, c.CUSTOMERNAME, SUM(f.REVENUE) AS LIFETIMEREVENUE
+                   FROM fact_{name} f JOIN dim_CUSTOMER c ON f.{customer_key} = c.{customer_key}
+                   GROUP BY c.CUSTOMERID, c.CUSTOMERNAME ORDER BY LIFETIMEREVENUE DESC, c.CUSTOMERID LIMIT ?""",
+               'LIFETIMEORDERVOLUME': """
+                   SELECT c.CUSTOMERID, c.CUSTOMERNAME, COUNT(*) AS LIFETIMEORDERVOLUME
+                   FROM fact_{name} f JOIN dim_CUSTOMER c ON f.{customer_key} = c.{customer_key}
+                   GROUP BY c.CUSTOMERID, c.CUSTOMERNAME ORDER BY LIFETIMEORDERVOLUME DESC, c.CUSTOMERID LIMIT ?"""}
+
+class SQLEngine():
+    """
+    A class used to query the saved star schema tables with SQL. The fact
+    table and the dimension tables are registered under their file names
+    (i.e. fact_SALES, dim_CUSTOMER). DuckDB scans the parquet files in
+    place with its vectorized, multi-threaded executor, the sqlite3 fallback
+    (used if duckdb is not installed) loads the tables into an in-memory
+    database. The KPIs of calculate_kpi are expressed as SQL queries and
+    returned in the layout of the pandas functions, so calculate_kpi
+    accepts the object instead of a dataframe.
+
+    ...
+
+    Attributes
+    ----------
+    backends:list
+    saved_directory:str
+    backend:str
+    connection:object
+    table_paths:dict
+    dataframe_name:str
+
+    Methods
+    -------
+    register_tables()
+    query()
+    get_month_start()
+    get_kpi_query()
+    get_monthly_table()
+    get_revenues_sum()
+    orders_per_month()
+    get_top_n_customers()
+    close()
+    """
+
+    backends = ['duckdb', 'sqlite']
+
+    def __init__(self, saved_directory:str, backend:str = None, threads:int = None):
+        """
+        Args:
+            saved_directory:str -> directory of the saved tables (i.e. output/SALES/StarSchema)
+            backend:str         -> any of ['duckdb', 'sqlite'], duckdb if installed if None
+            threads:int         -> number of threads of the duckdb executor, all cores if None
+        """
+        if backend is None:
+            backend = 'sqlite' if duckdb is None else 'duckdb'
+
+        if backend not in self.backends:
+            raise ValueError('Invalid backend provided: {}'.format(backend))
+        if backend == 'duckdb' and duckdb is None:
+            raise ImportError('duckdb is not installed, use the sqlite backend!')
+
+        self.saved_directory = saved_directory
+        self.backend = backend
+        self.table_paths = {}
+
+        # incremental runs save numbered parts (i.e. dim_CUSTOMER.00001.parquet) of the same table
+        for path in sorted(glob.glob(os.path.join(saved_directory, '*.parquet'))):
+            self.table_paths.setdefault(os.path.basename(path).split('.')[0], []).append(path)
+
+        fact_tables = [name for name in self.table_paths.keys() if name.startswith('fact_')]
+        if not fact_tables:
+            raise FileNotFoundError('No fact table found in {}!'.format(saved_directory))
+        self.dataframe_name = fact_tables[0][len('fact_'):]
+
+        if backend == 'duckdb':
+            self.connection = duckdb.connect(database=':memory:')
+            if threads:
+                self.connection.execute('PRAGMA threads={}'.format(int(threads)))
+        else:
+            self.connection = sqlite3.connect(':memory:')
+
+        self.register_tables()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def register_tables(self)->None:
+        """
+        Registers every saved table under its name, as view over the parquet
+        files for duckdb and as table loaded from them for sqlite. Columns of
+        hive partitioned tables (i.e. ORDERYEAR) are part of the table.
+        """
+        for name, paths in self.table_paths.items():
+            if self.backend == 'duckdb':
+                files = [file for path in paths for file in
+                         (sorted(glob.glob(os.path.join(path, '**', '*.parquet'), recursive=True)) if os.path.isdir(path) else [path])]
+                file_list = ', '.join("'{}'".format(file.replace("'", "''")) for file in files)
+                hive = ', hive_partitioning=true' if any(os.path.isdir(path) for path in paths) else ''
+                self.connection.execute('CREATE VIEW {} AS SELECT * FROM read_parquet([{}]{})'.format(name, file_list, hive))
+            else:
+                df = pd.concat([ds.dataset(path, format='parquet', partitioning='hive').to_table().to_pandas(date_as_object=False)
+                                for path in paths], ignore_index=True)
+                df = df[[column for column in df.columns if not column.startswith('__index_level_')]]
+                df.to_sql(name, self.connection, index=False)
+
+    def query(self, sql:str, parameters:list = None)->pd.core.frame.DataFrame:
+        """
+        Runs the given query and returns the result as dataframe.
+
+        Args:
+            sql:str          -> query over the registered tables
+            parameters:list  -> values of the ? placeholders
+        """
+        try:
+            if self.backend == 'duckdb':
+                return self.connection.execute(sql, parameters or []).fetchdf()
+            return pd.read_sql_query(sql, self.connection, params=parameters)
+        except Exception as error:
+            raise Exception('Caught this error: ' + repr(error))
+
+    def get_month_start(self, column:str)->str:
+        """
+        Returns the SQL expression of the first day of the month of the
+        given date column in the dialect of the backend.
+
+        Args:
+            column:str -> date column
+        """
+        if self.backend == 'duckdb':
+            return "date_trunc('month', {})".format(column)
+        return "strftime('%Y-%m-01', {})".format(column)
+
+    def get_kpi_query(self, kpi:str)->str:
+        """
+        Returns the query of the given KPI (see kpi_queries) for the saved
+        tables, joined through the surrogate keys if they were used.
+
+        Args:
+            kpi:str -> key of kpi_queries
+        """
+        fact_columns = self.query('SELECT * FROM fact_{} LIMIT 0'.format(self.dataframe_name)).columns
+        return kpi_queries[kpi].format(name=self.dataframe_name,
+                                       month_start=self.get_month_start('o.ORDERDATE'),
+                                       order_key=get_join_column('ORDER', fact_columns),
+                                       customer_key=get_join_column('CUSTOMER', fact_columns))
+
+    def get_monthly_table(self)->pd.core.frame.DataFrame:
+        """
+        Returns the revenue and the number of fact rows per month with one
+        row per month between the first and the last month, months without
+        orders included.
+        """
+        monthly = self.query(self.get_kpi_query('monthly'))
+        monthly['ORDERDATE'] = pd.to_datetime(monthly['ORDERDATE']).values.astype('datetime64[M]').astype('datetime64[ns]')
+        monthly = monthly.set_index('ORDERDATE').astype({'REVENUE':'float64', 'ORDERSPERMONTH':'int64'})
+
+        if len(monthly) == 0:
+            return monthly.reset_index()
+
+        months = pd.date_range(monthly.index.min(), monthly.index.max(), freq='MS', name='ORDERDATE')
+        return monthly.reindex(months, fill_value=0).reset_index()
+
+    def get_revenues_sum(self, variable:str = 'customersegment')->pd.core.frame.DataFrame:
+        """
+        Returns total revenues according to the given column (i.e.
+        customersegment or month) in the layout of calculate_kpi.get_revenues_sum.
+
+        Args:
+            variable:str -> case and space(' ')  insensitive column name matches
+                            any of ['CUSTOMERSEGMENT', 'MONTH']
+        """
+        variable = variable.upper().replace(' ', '')
+
+        if variable=='CUSTOMERSEGMENT':
+            result = self.query(self.get_kpi_query('customer_segments'))
+            return result.astype({'REVENUE':'float64'})
+        elif variable =='MONTH':
+            return replace_date_to_month_column(self.get_monthly_table()[['ORDERDATE', 'REVENUE']])
+        else:
+            raise ValueError("Invalid column provided!!")
+
+    def orders_per_month(self, aggregate_function:str='sum')->pd.core.frame.DataFrame:
+        """
+        Returns total orders per month according to the given aggtegate function
+        (i.e. sum or averageordervolume) in the layout of calculate_kpi.orders_per_month.
+
+        Args:
+            aggregate_function:str -> case and space(' ') insensitive column name matches any of
+                                      can contain ['sum', 'averageordervolume']
+        """
+        aggregate_function = aggregate_function.lower().replace(' ', '')
+        monthly = self.get_monthly_table()
+
+        if aggregate_function=='sum':
+            return replace_date_to_month_column(monthly[['ORDERDATE', 'ORDERSPERMONTH']])
+        elif aggregate_function=='averageordervolume':
+            result = monthly[['ORDERDATE']].copy()
+            result['AVERAGEGORDERVOLUMEPERMONTH'] = monthly['ORDERSPERMONTH'].expanding().mean()
+            return replace_date_to_month_column(result)
+        else:
+            raise NotImplementedError
+
+    def get_top_n_customers(self, n:int = 10, sort_column:str = 'LIFETIMEREVENUE')->pd.core.frame.DataFrame:
+        """
+        Returns the top n customers according to the given sort column (i.e.
+        LIFETIMEREVENUE or LIFETIMEORDERVOLUME) in the layout of
+        calculate_kpi.get_top_n_customers, ties ordered by CUSTOMERID.
+
+        Args:
+            n:int -> selects top n customers
+            sort_column:str -> case and space(' ') insensitive column name matches any of
+                               ['LIFETIMEREVENUE', 'LIFETIMEORDERVOLUME']
+        """
+        sort_column = sort_column.upper().replace(' ', '')
+
+        if sort_column not in ['LIFETIMEREVENUE', 'LIFETIMEORDERVOLUME']:
+            raise NotImplementedError
+
+        result = self.query(self.get_kpi_query(sort_column), [int(n)])
+        return result.astype({'CUSTOMERID':'int64', sort_column:'float64' if sort_column=='LIFETIMEREVENUE' else 'int64'})
+
+    def close(self)->None:
+        """
+        Closes the connection.
+        """
+        self.connection.close()
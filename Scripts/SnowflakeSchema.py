@@ -0,0 +1,245 @@
+import copy
+import glob
+import os
+import numpy as np
+import pandas as pd
+from Scripts.Profiler import profiler
+from Scripts.StarSchema import StarSchema
+from Scripts.utils import read_parquet_table
+from Scripts.utils import remove_files
+
+class SnowflakeSchema(StarSchema):
+    """
+    A class used to transform and save table according to snowflake-schema.
+    The tables are built like the star schema, then the given attributes
+    of the dimension tables (i.e. PRODUCTCATEGORY of dim_PRODUCT) are
+    normalized into their own tables (dim_PRODUCTCATEGORY) linked to the
+    dimension through int32 surrogate keys (PRODUCTCATEGORYKEY).
+
+    ...
+
+    Attributes
+    ----------
+    snowflake_features:dict
+    (and the attributes of StarSchema)
+
+    Methods
+    -------
+    init_params()
+    transform_table()
+    normalize_dimension_tables()
+    get_subdimensions()
+    denormalize_dimension_tables()
+    select_table_columns()
+    merge_tables()
+    get_lazy_dimension_tables()
+    """
+
+    default_snowflake_features = {'PRODUCT': ['PRODUCTCATEGORY'],
+                                  'CUSTOMER': ['CUSTOMERREGION']}
+
+    @property
+    def name(self):
+        return "SnowflakeSchema"
+
+    def init_params(self,
+                    dataframe_xlsx_path: str,
+                    xlsx_sheet_name:str,
+                    dimension_features_without_dimension_name_substring:dict,
+                    fact_table_columns_containing_dimension_name:list,
+                    chunksize:int = None,
+                    engine:str = 'pandas',
+                    infer_categories:bool = False,
+                    column_schema:dict = None,
+                    ingest_workers:int = None,
+                    snowflake_features:dict = None)->None:
+        """
+        This function initializes the schema with appropiate parameters or
+        raise errors otherwise. See StarSchema.init_params() for the other
+        arguments.
+
+        Args:
+            snowflake_features:dict -> dimension attributes to normalize into their
+                                       own tables per dimension (i.e. {'PRODUCT':
+                                       ['PRODUCTCATEGORY']}), default_snowflake_features
+                                       if None
+        """
+        self.snowflake_features = copy.deepcopy(snowflake_features or self.default_snowflake_features)
+        super().init_params(dataframe_xlsx_path, xlsx_sheet_name,
+                            dimension_features_without_dimension_name_substring,
+                            fact_table_columns_containing_dimension_name,
+                            chunksize, engine, infer_categories, column_schema, ingest_workers)
+
+    def transform_table(self,
+                        save_directory:str = 'Output',
+                        verbose:bool = True,
+                        surrogate_keys:bool = False,
+                        partition_fact_by:str = None,
+                        build_aggregates:bool = False,
+                        workers:int = None)->None:
+        """
+        This function transforms the given table according to snowflake
+        schema and saves resulted tables in the given directory. See
+        StarSchema.transform_table() for the arguments, the normalized
+        tables are rebuilt by every run, so there are no incremental runs
+        or slowly changing dimensions.
+        """
+        # normalized tables of an earlier run with other snowflake_features are stale
+        remove_files(glob.glob(os.path.join(save_directory, self.dataframe_name, self.name, 'dim_*.parquet')))
+        super().transform_table(save_directory, verbose, surrogate_keys, False,
+                                partition_fact_by, build_aggregates, workers)
+        self.normalize_dimension_tables(verbose, workers)
+
+    def normalize_dimension_tables(self, verbose:bool = True, workers:int = None)->None:
+        """
+        Moves the snowflake_features of the saved dimension tables into
+        their own tables. Every distinct value gets an int32 surrogate key
+        in the order of the sorted values, the dimension table keeps the key
+        in place of the value.
+
+        Args:
+            verbose:bool -> decides wheather to print putput
+            workers:int  -> number of processes saving the tables at the same time
+        """
+        tables = []
+
+        for key, columns in self.snowflake_features.items():
+            path = os.path.join(self.save_directory, self.get_part_name('dim_'+key))
+            if not os.path.exists(path):
+                raise ValueError('Invalid dimension provided: {}'.format(key))
+
+            dim_table = read_parquet_table(path)
+
+            for column in columns:
+                if column not in dim_table.columns or column == key+'ID':
+                    raise ValueError('Invalid column of dim_{} provided: {}'.format(key, column))
+
+                outname = self.get_part_name('dim_'+column)
+                with profiler.stage('dimension_projection', len(dim_table)) as record:
+                    record['table'] = outname
+                    codes, values = pd.factorize(dim_table[column], sort=True, na_sentinel=None)
+                    tables.append((outname, pd.DataFrame({column+'KEY': np.arange(len(values), dtype='int32'),
+                                                          column: values}), False))
+                    dim_table[column] = codes.astype('int32')
+                    dim_table = dim_table.rename(columns={column: column+'KEY'})
+
+                if verbose:
+                    print('DIM_{} Table: '.format(column), [column+'KEY', column])
+
+            tables.append((self.get_part_name('dim_'+key), dim_table, False))
+
+        self.save_tables(tables, verbose, workers)
+
+    def get_subdimensions(self, table_columns:dict)->dict:
+        """
+        Returns the name of the dimension table referencing every
+        normalized table (i.e. {'dim_PRODUCTCATEGORY': 'dim_PRODUCT'}).
+
+        Args:
+            table_columns:dict -> column names per table name
+        """
+        subdimensions = {}
+        for key in table_columns.keys():
+            if not key.startswith('dim_'):
+                continue
+            join_key = key.split('_', 1)[1]+'KEY'
+            parents = [parent for parent, columns in table_columns.items()
+                       if parent.startswith('dim_') and parent != key and join_key in columns]
+            if join_key in table_columns[key] and parents:
+                subdimensions[key] = parents[0]
+        return subdimensions
+
+    def denormalize_dimension_tables(self, dimension_tables:dict)->dict:
+        """
+        Joins the normalized tables back into the dimension tables
+        referencing them and returns the dimension tables of the star
+        schema, the normalized values take the place of their keys.
+
+        Args:
+            dimension_tables:dict -> dimension table per table name
+        """
+        table_columns = {key:list(table.columns) for key, table in dimension_tables.items()}
+        dimension_tables = dict(dimension_tables)
+
+        for key, parent in self.get_subdimensions(table_columns).items():
+            join_key = key.split('_', 1)[1]+'KEY'
+            subdimension = dimension_tables.pop(key)
+            values = [column for column in subdimension.columns if column != join_key]
+            columns = []
+            for column in dimension_tables[parent].columns:
+                columns.extend(values if column == join_key else [column])
+            dimension_tables[parent] = pd.merge(dimension_tables[parent], subdimension, on=join_key, how='inner')[columns]
+
+        return dimension_tables
+
+    def select_table_columns(self,
+                             table_columns:dict,
+                             columns:list = None,
+                             filters:list = None)->dict:
+        """
+        Decides which saved tables and columns have to be read like
+        StarSchema.select_table_columns(), a normalized table is read
+        together with the dimension table referencing it and the keys
+        linking them.
+
+        Args:
+            table_columns:dict -> saved column names per table name
+            columns:list       -> requested columns, all if None
+            filters:list       -> (column, operator, value) tuples
+        """
+        selected = super().select_table_columns(table_columns, columns, filters)
+        if columns is None:
+            return selected
+
+        fact_key = next(key for key in table_columns.keys() if key.startswith('fact'))
+
+        for key, parent in self.get_subdimensions(table_columns).items():
+            if key not in selected:
+                continue
+
+            join_key = key.split('_', 1)[1]+'KEY'
+            parent_join_id = self.get_join_column(parent.split('_')[1], table_columns[fact_key])
+            selected[key] = [column for column in table_columns[key] if column in selected[key] or column == join_key]
+            selected[parent] = [column for column in table_columns[parent]
+                                if column in selected.get(parent, []) or column in [parent_join_id, join_key]]
+            if parent_join_id not in selected[fact_key]:
+                selected[fact_key].append(parent_join_id)
+
+        return selected
+
+    def merge_tables(self,
+                     fact_table:pd.core.frame.DataFrame,
+                     dimension_tables:dict,
+                     columns:list = None)->pd.core.frame.DataFrame:
+        """
+        Joins the normalized tables into the dimension tables and those to
+        the fact table, see StarSchema.merge_tables().
+
+        Args:
+            fact_table:pd.core.frame.DataFrame -> fact table
+            dimension_tables:dict              -> dimension and normalized table per table name
+            columns:list                       -> columns to return, all if None
+        """
+        return super().merge_tables(fact_table, self.denormalize_dimension_tables(dimension_tables), columns)
+
+    def get_lazy_dimension_tables(self,
+                                  folder_directory:str=None,
+                                  dataframe_name:str=None)->dict:
+        """
+        Returns a LazyDimension per dimension table of the star schema like
+        StarSchema.get_lazy_dimension_tables(), the normalized tables are
+        joined into the dimension tables referencing them. So the inherited
+        iter_merged_table() and compute_aggregates() join the fact table
+        against the denormalized dimensions.
+
+        Args:
+            folder_directory:str   -> directory to save output
+            dataframe_name:str     -> name of the saved table/datafrmae
+        """
+        lazy_dimensions = super().get_lazy_dimension_tables(folder_directory, dataframe_name)
+        table_columns = {key:dimension.columns for key, dimension in lazy_dimensions.items()}
+
+        for key, parent in self.get_subdimensions(table_columns).items():
+            lazy_dimensions[parent].join(lazy_dimensions.pop(key), key.split('_', 1)[1]+'KEY')
+
+        return lazy_dimensions
@@ -1,13 +1,27 @@
 import copy
 import glob
 import os
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator
 from Scripts.DataSchemas import DataSchemas
+from Scripts.DimensionKeyIndex import DimensionKeyIndex
+from Scripts.KPIAggregates import KPIAggregates
+from Scripts.LazyDimension import LazyDimension
+from Scripts.Profiler import profiler
+from Scripts.SQLEngine import SQLEngine
+from Scripts.VersionedKeyIndex import VersionedKeyIndex
 from Scripts.utils import convert_date_column
 from Scripts.utils import create_directory
-from Scripts.utils import save_table_as_parquet
-from Scripts.utils import read_xlsx
-from Scripts.utils import remove_spaces_and_uppercase_df_columns
+from Scripts.utils import filters_to_expression
+from Scripts.utils import get_join_column
+from Scripts.utils import get_parquet_columns
+from Scripts.utils import hash_rows
+from Scripts.utils import read_parquet_table
+from Scripts.utils import remove_files
 from Scripts.utils import validate_directory
 
 class StarSchema(DataSchemas):
@@ -19,10 +33,22 @@ class StarSchema(DataSchemas):
     Attributes
     ----------
     dataframe
+    table
     dataframe_name
+    dataframe_path
+    xlsx_sheet_name
+    chunksize
+    engine
+    column_schema
+    categorical_columns
+    categorical_max_cardinality_ratio
+    fact_row_group_size
     dimension_features_without_dimension_name_substring
     fact_table_columns_containing_dimension_name
     save_directory
+    sources
+    ingest_workers
+    ingest_report
     
     Methods
     -------
@@ -30,12 +56,47 @@ class StarSchema(DataSchemas):
     drop_default_dimension_table_columns()
     valid_dimension_column()
     add_column_to_dim_table()
+    get_table_columns()
+    get_registry_directory()
+    load_key_indexes()
+    build_dimension_table()
+    build_versioned_dimension_table()
+    close_dimension_versions()
+    replace_natural_keys()
+    replace_arrow_natural_keys()
+    get_part_name()
+    get_saved_parts()
+    get_next_part_number()
+    get_fact_row_hashes_path()
+    load_fact_row_hashes()
+    save_fact_row_hashes()
+    get_fact_table_path()
+    has_saved_history()
+    add_partition_columns()
+    add_arrow_partition_columns()
+    append_fact_table()
+    validate_saved_layout()
+    get_aggregates_directory()
+    prepare_aggregates()
+    stream_and_save_tables()
     create_and_save_tables()
+    create_and_save_arrow_tables()
     transform_table()
+    select_table_columns()
     get_transformed_tables()
+    get_aggregates()
+    get_lazy_dimension_tables()
+    get_sql_engine()
+    get_fact_row_groups()
+    compute_aggregates()
+    get_join_column()
     get_merged_table()
+    merge_tables()
+    iter_merged_table()
     """
     
+    fact_row_group_size = 128 * 1024
+
     @property
     def name(self):
         return "StarSchema"
@@ -44,15 +105,24 @@ class StarSchema(DataSchemas):
                     dataframe_xlsx_path: str,
                     xlsx_sheet_name:str,
                     dimension_features_without_dimension_name_substring:dict,
-                    fact_table_columns_containing_dimension_name:list)->None:
+                    fact_table_columns_containing_dimension_name:list,
+                    chunksize:int = None,
+                    engine:str = 'pandas',
+                    infer_categories:bool = False,
+                    column_schema:dict = None,
+                    ingest_workers:int = None)->None:
         """
         This function initializes the schema with appropiate parameters or 
         raise errors otherwise.
 
         Args:
 
-            dataframe_xlsx_path:str -> Path of the dataframe_name
-            xlsx_sheet_name:str     -> Sheet name in the excel
+            dataframe_xlsx_path:str -> Path of the dataframe_name (xlsx, or csv 
+                                       when streaming), a glob pattern (i.e. 
+                                       regions/*.xlsx) or a list of them
+            xlsx_sheet_name:str     -> Sheet name in the excel or a list of sheet 
+                                       names read from every excel file, the first
+                                       one names the saved tables
 
             dimension_features_without_dimension_name_substring:dict -> dimension features which 
                                                                         doesn't contain dimension 
@@ -62,17 +132,38 @@ class StarSchema(DataSchemas):
                                                                  contain dimension name as 
                                                                  substring.
 
+            chunksize:int           -> if provided the source is not loaded here but 
+                                       streamed in batches of chunksize rows 
+                                       while transforming.
+
+            engine:str              -> 'pandas' loads the source as dataframe, 'arrow'
+                                       keeps it as pyarrow table which is projected 
+                                       and written without converting it to pandas.
+
+            infer_categories:bool   -> decides wheather to store low-cardinality text 
+                                       columns (i.e. CUSTOMERSEGMENT) as pandas 
+                                       categoricals or arrow dictionary arrays, the 
+                                       typing is kept in the saved parquet files, 
+                                       ignored when streaming.
+
+            column_schema:dict      -> storage type per column (i.e. {'ORDERID':'int32', 
+                                       'ORDERDATE':'date32'}) applied when the tables 
+                                       are written, 'compact' for DataSchemas.compact_column_schema, 
+                                       see DataSchemas.set_column_schema().
+
+            ingest_workers:int      -> number of processes parsing the sources at the 
+                                       same time if more than one source is given, 
+                                       see iter_source_batches().
+
         """
         
-        self.dataframe =read_xlsx(dataframe_xlsx_path, xlsx_sheet_name)
-        self.dataframe_name = xlsx_sheet_name.upper()
         self.dimension_features_without_dimension_name_substring = dimension_features_without_dimension_name_substring
         self.fact_table_columns_containing_dimension_name = fact_table_columns_containing_dimension_name
-        self.save_directory = None
-        
-        remove_spaces_and_uppercase_df_columns(self.dataframe)
+        self.load_source(dataframe_xlsx_path, xlsx_sheet_name, chunksize, engine, 
+                         infer_categories, column_schema, ingest_workers)
+
         print(self.name, ': parameter Initialized!!')
-        
+
     def drop_default_dimension_table_columns(self,
                                      df:pd.core.frame.DataFrame)->pd.core.frame.DataFrame:
 
@@ -120,10 +211,544 @@ class StarSchema(DataSchemas):
         else:
             return False
 
+    def get_table_columns(self, columns:list)->tuple:
+        """
+        This function splits the given source columns into dimension 
+        table columns and fact table columns without touching any data.
+        Returns the same layout create_and_save_tables() produces.
+
+        Args:
+            columns:list -> normalized column names of the source table
+        """
+        dim_features = copy.deepcopy(self.dimension_features_without_dimension_name_substring)
+        default_columns = [column for value in dim_features.values() for column in value]
+        fact_columns = [column for column in columns if column not in default_columns]
+
+        for key, value in dim_features.items():
+            for column in list(fact_columns):
+                if self.valid_dimension_column(key, column):
+                    value.append(column)
+                    if column!=key+'ID':
+                        fact_columns.remove(column)
+
+        return dim_features, fact_columns
+
+    def get_registry_directory(self)->str:
+        """
+        Returns the directory holding the persisted dimension key 
+        indexes of the saved tables.
+        """
+        return os.path.join(self.save_directory, '_registry')
+
+    def load_key_indexes(self, dimension_names:list, persisted:bool = True, versioned:bool = False)->dict:
+        """
+        Returns a DimensionKeyIndex for every given dimension, loaded from 
+        the registry directory if persisted is True or empty otherwise.
+
+        Args:
+            dimension_names:list -> names of the dimensions (i.e. PRODUCT)
+            persisted:bool       -> decides wheather to load the saved indexes
+            versioned:bool       -> decides wheather to return VersionedKeyIndex 
+                                    objects of slowly changing dimensions
+        """
+        index_class = VersionedKeyIndex if versioned else DimensionKeyIndex
+        if persisted:
+            return {key:index_class.load(self.get_registry_directory(), key) for key in dimension_names}
+        return {key:index_class(key) for key in dimension_names}
+
+    def build_dimension_table(self,
+                              dim_table:pd.core.frame.DataFrame,
+                              key_index:DimensionKeyIndex,
+                              surrogate_keys:bool = False)->tuple:
+        """
+        This function deduplicates the dimension table on its natural key 
+        (i.e. PRODUCTID) and registers the members in the key index. Adds the 
+        int32 surrogate key as first column if surrogate_keys is True. 
+        Returns the dimension table and a boolean mask of the members which 
+        were not registered before.
+
+        Args:
+            dim_table:pd.core.frame.Dataframe -> projected dimension columns
+            key_index:DimensionKeyIndex        -> key index of the dimension
+            surrogate_keys:bool                -> decides wheather to add the surrogate key
+        """
+        dim_table = dim_table.drop_duplicates(subset=[key_index.natural_key])
+        keys, is_new = key_index.assign(dim_table[key_index.natural_key])
+
+        if surrogate_keys:
+            dim_table = dim_table.copy()
+            dim_table.insert(0, key_index.surrogate_key, keys)
+
+        return dim_table, is_new
+
+    def build_versioned_dimension_table(self,
+                                        dim_table:pd.core.frame.DataFrame,
+                                        key_index:VersionedKeyIndex,
+                                        valid_from:pd.Timestamp)->tuple:
+        """
+        This function deduplicates the dimension table on its natural key, 
+        keeping the last row of every member, and compares the hash of the 
+        attributes of every member with the one of its current version. 
+        The last row of a member in the batch is its state, so every fact 
+        row of the batch is linked to that version, earlier rows of the 
+        batch with other attributes don't get a version of their own. 
+        Returns the new versions (new members and changed members) with 
+        their surrogate key and the <DIMENSION>VALIDFROM, <DIMENSION>VALIDTO 
+        and <DIMENSION>ISCURRENT columns, together with the surrogate keys 
+        of the versions they replace.
+
+        Args:
+            dim_table:pd.core.frame.Dataframe -> projected dimension columns
+            key_index:VersionedKeyIndex        -> key index of the dimension
+            valid_from:pd.Timestamp            -> start of the validity of the new versions
+        """
+        dim_table = dim_table.drop_duplicates(subset=[key_index.natural_key], keep='last')
+        attributes = [column for column in dim_table.columns if column != key_index.natural_key]
+        keys, is_new, previous_keys = key_index.assign(dim_table[key_index.natural_key], hash_rows(dim_table[attributes]))
+
+        dim_table = dim_table[is_new].copy()
+        dim_table.insert(0, key_index.surrogate_key, keys[is_new])
+        dim_table[key_index.dimension_name+'VALIDFROM'] = valid_from
+        dim_table[key_index.dimension_name+'VALIDTO'] = pd.NaT
+        dim_table[key_index.dimension_name+'ISCURRENT'] = True
+
+        previous_keys = previous_keys[is_new]
+        return dim_table, previous_keys[previous_keys > 0]
+
+    def close_dimension_versions(self,
+                                 dimension_name:str,
+                                 surrogate_keys:np.ndarray,
+                                 valid_to:pd.Timestamp)->None:
+        """
+        Ends the validity of the given versions of the saved dimension 
+        table. Only the key column of every parquet part is read to find 
+        the versions, the parts containing none of them are not rewritten.
+
+        Args:
+            dimension_name:str       -> name of the dimension (i.e. CUSTOMER)
+            surrogate_keys:np.ndarray-> surrogate keys of the replaced versions
+            valid_to:pd.Timestamp    -> end of the validity of the versions
+        """
+        surrogate_key = dimension_name+'KEY'
+        table_files = self.get_saved_table_files(self.save_directory, 'dim_{}.*parquet'.format(dimension_name))
+
+        for file in table_files.get('dim_'+dimension_name, []):
+            is_closed = read_parquet_table(file, columns=[surrogate_key])[surrogate_key].isin(surrogate_keys).values
+            if not is_closed.any():
+                continue
+
+            with profiler.stage('close_versions', int(is_closed.sum())) as record:
+                record['table'] = os.path.basename(file)
+                dim_table = read_parquet_table(file)
+                dim_table.loc[is_closed, dimension_name+'VALIDTO'] = valid_to
+                dim_table.loc[is_closed, dimension_name+'ISCURRENT'] = False
+                temporary_name = os.path.basename(file)+'.{}.tmp'.format(os.getpid())
+                self.save_tables([(temporary_name, dim_table, False)], False)
+                os.replace(os.path.join(self.save_directory, temporary_name), file)
+
+    def replace_natural_keys(self,
+                             fact:pd.core.frame.DataFrame,
+                             key_indexes:dict)->pd.core.frame.DataFrame:
+        """
+        This function replaces the natural key columns of the fact table 
+        with the int32 surrogate keys of the given key indexes in place.
+
+        Args:
+            fact:pd.core.frame.Dataframe -> fact table
+            key_indexes:dict             -> DimensionKeyIndex per dimension name
+        """
+        for key_index in key_indexes.values():
+            if key_index.natural_key in fact.columns:
+                position = fact.columns.get_loc(key_index.natural_key)
+                fact.insert(position, key_index.surrogate_key, key_index.lookup(fact[key_index.natural_key]))
+                del fact[key_index.natural_key]
+        return fact
+
+    def replace_arrow_natural_keys(self,
+                                   fact:pa.Table,
+                                   key_indexes:dict)->pa.Table:
+        """
+        This function replaces the natural key columns of the pyarrow fact 
+        table with the int32 surrogate keys of the given key indexes and 
+        returns the new table.
+
+        Args:
+            fact:pa.Table     -> fact table
+            key_indexes:dict  -> DimensionKeyIndex per dimension name
+        """
+        for key_index in key_indexes.values():
+            if key_index.natural_key in fact.column_names:
+                position = fact.column_names.index(key_index.natural_key)
+                keys = key_index.lookup(fact.column(key_index.natural_key).to_pandas())
+                fact = fact.set_column(position, key_index.surrogate_key, pa.array(keys))
+        return fact
+
+    def get_part_name(self, table_name:str, part_number:int = None)->str:
+        """
+        Returns the parquet file name of the given table. Tables written by 
+        incremental runs are split into numbered parts (i.e. 
+        dim_PRODUCT.00001.parquet) which get_transformed_tables() concatenates.
+
+        Args:
+            table_name:str   -> name of the table (i.e. dim_PRODUCT)
+            part_number:int  -> number of the incremental run, None for a full run
+        """
+        if part_number is None:
+            return table_name+'.parquet'
+        return '{}.{:05d}.parquet'.format(table_name, part_number)
+
+    def get_saved_parts(self)->list:
+        """
+        Returns the paths of the parquet parts written by incremental runs 
+        into the save directory.
+        """
+        files = glob.glob(os.path.join(self.save_directory, "*.*.parquet"))
+        return [file for file in files if os.path.basename(file).split('.')[1].isdigit()]
+
+    def get_next_part_number(self)->int:
+        """
+        Returns the part number of the next incremental run.
+        """
+        part_numbers = [int(os.path.basename(file).split('.')[1]) for file in self.get_saved_parts()]
+        partition_files = glob.glob(os.path.join(self.save_directory, '*.parquet', '**', 'part-*.parquet'), recursive=True)
+        part_numbers += [int(os.path.basename(file).split('.')[0].split('-')[1]) for file in partition_files]
+        return max(part_numbers, default=0) + 1
+
+    def get_fact_table_path(self)->str:
+        """
+        Returns the path of the fact table saved by a full run, a parquet 
+        file or a partitioned parquet directory.
+        """
+        return os.path.join(self.save_directory, self.get_part_name('fact_'+self.dataframe_name))
+
+    def add_partition_columns(self,
+                              fact:pd.core.frame.DataFrame,
+                              dates:pd.core.series.Series)->list:
+        """
+        This function adds the year and month of the given dates as partition 
+        columns (i.e. ORDERDATE -> ORDERYEAR, ORDERMONTH) to the fact table 
+        in place and returns their names.
+
+        Args:
+            fact:pd.core.frame.Dataframe   -> fact table
+            dates:pd.core.series.Series    -> date column aligned with the fact table
+        """
+        prefix = dates.name.replace('DATE', '')
+        dates = dates.loc[fact.index]
+        if dates.isnull().any():
+            raise ValueError('Fact table can\'t be partitioned by {}, it contains missing dates!'.format(dates.name))
+        fact[prefix+'YEAR'] = dates.dt.year.values
+        fact[prefix+'MONTH'] = dates.dt.month.values
+        return [prefix+'YEAR', prefix+'MONTH']
+
+    def add_arrow_partition_columns(self,
+                                    fact:pa.Table,
+                                    dates:pa.ChunkedArray,
+                                    date_column:str)->tuple:
+        """
+        This function appends the year and month of the given dates as 
+        partition columns to the pyarrow fact table like 
+        add_partition_columns() and returns the new table and their names.
+
+        Args:
+            fact:pa.Table           -> fact table
+            dates:pa.ChunkedArray   -> date column aligned with the fact table
+            date_column:str         -> name of the date column (i.e. ORDERDATE)
+        """
+        if dates.null_count:
+            raise ValueError('Fact table can\'t be partitioned by {}, it contains missing dates!'.format(date_column))
+
+        prefix = date_column.replace('DATE', '')
+        months = dates.to_numpy().astype('datetime64[M]').astype('int64')
+        fact = fact.append_column(prefix+'YEAR', pa.array(months // 12 + 1970))
+        fact = fact.append_column(prefix+'MONTH', pa.array(months % 12 + 1))
+        return fact, [prefix+'YEAR', prefix+'MONTH']
+
+    def append_fact_table(self,
+                          writers:dict,
+                          fact:pd.core.frame.DataFrame,
+                          dates:pd.core.series.Series = None,
+                          part_number:int = None)->None:
+        """
+        This function appends the fact table to its parquet file, or to the 
+        hive style partitioned parquet directory keyed by year and month if 
+        the dates to partition by are given. The fact rows are deduplicated 
+        by the caller, so the KPI cubes are built from the written rows.
+
+        Args:
+            writers:dict                   -> open parquet writers keyed by output file name
+            fact:pd.core.frame.Dataframe   -> deduplicated fact table
+            dates:pd.core.series.Series    -> date column to partition by
+            part_number:int                -> number of the incremental run, None for a full run
+        """
+        if dates is None:
+            outname = self.get_part_name('fact_'+self.dataframe_name, part_number)
+            self.append_batch(writers, outname, fact, False, row_group_size=self.fact_row_group_size)
+        else:
+            outname = self.get_part_name('fact_'+self.dataframe_name)
+            partition_columns = self.add_partition_columns(fact, dates)
+            self.append_batch(writers, outname, fact, False, partition_columns,
+                              'part-{:05d}.parquet'.format(part_number or 0), self.fact_row_group_size)
+
+    def get_fact_row_hashes_path(self)->str:
+        """
+        Returns the path of the registry file holding the hashes of the 
+        saved fact rows.
+        """
+        return os.path.join(self.get_registry_directory(), 'fact_{}_row_hashes.parquet'.format(self.dataframe_name))
+
+    def load_fact_row_hashes(self)->pd.Index:
+        """
+        Returns the hashes of the natural key combinations of the fact rows 
+        already saved, raises an error if saved tables exist without a 
+        registry.
+        """
+        path = self.get_fact_row_hashes_path()
+
+        if os.path.exists(path):
+            return pd.Index(pd.unique(pd.read_parquet(path, engine='pyarrow')['ROWHASH'].values))
+
+        if glob.glob(os.path.join(self.save_directory, '*.parquet')):
+            raise ValueError('No key registry found in {}, run a full transformation first!'.format(self.save_directory))
+
+        return pd.Index(np.array([], dtype='uint64'))
+
+    def save_fact_row_hashes(self, hashes:pd.Index)->None:
+        """
+        Persists the hashes of the saved fact rows in the registry directory.
+
+        Args:
+            hashes:pd.Index -> hashes of the natural key combinations
+        """
+        create_directory(self.get_registry_directory())
+        pd.DataFrame({'ROWHASH': hashes.values}).to_parquet(self.get_fact_row_hashes_path(), index=False)
+
+    def has_saved_history(self)->bool:
+        """
+        Returns True if the saved dimension tables are slowly changing 
+        (type 2) dimensions holding the versions of their members.
+        """
+        dim_files = sorted(glob.glob(os.path.join(self.save_directory, 'dim_*.parquet')))
+        return bool(dim_files) and any(column.endswith('VALIDFROM') for column in get_parquet_columns(dim_files[0]))
+
+    def validate_saved_layout(self, surrogate_keys:bool, partition_fact_by:str, scd2:bool = False)->None:
+        """
+        Raises an error if the already saved fact table was linked to its 
+        dimensions through different keys or partitioned differently than 
+        requested, or if the saved dimension tables keep their history 
+        differently than requested.
+
+        Args:
+            surrogate_keys:bool    -> decides wheather the fact table is linked 
+                                      through surrogate keys
+            partition_fact_by:str  -> date column the fact table is partitioned by
+            scd2:bool              -> decides wheather the dimension tables are 
+                                      slowly changing (type 2) dimensions
+        """
+        if glob.glob(os.path.join(self.save_directory, 'dim_*.parquet')):
+            saved_scd2 = self.has_saved_history()
+            if saved_scd2 != scd2:
+                raise ValueError('Saved dimension tables {} their history, rerun with scd2={}!'.format(
+                    'keep' if saved_scd2 else "don't keep", saved_scd2))
+
+        path = self.get_fact_table_path()
+        if os.path.exists(path):
+            saved_partitioned = os.path.isdir(path)
+            if saved_partitioned != bool(partition_fact_by):
+                raise ValueError('Saved fact table is {}partitioned, rerun with matching partition_fact_by!'.format(
+                    '' if saved_partitioned else 'not '))
+
+            saved_columns = ds.dataset(path, format='parquet', partitioning='hive').schema.names
+            saved_surrogate_keys = any(column.endswith('KEY') for column in saved_columns)
+            if saved_surrogate_keys != surrogate_keys:
+                raise ValueError('Saved tables use {} keys, rerun with surrogate_keys={}!'.format(
+                    'surrogate' if saved_surrogate_keys else 'natural', saved_surrogate_keys))
+
+    def get_aggregates_directory(self)->str:
+        """
+        Returns the directory holding the pre-aggregated KPI cubes of the 
+        saved tables.
+        """
+        return os.path.join(self.save_directory, '_aggregates')
+
+    def prepare_aggregates(self, build_aggregates:bool, incremental:bool)->KPIAggregates:
+        """
+        Returns the KPI cubes to update while saving the tables or None if 
+        no cubes have to be maintained. Full runs start from empty cubes and 
+        drop stale ones, incremental runs continue the saved cubes and 
+        bootstrap them from the saved tables if they were never built.
+
+        Args:
+            build_aggregates:bool -> decides wheather to build the cubes
+            incremental:bool      -> decides wheather the saved tables are kept
+        """
+        if not incremental:
+            remove_files([self.get_aggregates_directory()])
+            return KPIAggregates() if build_aggregates else None
+
+        aggregates = KPIAggregates.load(self.get_aggregates_directory())
+
+        if aggregates is None and build_aggregates:
+            aggregates = KPIAggregates()
+            if glob.glob(os.path.join(self.save_directory, '*.parquet')):
+                aggregates.update(self.get_merged_table(verbose=False, columns=KPIAggregates.columns))
+
+        return aggregates
+
+    @profiler.profile()
+    def stream_and_save_tables(self,
+                               save_directory:str,
+                               verbose:bool = True,
+                               surrogate_keys:bool = False,
+                               incremental:bool = False,
+                               partition_fact_by:str = None,
+                               build_aggregates:bool = False,
+                               scd2:bool = False):
+        """
+        This function splits every source batch into dimension tables 
+        and fact table and appends them to the parquet files in the 
+        given directory. Peak memory is bounded by the batch size plus
+        the key indexes of the dimensions.
+
+        Fact rows are deduplicated across the batches through the hashes of 
+        the written rows and dimension members through their key index, so 
+        the saved tables match the ones of an in-memory run.
+
+        In incremental mode the saved tables are kept. Source rows which 
+        were saved by an earlier run and dimension members which are already 
+        registered are skipped, the remaining rows are written as new 
+        numbered parquet parts. 
+
+        With scd2 the dimension members of every batch, including the rows 
+        saved by an earlier run, are compared with their current version 
+        through the attribute hashes of the key index (see 
+        build_versioned_dimension_table()). Only new and changed members are 
+        written, the replaced versions are closed at the end of the run 
+        (see close_dimension_versions()) and the fact rows are linked to 
+        the version current when they are loaded. The first scd2 run starts 
+        the history, later runs have to be incremental so the saved 
+        versions are kept.
+
+        Args:
+            save_directory:str   -> directory to save output
+            verbose:bool         ->  decides wheather to print putput
+            surrogate_keys:bool  -> decides wheather to link the fact table 
+                                    through int32 surrogate keys
+            incremental:bool     -> decides wheather to append to the saved tables
+            partition_fact_by:str-> date column (i.e. ORDERDATE) to partition 
+                                    the fact table by year and month
+            build_aggregates:bool-> decides wheather to build the KPI cubes, 
+                                    saved cubes are always updated in 
+                                    incremental mode
+            scd2:bool            -> decides wheather to keep the history of 
+                                    the dimension members, needs surrogate_keys
+        """
+
+        self.save_directory = os.path.join(save_directory, self.dataframe_name, self.name)
+        create_directory(self.save_directory)
+
+        if incremental:
+            self.validate_saved_layout(surrogate_keys, partition_fact_by, scd2)
+            part_number = self.get_next_part_number()
+        elif scd2 and self.has_saved_history():
+            raise ValueError('A full run would drop the saved versions of the dimension members, rerun with incremental=True!')
+        else:
+            remove_files(self.get_saved_parts() + [self.get_fact_table_path()])
+            part_number = None
+
+        dim_features, fact_columns, id_columns = None, None, None
+        key_indexes, written_indexes = {}, {}
+        fact_row_hashes = None
+        written_fact_rows = pd.Index(np.array([], dtype='uint64'))
+        writers = {}
+        aggregates = self.prepare_aggregates(build_aggregates, incremental)
+        valid_from = pd.Timestamp.now().floor('s')
+        closed_keys = {}
+
+        try:
+            for batch in self.iter_batches():
+                with profiler.stage('process_batch', len(batch)):
+                    if dim_features is None:
+                        dim_features, fact_columns = self.get_table_columns(list(batch.columns))
+                        key_indexes = self.load_key_indexes(dim_features.keys(), 
+                                                            incremental if scd2 else surrogate_keys or incremental, 
+                                                            scd2)
+                        written_indexes = self.load_key_indexes(dim_features.keys(), False)
+                        id_columns = [key+'ID' for key in dim_features.keys() if key+'ID' in fact_columns]
+                        fact_row_hashes = self.load_fact_row_hashes() if incremental else pd.Index(np.array([], dtype='uint64'))
+
+                        if verbose:
+                            for key in dim_features.keys():
+                                print('DIM_{} Table: '.format(key), dim_features[key])
+                            print('\nFact Table:', fact_columns)
+
+                    if scd2:
+                        for key, value in dim_features.items():
+                            dim_batch, previous_keys = self.build_versioned_dimension_table(self.project_table(batch, value), 
+                                                                                            key_indexes[key], valid_from)
+                            closed_keys.setdefault(key, []).append(previous_keys)
+
+                            if len(dim_batch):
+                                self.append_batch(writers, self.get_part_name('dim_'+key, part_number), dim_batch, False)
+
+                    row_hashes = hash_rows(batch[id_columns])
+                    if incremental:
+                        is_new_row = fact_row_hashes.get_indexer(row_hashes) == -1
+                        batch, row_hashes = batch[is_new_row], row_hashes[is_new_row]
+                        if batch.empty:
+                            continue
+                    fact_row_hashes = fact_row_hashes.append(pd.Index(row_hashes)).unique()
+
+                    for key, value in ({} if scd2 else dim_features).items():
+                        dim_batch, is_new = self.build_dimension_table(self.project_table(batch, value), 
+                                                                       key_indexes[key], surrogate_keys)
+
+                        if not incremental:
+                            _, is_new = written_indexes[key].assign(dim_batch[key_indexes[key].natural_key])
+
+                        if is_new.any():
+                            self.append_batch(writers, self.get_part_name('dim_'+key, part_number), dim_batch[is_new], False)
+
+                    fact_batch, written_fact_rows = self.drop_written_rows(self.project_table(batch, fact_columns), written_fact_rows,
+                                                                           self.get_part_name('fact_'+self.dataframe_name, part_number))
+                    if aggregates is not None:
+                        aggregates.update(batch.loc[fact_batch.index])
+
+                    if surrogate_keys:
+                        self.replace_natural_keys(fact_batch, key_indexes)
+
+                    dates = batch[partition_fact_by] if partition_fact_by else None
+                    self.append_fact_table(writers, fact_batch, dates, part_number)
+        finally:
+            for writer in writers.values():
+                writer.close()
+
+        for key, keys in closed_keys.items():
+            keys = np.concatenate(keys)
+            if len(keys):
+                self.close_dimension_versions(key, keys, valid_from)
+
+        if dim_features is not None:
+            for key_index in key_indexes.values():
+                key_index.save(self.get_registry_directory())
+            self.save_fact_row_hashes(fact_row_hashes)
+
+        if aggregates is not None:
+            aggregates.save(self.get_aggregates_directory())
+
+        if verbose:
+            for outname in writers.keys():
+                print('Table saved:{}'.format(os.path.join(self.save_directory, outname)))
+
+    @profiler.profile()
     def create_and_save_tables(self,
                                df:pd.core.frame.DataFrame,
                                save_directory:str,
-                               verbose:bool = True):
+                               verbose:bool = True,
+                               surrogate_keys:bool = False,
+                               partition_fact_by:str = None,
+                               build_aggregates:bool = False,
+                               workers:int = None):
         """
         This function creates dimension tables and fact table
         and saves in the given directory.
@@ -133,12 +758,29 @@ class StarSchema(DataSchemas):
 
             save_directory:str   -> directory to save output
             verbose:bool         ->  decides wheather to print putput
+            surrogate_keys:bool  -> decides wheather to link the fact table 
+                                    through int32 surrogate keys
+            partition_fact_by:str-> date column (i.e. ORDERDATE) to partition 
+                                    the fact table by year and month
+            build_aggregates:bool-> decides wheather to build the KPI cubes
+            workers:int          -> number of processes deduplicating and 
+                                    encoding the tables at the same time
         """
 
         self.save_directory = os.path.join(save_directory, self.dataframe_name, self.name)
         create_directory(self.save_directory)
+        remove_files(self.get_saved_parts() + [self.get_fact_table_path()])
+        df = self.drop_duplicate_rows(df, outname=self.get_part_name('fact_'+self.dataframe_name))
+
+        aggregates = self.prepare_aggregates(build_aggregates, False)
+        if aggregates is not None:
+            with profiler.stage('build_aggregates', len(df)):
+                aggregates.update(self.dataframe.loc[df.index]).save(self.get_aggregates_directory())
 
         dim_features = copy.deepcopy(self.dimension_features_without_dimension_name_substring)
+        key_indexes = self.load_key_indexes(dim_features.keys(), surrogate_keys)
+        id_columns = [key+'ID' for key in dim_features.keys() if key+'ID' in df.columns]
+        tables = []
         
         for key, value in dim_features.items():
             for column in df.columns:
@@ -150,21 +792,133 @@ class StarSchema(DataSchemas):
                 print('DIM_{} Table: '.format(key), dim_features[key])
             
             outname = 'dim_{}.parquet'.format(key)
-            save_table_as_parquet(self.save_directory, 
-                                  outname,
-                                  self.dataframe[dim_features[key]],
-                                  verbose)
+
+            with profiler.stage('dimension_projection', len(self.dataframe)) as record:
+                record['table'] = outname
+                dim_table = self.project_table(self.dataframe, dim_features[key])
+                if surrogate_keys:
+                    dim_table, _ = self.build_dimension_table(dim_table, key_indexes[key], True)
+                    tables.append((outname, dim_table, False))
+                else:
+                    key_indexes[key].assign(self.dataframe[key+'ID'])
+                    tables.append((outname, dim_table, True))
+
+        for key_index in key_indexes.values():
+            key_index.save(self.get_registry_directory())
+        self.save_fact_row_hashes(pd.Index(pd.unique(hash_rows(df[id_columns]))))
+
+        if surrogate_keys:
+            df = self.replace_natural_keys(df, key_indexes)
 
         if verbose:
             print('\nFact Table:',df.columns.values)
         
-        outname = 'fact_'+self.dataframe_name+'.parquet'
-        save_table_as_parquet(self.save_directory, 
-                              outname, 
-                              df,
-                              verbose)
+        if not partition_fact_by:
+            tables.append(('fact_'+self.dataframe_name+'.parquet', df, False))
 
-    def transform_table(self, save_directory:str = 'Output', verbose:bool = True)->None:
+        self.save_tables(tables, verbose, workers)
+
+        if partition_fact_by:
+            writers = {}
+            try:
+                with profiler.stage('parquet_encoding', len(df)) as record:
+                    record['table'] = self.get_part_name('fact_'+self.dataframe_name)
+                    self.append_fact_table(writers, df, self.dataframe[partition_fact_by])
+            finally:
+                for writer in writers.values():
+                    writer.close()
+            if verbose:
+                print('Table saved:{}'.format(self.get_fact_table_path()))
+
+    @profiler.profile()
+    def create_and_save_arrow_tables(self,
+                                     table:pa.Table,
+                                     save_directory:str,
+                                     verbose:bool = True,
+                                     surrogate_keys:bool = False,
+                                     partition_fact_by:str = None,
+                                     build_aggregates:bool = False):
+        """
+        This function creates dimension tables and fact table from the 
+        pyarrow table and saves in the given directory. The tables are 
+        column selections of the source table, deduplicated and written 
+        with pyarrow, only the key and KPI columns are converted to pandas 
+        for the registry and the KPI cubes.
+
+        Args:
+            table:pa.Table       -> source table
+
+            save_directory:str   -> directory to save output
+            verbose:bool         ->  decides wheather to print putput
+            surrogate_keys:bool  -> decides wheather to link the fact table 
+                                    through int32 surrogate keys
+            partition_fact_by:str-> date column (i.e. ORDERDATE) to partition 
+                                    the fact table by year and month
+            build_aggregates:bool-> decides wheather to build the KPI cubes
+        """
+
+        self.save_directory = os.path.join(save_directory, self.dataframe_name, self.name)
+        create_directory(self.save_directory)
+        remove_files(self.get_saved_parts() + [self.get_fact_table_path()])
+
+        # the dimension, partition and KPI columns are taken from the first row of every distinct fact row
+        dim_features, fact_columns = self.get_table_columns(table.column_names)
+        table = self.drop_duplicate_rows(table, fact_columns, self.get_part_name('fact_'+self.dataframe_name))
+
+        aggregates = self.prepare_aggregates(build_aggregates, False)
+        if aggregates is not None:
+            with profiler.stage('build_aggregates', table.num_rows):
+                aggregates.update(table.select(KPIAggregates.columns).to_pandas()).save(self.get_aggregates_directory())
+
+        key_indexes = self.load_key_indexes(dim_features.keys(), surrogate_keys)
+        id_columns = [key+'ID' for key in dim_features.keys() if key+'ID' in fact_columns]
+
+        for key, value in dim_features.items():
+            if verbose:
+                print('DIM_{} Table: '.format(key), value)
+
+            key_index = key_indexes[key]
+            outname = 'dim_{}.parquet'.format(key)
+            with profiler.stage('dimension_projection', table.num_rows) as record:
+                record['table'] = outname
+                dim_table = self.project_table(table, value)
+                keys, _ = key_index.assign(dim_table.column(key_index.natural_key).to_pandas())
+
+                if surrogate_keys:
+                    dim_table = dim_table.add_column(0, key_index.surrogate_key, pa.array(keys))
+
+            self.save_arrow_table(outname, dim_table, verbose, [key_index.natural_key] if surrogate_keys else None)
+
+        for key_index in key_indexes.values():
+            key_index.save(self.get_registry_directory())
+        self.save_fact_row_hashes(pd.Index(pd.unique(hash_rows(table.select(id_columns).to_pandas()))))
+
+        fact = self.project_table(table, fact_columns)
+        if surrogate_keys:
+            fact = self.replace_arrow_natural_keys(fact, key_indexes)
+        fact_columns = fact.column_names
+
+        if verbose:
+            print('\nFact Table:', fact_columns)
+
+        partition_columns = None
+        if partition_fact_by:
+            fact, partition_columns = self.add_arrow_partition_columns(fact, table.column(partition_fact_by), partition_fact_by)
+
+        self.save_arrow_table(self.get_part_name('fact_'+self.dataframe_name), fact, verbose, 
+                              partition_columns=partition_columns, row_group_size=self.fact_row_group_size, 
+                              drop_duplicates=False)
+
+    @profiler.profile()
+    def transform_table(self, 
+                        save_directory:str = 'Output', 
+                        verbose:bool = True,
+                        surrogate_keys:bool = False,
+                        incremental:bool = False,
+                        partition_fact_by:str = None,
+                        build_aggregates:bool = False,
+                        workers:int = None,
+                        scd2:bool = False)->None:
         """
         This function transforms the given table according to star schema 
         and saves resulted tables in the given directory.
@@ -172,17 +926,100 @@ class StarSchema(DataSchemas):
         Args:
             save_directory:str   -> directory to save output
             verbose:bool         ->  decides wheather to print putput
+            surrogate_keys:bool  -> decides wheather to link the fact table 
+                                    through int32 surrogate keys instead of 
+                                    the natural keys
+            incremental:bool     -> decides wheather to only append the rows 
+                                    which are not saved yet as new parquet 
+                                    parts instead of rewriting all tables
+            partition_fact_by:str-> date column (i.e. ORDERDATE) to save the 
+                                    fact table as hive style parquet dataset 
+                                    partitioned by its year and month
+            build_aggregates:bool-> decides wheather to save pre-aggregated KPI 
+                                    cubes next to the tables, see get_aggregates()
+            workers:int          -> number of processes building and saving the 
+                                    dimension and fact tables at the same time, 
+                                    only used when the source is loaded at once
+            scd2:bool            -> decides wheather to save the dimension tables 
+                                    as slowly changing (type 2) dimensions, changed 
+                                    members get a new version with <DIMENSION>VALIDFROM, 
+                                    <DIMENSION>VALIDTO and <DIMENSION>ISCURRENT columns 
+                                    instead of being overwritten, needs surrogate_keys 
+                                    and incremental once the history was saved
+        """
+
+        if scd2 and not surrogate_keys:
+            raise ValueError('Versions of the dimension members are linked through surrogate keys, rerun with surrogate_keys=True!')
+
+        if self.table is not None and not incremental and not scd2:
+            self.create_and_save_arrow_tables(self.table, save_directory, verbose, surrogate_keys, 
+                                              partition_fact_by, build_aggregates)
+            return
+
+        if self.dataframe is None or incremental or scd2:
+            self.stream_and_save_tables(save_directory, verbose, surrogate_keys, incremental, 
+                                        partition_fact_by, build_aggregates, scd2)
+            return
+
+        with profiler.stage('deep_copy', len(self.dataframe)):
+            temp_df = self.dataframe.copy(deep=True)
+        with profiler.stage('drop_default_columns', len(temp_df)):
+            temp_df = self.drop_default_dimension_table_columns(temp_df)
+        self.create_and_save_tables(temp_df, save_directory, verbose, surrogate_keys, 
+                                    partition_fact_by, build_aggregates, workers)
+
+
+    def select_table_columns(self,
+                             table_columns:dict,
+                             columns:list = None,
+                             filters:list = None)->dict:
         """
+        This function decides which saved tables and columns have to be 
+        read to answer a query on the given columns and filters. Dimension 
+        tables which contribute neither a requested column nor a filtered 
+        column are left out, the join columns linking the fact table to the 
+        remaining dimensions are always kept. Returns the columns to read 
+        per table, None meaning all columns. Raises an error if a filtered 
+        column is not saved in any table.
+
+        Args:
+            table_columns:dict -> saved column names per table name
+            columns:list       -> requested columns, all if None
+            filters:list       -> (column, operator, value) tuples
+        """
+        fact_key = next(key for key in table_columns.keys() if key.startswith('fact'))
+        fact_columns = table_columns[fact_key]
+
+        saved_columns = set(column for names in table_columns.values() for column in names)
+        invalid_columns = sorted(set(column for column, _, _ in (filters or [])) - saved_columns)
+        if invalid_columns:
+            raise ValueError('Invalid column provided: {}'.format(invalid_columns))
 
-        temp_df = self.dataframe.copy(deep=True)
-        temp_df = self.drop_default_dimension_table_columns(temp_df)
-        self.create_and_save_tables(temp_df, save_directory, verbose)
+        if columns is None:
+            return {key:None for key in table_columns.keys()}
 
+        used_columns = set(columns) | set(column for column, _, _ in (filters or []))
+        selected = {}
 
+        for key, saved_columns in table_columns.items():
+            if key == fact_key:
+                continue
+            join_id = self.get_join_column(key.split('_')[1], fact_columns)
+            if any(column in used_columns and column not in fact_columns for column in saved_columns):
+                selected[key] = [column for column in saved_columns if column in used_columns or column == join_id]
+
+        join_ids = [self.get_join_column(key.split('_')[1], fact_columns) for key in selected.keys()]
+        selected[fact_key] = [column for column in fact_columns if column in used_columns or column in join_ids]
+
+        return selected
+
+    @profiler.profile()
     def get_transformed_tables(self, 
                                folder_directory:str=None,
                                dataframe_name:str=None,
-                               verbose:bool = True)->tuple:
+                               verbose:bool = True,
+                               filters:list = None,
+                               columns:list = None)->tuple:
         """
         Fetches and returns the transformed tables from the 
         saved directory. Returns the created tables by the object
@@ -192,6 +1029,13 @@ class StarSchema(DataSchemas):
             folder_directory:str   -> directory to save output
             dataframe_name:str     -> name of the saved table/datafrmae
             verbose:bool           ->  decides wheather to print putput
+            filters:list           -> (column, operator, value) tuples, every 
+                                      filter is pushed down to the tables 
+                                      containing its column so partitions and 
+                                      row groups which can't match 
+                                      (i.e. [('ORDERMONTH', '=', 3)]) are not read
+            columns:list           -> columns to read, dimension tables not 
+                                      needed for them are not read at all
         """
 
         try:
@@ -211,28 +1055,196 @@ class StarSchema(DataSchemas):
         else:
             dimension_tables = {}
             fact_table = None
-            
-            for file in files:
+            table_files = self.get_saved_table_files(saved_directory)
+
+            table_columns = {key:get_parquet_columns(table_files[key][0]) for key in table_files.keys()}
+            selected_columns = self.select_table_columns(table_columns, columns, filters)
 
-                df = pd.read_parquet(file, engine='pyarrow')
-                convert_date_column(df)
+            for key, read_columns in selected_columns.items():
+                table_filters = [item for item in (filters or []) if item[0] in table_columns[key]]
+                parts = []
 
-                if 'fact' in file:
+                for file in table_files[key]:
+                    with profiler.stage('reload') as record:
+                        df = read_parquet_table(file, table_filters or None, read_columns)
+                        convert_date_column(df)
+                        record['rows'], record['table'] = len(df), os.path.basename(file)
+                    parts.append(df)
+                
+                    if verbose:
+                        print('Location:', file)
+                        print('File Name:', file.split(os.sep)[-1])
+
+                df = parts[0] if len(parts)==1 else pd.concat(parts, ignore_index=True)
+
+                if key.startswith('fact'):
                     fact_table = df
                 else:
-                    key = file.split(os.sep)[-1].split('.')[0]
                     dimension_tables[key] = df
-                
-                if verbose:
-                    print('Location:', file)
-                    print('File Name:', file.split(os.sep)[-1])
 
             return fact_table, dimension_tables
 
+    def get_aggregates(self, 
+                       folder_directory:str=None,
+                       dataframe_name:str=None)->KPIAggregates:
+        """
+        Returns the pre-aggregated KPI cubes saved next to the transformed 
+        tables or None if they were not built. The KPI functions of 
+        calculate_kpi accept the returned object instead of a dataframe.
+
+        Args:
+            folder_directory:str   -> directory to save output
+            dataframe_name:str     -> name of the saved table/datafrmae
+        """
+        saved_directory = self.get_saved_directory(folder_directory, dataframe_name)
+
+        return KPIAggregates.load(os.path.join(saved_directory, '_aggregates'))
+
+    def get_lazy_dimension_tables(self,
+                                  folder_directory:str=None,
+                                  dataframe_name:str=None)->dict:
+        """
+        Returns a LazyDimension per saved dimension table (i.e. dim_CUSTOMER) 
+        which memory-maps an Arrow IPC copy of the table instead of reading 
+        it into pandas. The copies are kept in the _feather directory and 
+        rewritten when the table changes. The join-free KPI functions of 
+        calculate_star_kpi accept the returned dictionary.
+
+        Args:
+            folder_directory:str   -> directory to save output
+            dataframe_name:str     -> name of the saved table/datafrmae
+        """
+        saved_directory = self.get_saved_directory(folder_directory, dataframe_name)
+
+        table_files = self.get_saved_table_files(saved_directory, 'dim_*.parquet')
+
+        return {key:LazyDimension(key, files, os.path.join(saved_directory, '_feather')) 
+                for key, files in sorted(table_files.items())}
+
+    def get_sql_engine(self,
+                       folder_directory:str=None,
+                       dataframe_name:str=None,
+                       backend:str=None,
+                       threads:int=None)->SQLEngine:
+        """
+        Returns an SQLEngine which registers the saved fact and dimension 
+        tables under their names (i.e. fact_SALES, dim_CUSTOMER) for SQL 
+        queries. The KPI functions of calculate_kpi accept the returned 
+        object instead of a dataframe.
+
+        Args:
+            folder_directory:str   -> directory to save output
+            dataframe_name:str     -> name of the saved table/datafrmae
+            backend:str            -> any of ['duckdb', 'sqlite'], duckdb if installed if None
+            threads:int            -> number of threads of the duckdb executor, all cores if None
+        """
+        saved_directory = self.get_saved_directory(folder_directory, dataframe_name)
+
+        return SQLEngine(saved_directory, backend, threads)
+
+    def get_fact_row_groups(self,
+                            folder_directory:str=None,
+                            dataframe_name:str=None)->list:
+        """
+        Returns a (part, file, row group) tuple per row group of the saved 
+        fact table, where part is the saved fact table part (a parquet file 
+        or a partitioned directory) and file the parquet file inside it. 
+        The row groups are the units read by the workers of compute_aggregates().
+
+        Args:
+            folder_directory:str   -> directory to save output
+            dataframe_name:str     -> name of the saved table/datafrmae
+        """
+        saved_directory = self.get_saved_directory(folder_directory, dataframe_name)
+
+        row_groups = []
+        for part in sorted(glob.glob(os.path.join(saved_directory, 'fact_*.parquet'))):
+            for fragment in ds.dataset(part, format='parquet', partitioning='hive').get_fragments():
+                row_groups.extend((part, fragment.path, row_group) for row_group in range(fragment.num_row_groups))
+
+        return row_groups
+
+    @profiler.profile()
+    def compute_aggregates(self,
+                           folder_directory:str=None,
+                           dataframe_name:str=None,
+                           verbose:bool = True,
+                           filters:list = None,
+                           cubes:list = None,
+                           workers:int = None)->KPIAggregates:
+        """
+        Computes the KPI cubes of the saved tables in a pool of processes 
+        and returns them. Every row group of the fact table (see 
+        get_fact_row_groups()) is merged with the memory-mapped dimension 
+        tables and aggregated by one worker, each worker opens the dimension 
+        tables once. The partial cubes are merged in the order of the row 
+        groups, so the result doesn't depend on the number of workers. The 
+        KPI functions of calculate_kpi accept the returned object.
+
+        Args:
+            folder_directory:str   -> directory to save output
+            dataframe_name:str     -> name of the saved table/datafrmae
+            verbose:bool           ->  decides wheather to print putput
+            filters:list           -> (column, operator, value) tuples pushed 
+                                      down to the tables containing the column
+            cubes:list             -> names of the cubes to compute (see 
+                                      KPIAggregates.cube_names), all if None
+            workers:int            -> number of processes, the row groups are 
+                                      aggregated one after another if None or 1
+        """
+        if workers is not None and workers < 1:
+            raise ValueError('workers must be a positive integer!')
+
+        saved_directory = self.get_saved_directory(folder_directory, dataframe_name)
+
+        row_groups = self.get_fact_row_groups(folder_directory, dataframe_name)
+        aggregates = KPIAggregates(cubes)
+
+        if not workers or workers == 1 or len(row_groups) < 2:
+            for chunk in self.iter_merged_table(folder_directory, dataframe_name, verbose, filters, KPIAggregates.columns):
+                aggregates.update(chunk)
+            return aggregates
+
+        # builds the Arrow IPC copies once, the workers only memory-map them
+        self.get_lazy_dimension_tables(folder_directory, dataframe_name)
+
+        with ProcessPoolExecutor(max_workers=min(workers, len(row_groups)), 
+                                 initializer=load_worker_dimension_tables, 
+                                 initargs=(saved_directory, type(self))) as executor:
+            futures = [(row_group, executor.submit(aggregate_row_group, saved_directory, row_group, filters, 
+                                                   aggregates.cubes, type(self)))
+                       for row_group in row_groups]
+
+            for row_group, future in futures:
+                try:
+                    aggregates.merge(future.result())
+                except Exception as error:
+                    raise Exception('Caught this error while aggregating {}: '.format(row_group) + repr(error))
+
+                if verbose:
+                    print('Aggregated:', row_group[1], 'row group', row_group[2])
+
+        return aggregates
+
+    def get_join_column(self, dimension_name:str, fact_columns:list)->str:
+        """
+        Returns the column linking the fact table to the given dimension, 
+        the surrogate key if the tables were saved with surrogate keys and 
+        the natural key otherwise.
+
+        Args:
+            dimension_name:str -> name of the dimension (i.e. PRODUCT)
+            fact_columns:list  -> columns of the fact table
+        """
+        return get_join_column(dimension_name, fact_columns)
+
+    @profiler.profile()
     def get_merged_table(self, 
                          folder_directory:str=None,
                          dataframe_name:str=None,
-                         verbose:bool = True)->pd.core.frame.DataFrame:
+                         verbose:bool = True,
+                         filters:list = None,
+                         columns:list = None)->pd.core.frame.DataFrame:
         """
         Merges the transformed tables from the 
         saved directory and returns the dataframe.
@@ -241,16 +1253,196 @@ class StarSchema(DataSchemas):
             folder_directory:str   -> directory to save output
             dataframe_name:str     -> name of the saved table/datafrmae
             verbose:bool           ->  decides wheather to print putput
+            filters:list           -> (column, operator, value) tuples pushed 
+                                      down to the tables containing the column
+            columns:list           -> columns to return, only the dimensions 
+                                      providing them are read and joined
         """
         try:
-            fact_table, dimension_tables = self.get_transformed_tables(folder_directory, dataframe_name, verbose)
-            merged_df = fact_table.copy()
+            fact_table, dimension_tables = self.get_transformed_tables(folder_directory, dataframe_name, verbose, filters, columns)
+            return self.merge_tables(fact_table, dimension_tables, columns)
+
+        except Exception as error:
+            raise Exception('Caught this error: ' + repr(error))
+
+    def merge_tables(self,
+                     fact_table:pd.core.frame.DataFrame,
+                     dimension_tables:dict,
+                     columns:list = None)->pd.core.frame.DataFrame:
+        """
+        Joins the dimension tables to the fact table through their join
+        columns and returns the merged dataframe, surrogate keys are dropped.
+
+        Args:
+            fact_table:pd.core.frame.DataFrame -> fact table
+            dimension_tables:dict              -> dimension table per table name
+            columns:list                       -> columns to return, all if None
+        """
+        merged_df = fact_table.copy()
+
+        for key in dimension_tables.keys():
+            join_id = self.get_join_column(key.split('_')[1], merged_df.columns)
+            merged_df = pd.merge(merged_df, dimension_tables[key], on=join_id,  how='inner')
+
+            if join_id.endswith('KEY'):
+                del merged_df[join_id]
+
+        if columns is not None:
+            merged_df = merged_df[[column for column in columns if column in merged_df.columns]]
 
-            for key in dimension_tables.keys():
-                join_id = key.split('_')[1]+'ID'
-                merged_df = pd.merge(merged_df, dimension_tables[key], on=join_id,  how='inner')
+        return merged_df
 
-            return merged_df
+    def iter_merged_table(self, 
+                          folder_directory:str=None,
+                          dataframe_name:str=None,
+                          verbose:bool = True,
+                          filters:list = None,
+                          columns:list = None,
+                          chunksize:int = 64 * 1024,
+                          row_groups:list = None,
+                          lazy_dimensions:dict = None)->Iterator[pd.core.frame.DataFrame]:
+        """
+        Yields the merged table in chunks of at most chunksize rows instead 
+        of building it in memory. The fact table is streamed batch by batch 
+        and every batch is joined against the memory-mapped dimension tables 
+        (see get_lazy_dimension_tables()) through their key -> row offset 
+        indexes, so peak memory is bounded by one batch plus the key columns 
+        of the joined dimensions. Gives the same rows and columns as 
+        get_merged_table().
+
+        Args:
+            folder_directory:str   -> directory to save output
+            dataframe_name:str     -> name of the saved table/datafrmae
+            verbose:bool           ->  decides wheather to print putput
+            filters:list           -> (column, operator, value) tuples pushed 
+                                      down to the tables containing the column
+            columns:list           -> columns to return, only the dimensions 
+                                      providing them are read and joined
+            chunksize:int          -> maximum number of fact rows per batch
+            row_groups:list        -> (part, file, row group) tuples returned by 
+                                      get_fact_row_groups() to read, all if None
+            lazy_dimensions:dict   -> dimension tables returned by 
+                                      get_lazy_dimension_tables() to reuse
+        """
+        try:
+            if folder_directory and dataframe_name:
+                saved_directory = validate_directory(folder_directory, os.path.join(dataframe_name, self.name))
+            else:
+                saved_directory = self.save_directory
+
+            files = glob.glob(os.path.join(saved_directory, "*.parquet"))
+
+            assert len(files)>0
 
         except Exception as error:
-            raise Exception('Caught this error: ' + repr(error))
\ No newline at end of file
+            raise Exception('Caught this error: ' + repr(error))
+
+        table_files = self.get_saved_table_files(saved_directory)
+        fact_key = next(key for key in table_files.keys() if key.startswith('fact'))
+        lazy_dimensions = lazy_dimensions or self.get_lazy_dimension_tables(folder_directory, dataframe_name)
+        # the dimensions are joined as returned by get_lazy_dimension_tables()
+        table_columns = {key:dimension.columns for key, dimension in lazy_dimensions.items()}
+        table_columns[fact_key] = get_parquet_columns(table_files[fact_key][0])
+        selected_columns = self.select_table_columns(table_columns, columns, filters)
+        dimensions = []
+
+        for key in table_columns.keys():
+            if key == fact_key or key not in selected_columns:
+                continue
+
+            dimension = lazy_dimensions[key]
+            join_id = self.get_join_column(key.split('_')[1], table_columns[fact_key])
+            attributes = [column for column in (selected_columns[key] or dimension.columns) if column != join_id]
+            dimension_filters = [item for item in (filters or []) if item[0] in table_columns[key]]
+            allowed_keys = dimension.get_keys(join_id, dimension_filters) if dimension_filters else None
+
+            if not dimension.get_index(join_id).is_unique:
+                raise ValueError('Duplicated {} found in {}!'.format(join_id, key))
+
+            dimensions.append((dimension, join_id, attributes, allowed_keys))
+
+        fact_filters = [item for item in (filters or []) if item[0] in table_columns[fact_key]]
+        expression = filters_to_expression(fact_filters) if fact_filters else None
+
+        for file in table_files[fact_key]:
+            selected_row_groups = None if row_groups is None else [(path, row_group) for part, path, row_group in row_groups 
+                                                                   if part == file]
+            if selected_row_groups == []:
+                continue
+
+            if verbose:
+                print('Location:', file)
+
+            dataset = ds.dataset(file, format='parquet', partitioning='hive')
+            if selected_row_groups is None:
+                batches = dataset.to_batches(columns=selected_columns[fact_key], filter=expression, batch_size=chunksize)
+            else:
+                fragments = {fragment.path:fragment for fragment in dataset.get_fragments()}
+                batches = (batch for path, row_group in selected_row_groups
+                           for batch in fragments[path].subset(row_group_ids=[row_group]).to_batches(
+                               schema=dataset.schema, columns=selected_columns[fact_key], 
+                               filter=expression, batch_size=chunksize))
+
+            for batch in batches:
+                chunk = batch.to_pandas(date_as_object=False)
+                chunk = chunk[[column for column in chunk.columns if not column.startswith('__index_level_')]]
+
+                for dimension, join_id, attributes, allowed_keys in dimensions:
+                    positions = dimension.get_index(join_id).get_indexer(chunk[join_id].values)
+                    if allowed_keys is not None:
+                        positions[allowed_keys.get_indexer(chunk[join_id].values) == -1] = -1
+
+                    is_joined = positions != -1
+                    chunk = pd.concat([chunk[is_joined].reset_index(drop=True), 
+                                       dimension.take(positions[is_joined], attributes)], axis=1)
+
+                    if join_id.endswith('KEY'):
+                        del chunk[join_id]
+
+                if columns is not None:
+                    chunk = chunk[[column for column in columns if column in chunk.columns]]
+
+                if len(chunk):
+                    yield chunk
+
+worker_dimension_tables = {}
+
+def load_worker_dimension_tables(saved_directory:str, schema_class:type = StarSchema)->None:
+    """
+    Initializer of the compute_aggregates() workers, memory-maps the 
+    dimension tables of the saved directory once per process.
+
+    Args:
+        saved_directory:str -> directory of the saved tables
+        schema_class:type   -> StarSchema or the subclass which saved the tables
+    """
+    schema = schema_class()
+    schema.save_directory = saved_directory
+    worker_dimension_tables[saved_directory] = schema.get_lazy_dimension_tables()
+
+def aggregate_row_group(saved_directory:str, 
+                        row_group:tuple, 
+                        filters:list, 
+                        cubes:list,
+                        schema_class:type = StarSchema)->KPIAggregates:
+    """
+    Merges one row group of the saved fact table with the dimension tables
+    of the worker and returns its KPI cubes.
+
+    Args:
+        saved_directory:str -> directory of the saved tables
+        row_group:tuple     -> (part, file, row group) returned by get_fact_row_groups()
+        filters:list        -> (column, operator, value) tuples
+        cubes:list          -> names of the cubes to compute
+        schema_class:type   -> StarSchema or the subclass which saved the tables
+    """
+    schema = schema_class()
+    schema.save_directory = saved_directory
+    aggregates = KPIAggregates(cubes)
+
+    for chunk in schema.iter_merged_table(verbose=False, filters=filters, columns=KPIAggregates.columns, 
+                                          row_groups=[row_group], 
+                                          lazy_dimensions=worker_dimension_tables.get(saved_directory)):
+        aggregates.update(chunk)
+
+    return aggregates
@@ -0,0 +1,68 @@
+import pandas as pd
+from Scripts.utils import top_n_positions
+
+class TopN():
+    """
+    A class used to maintain the n rows with the largest values of a column
+    (i.e. a top customers leaderboard) while the rows arrive in chunks. Only
+    the current top n rows are kept, every update selects the new top n from
+    them and the incoming rows, so partial results of separate chunks or
+    partitions can be merged without materializing all rows. Ties are
+    ordered by the key column.
+
+    The value of a key has to be final when it is passed, i.e. the chunks
+    have to be disjoint on the key (for example partitioned by CUSTOMERID).
+
+    ...
+
+    Attributes
+    ----------
+    n:int
+    value_column:str
+    key_column:str
+    table:pd.core.frame.DataFrame
+
+    Methods
+    -------
+    update()
+    merge()
+    result()
+    """
+
+    def __init__(self, n:int, value_column:str, key_column:str):
+        self.n = n
+        self.value_column = value_column
+        self.key_column = key_column
+        self.table = None
+
+    def update(self, df:pd.core.frame.DataFrame)->'TopN':
+        """
+        Adds the given rows and keeps the top n of all rows seen so far.
+        Returns the object itself.
+
+        Args:
+            df:pd.core.frame.DataFrame -> rows containing the value and key columns
+        """
+        table = df if self.table is None else pd.concat([self.table, df], ignore_index=True)
+        positions = top_n_positions(table[self.value_column].values, self.n, table[self.key_column].values)
+        self.table = table.iloc[positions].reset_index(drop=True)
+        return self
+
+    def merge(self, other:'TopN')->'TopN':
+        """
+        Adds the top n rows of the other object. Returns the object itself.
+
+        Args:
+            other:TopN -> partial top n to add
+        """
+        if other.table is not None:
+            self.update(other.table)
+        return self
+
+    def result(self)->pd.core.frame.DataFrame:
+        """
+        Returns the top n rows ordered from the largest value down.
+        """
+        if self.table is None:
+            return pd.DataFrame(columns=[self.key_column, self.value_column])
+        return self.table.copy()
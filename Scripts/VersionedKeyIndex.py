@@ -0,0 +1,132 @@
+import os
+import numpy as np
+import pandas as pd
+from Scripts.DimensionKeyIndex import DimensionKeyIndex
+from Scripts.utils import create_directory
+
+class VersionedKeyIndex(DimensionKeyIndex):
+    """
+    A class used to map the natural key of a slowly changing (type 2)
+    dimension to the int32 surrogate key of the current version of the
+    member. Every member keeps the hash of the attributes of its current
+    version, a member whose attributes hash differently gets a new version
+    with the next surrogate key, so the keys of older versions stay valid
+    for the fact rows linked to them.
+
+    ...
+
+    Attributes
+    ----------
+    dimension_name:str
+    natural_key:str
+    surrogate_key:str
+    index:pd.Index
+    current_keys:np.ndarray
+    attribute_hashes:np.ndarray
+    version_count:int
+
+    Methods
+    -------
+    load()
+    save()
+    lookup()
+    assign()
+    """
+
+    def __init__(self, dimension_name:str):
+        super().__init__(dimension_name)
+        self.current_keys = np.array([], dtype='int32')
+        self.attribute_hashes = np.array([], dtype='uint64')
+        self.version_count = 0
+
+    def __len__(self):
+        return self.version_count
+
+    @classmethod
+    def load(cls, directory:str, dimension_name:str)->'VersionedKeyIndex':
+        """
+        Returns the persisted key index of the dimension from the given
+        directory or an empty one if it was never saved.
+
+        Args:
+            directory:str       -> directory containing the key indexes
+            dimension_name:str  -> name of the dimension (i.e. PRODUCT)
+        """
+        key_index = cls(dimension_name)
+        path = os.path.join(directory, cls.file_name_template.format(dimension_name))
+
+        if os.path.exists(path):
+            saved = pd.read_parquet(path, engine='pyarrow')
+            if 'ATTRIBUTEHASH' not in saved.columns:
+                raise ValueError('Key index of dimension {} has no versions, run a full transformation with scd2 first!'.format(dimension_name))
+
+            key_index.index = pd.Index(saved[key_index.natural_key].values)
+            key_index.current_keys = saved[key_index.surrogate_key].values.astype('int32')
+            key_index.attribute_hashes = saved['ATTRIBUTEHASH'].values.astype('uint64')
+            key_index.version_count = int(key_index.current_keys.max(initial=0))
+
+        return key_index
+
+    def save(self, directory:str)->None:
+        """
+        Persists the current version of every member as parquet file in
+        the given directory.
+
+        Args:
+            directory:str -> directory containing the key indexes
+        """
+        create_directory(directory)
+        path = os.path.join(directory, self.file_name_template.format(self.dimension_name))
+        pd.DataFrame({self.natural_key: self.index.values,
+                      self.surrogate_key: self.current_keys,
+                      'ATTRIBUTEHASH': self.attribute_hashes}).to_parquet(path, index=False)
+
+    def lookup(self, natural_keys:pd.core.series.Series)->np.ndarray:
+        """
+        Returns the int32 surrogate keys of the current versions of the
+        given natural keys, 0 for keys which are not part of the index.
+
+        Args:
+            natural_keys:pd.core.series.Series -> natural key values
+        """
+        # position -1 of unknown keys picks the appended 0
+        return np.append(self.current_keys, np.int32(0))[self.index.get_indexer(natural_keys.values)]
+
+    def assign(self, natural_keys:pd.core.series.Series, attribute_hashes:np.ndarray)->tuple:
+        """
+        Adds a new version for every given member which is not part of
+        the index yet or whose attribute hash differs from the one of its
+        current version. Returns the surrogate keys of the current versions
+        of all given members, a boolean mask of the new versions and the
+        surrogate keys of the versions they replace (0 for new members).
+
+        Args:
+            natural_keys:pd.core.series.Series -> unique natural key values
+            attribute_hashes:np.ndarray        -> uint64 hash of the attributes per member
+        """
+        positions = self.index.get_indexer(natural_keys.values)
+        is_added = positions == -1
+
+        if is_added.any():
+            new_members = natural_keys.values[is_added]
+            if len(self.index):
+                self.index = self.index.append(pd.Index(new_members))
+            else:
+                self.index = pd.Index(new_members)
+            self.current_keys = np.append(self.current_keys, np.zeros(len(new_members), dtype='int32'))
+            self.attribute_hashes = np.append(self.attribute_hashes, np.zeros(len(new_members), dtype='uint64'))
+            positions = self.index.get_indexer(natural_keys.values)
+
+        is_new = is_added | (self.attribute_hashes[positions] != attribute_hashes)
+        previous_keys = np.where(is_new & ~is_added, self.current_keys[positions], 0).astype('int32')
+
+        if is_new.any():
+            new_count = int(is_new.sum())
+            if self.version_count+new_count > np.iinfo('int32').max:
+                raise OverflowError('Surrogate keys of dimension {} exceed int32 range!'.format(self.dimension_name))
+
+            self.current_keys[positions[is_new]] = np.arange(self.version_count+1, self.version_count+new_count+1, dtype='int32')
+            self.attribute_hashes[positions[is_new]] = attribute_hashes[is_new]
+            self.version_count += new_count
+
+        return self.current_keys[positions], is_new, previous_keys
@@ -0,0 +1,246 @@
+import os
+import numpy as np
+import pandas as pd
+import pyarrow.dataset as ds
+from typing import Iterator
+from Scripts.DataSchemas import DataSchemas
+from Scripts.KPIAggregates import KPIAggregates
+from Scripts.Profiler import profiler
+from Scripts.utils import convert_date_column
+from Scripts.utils import create_directory
+from Scripts.utils import filters_to_expression
+from Scripts.utils import read_parquet_table
+from Scripts.utils import remove_files
+from Scripts.utils import validate_directory
+
+class WideTable(DataSchemas):
+    """
+    A class used to save the table as one pre-joined wide table (one big
+    table). Every source row is saved once with all of its columns, so the
+    merged table is read without any join.
+
+    ...
+
+    Attributes
+    ----------
+    dataframe
+    table
+    dataframe_name
+    dataframe_path
+    xlsx_sheet_name
+    chunksize
+    engine
+    column_schema
+    categorical_columns
+    save_directory
+    sources
+    ingest_workers
+    ingest_report
+
+    Methods
+    -------
+    init_params()
+    get_table_name()
+    transform_table()
+    get_saved_table_path()
+    get_transformed_tables()
+    get_merged_table()
+    iter_merged_table()
+    get_aggregates()
+    """
+
+    row_group_size = 128 * 1024
+
+    @property
+    def name(self):
+        return "WideTable"
+
+    def init_params(self,
+                    dataframe_xlsx_path: str,
+                    xlsx_sheet_name:str,
+                    chunksize:int = None,
+                    engine:str = 'pandas',
+                    infer_categories:bool = False,
+                    column_schema:dict = None,
+                    ingest_workers:int = None)->None:
+        """
+        This function initializes the schema with appropiate parameters or
+        raise errors otherwise. See StarSchema.init_params() for the arguments.
+        """
+        self.load_source(dataframe_xlsx_path, xlsx_sheet_name, chunksize, engine,
+                         infer_categories, column_schema, ingest_workers)
+
+        print(self.name, ': parameter Initialized!!')
+
+    def get_table_name(self)->str:
+        """
+        Returns the parquet file name of the wide table (i.e. wide_SALES.parquet).
+        """
+        return 'wide_'+self.dataframe_name+'.parquet'
+
+    def transform_table(self,
+                        save_directory:str = 'Output',
+                        verbose:bool = True,
+                        build_aggregates:bool = False)->None:
+        """
+        This function saves the deduplicated source rows as one wide table
+        in the given directory, streamed batch by batch if the source was
+        not loaded at once. The KPI cubes are built from the saved rows.
+
+        Args:
+            save_directory:str   -> directory to save output
+            verbose:bool         ->  decides wheather to print putput
+            build_aggregates:bool-> decides wheather to save pre-aggregated KPI
+                                    cubes next to the table, see get_aggregates()
+        """
+        self.save_directory = os.path.join(save_directory, self.dataframe_name, self.name)
+        create_directory(self.save_directory)
+        aggregates_directory = os.path.join(self.save_directory, '_aggregates')
+        remove_files([os.path.join(self.save_directory, self.get_table_name()), aggregates_directory])
+        aggregates = KPIAggregates() if build_aggregates else None
+
+        if self.table is not None:
+            table = self.drop_duplicate_rows(self.table, outname=self.get_table_name())
+            if aggregates is not None:
+                with profiler.stage('build_aggregates', table.num_rows):
+                    aggregates.update(self.project_table(table, KPIAggregates.columns).to_pandas())
+            self.save_arrow_table(self.get_table_name(), table, verbose, row_group_size=self.row_group_size, 
+                                  drop_duplicates=False)
+
+        elif self.dataframe is not None:
+            df = self.drop_duplicate_rows(self.dataframe, outname=self.get_table_name())
+            if aggregates is not None:
+                with profiler.stage('build_aggregates', len(df)):
+                    aggregates.update(df)
+            self.save_tables([(self.get_table_name(), df, False)], verbose)
+
+        else:
+            writers = {}
+            written_rows = pd.Index(np.array([], dtype='uint64'))
+            try:
+                for batch in self.iter_batches():
+                    with profiler.stage('process_batch', len(batch)):
+                        batch, written_rows = self.drop_written_rows(batch, written_rows, self.get_table_name())
+                        if aggregates is not None:
+                            aggregates.update(batch)
+                        self.append_batch(writers, self.get_table_name(), batch, False, row_group_size=self.row_group_size)
+            finally:
+                for writer in writers.values():
+                    writer.close()
+
+            if verbose:
+                print('Table saved:{}'.format(os.path.join(self.save_directory, self.get_table_name())))
+
+        if aggregates is not None:
+            aggregates.save(aggregates_directory)
+
+    def get_saved_table_path(self, folder_directory:str = None, dataframe_name:str = None)->str:
+        """
+        Returns the path of the saved wide table.
+
+        Args:
+            folder_directory:str   -> directory to save output
+            dataframe_name:str     -> name of the saved table/datafrmae
+        """
+        try:
+            if folder_directory and dataframe_name:
+                saved_directory = validate_directory(folder_directory, os.path.join(dataframe_name, self.name))
+                return os.path.join(saved_directory, 'wide_'+dataframe_name.upper()+'.parquet')
+
+            path = os.path.join(self.save_directory, self.get_table_name())
+            assert os.path.exists(path)
+            return path
+
+        except Exception as error:
+            raise Exception('Caught this error: ' + repr(error))
+
+    def get_transformed_tables(self,
+                               folder_directory:str=None,
+                               dataframe_name:str=None,
+                               verbose:bool = True,
+                               filters:list = None,
+                               columns:list = None)->tuple:
+        """
+        Fetches and returns the saved wide table as fact table and an empty
+        dictionary of dimension tables, the layout of the other schemas.
+
+        Args:
+            folder_directory:str   -> directory to save output
+            dataframe_name:str     -> name of the saved table/datafrmae
+            verbose:bool           ->  decides wheather to print putput
+            filters:list           -> (column, operator, value) tuples
+            columns:list           -> columns to read, all if None
+        """
+        return self.get_merged_table(folder_directory, dataframe_name, verbose, filters, columns), {}
+
+    @profiler.profile()
+    def get_merged_table(self,
+                         folder_directory:str=None,
+                         dataframe_name:str=None,
+                         verbose:bool = True,
+                         filters:list = None,
+                         columns:list = None)->pd.core.frame.DataFrame:
+        """
+        Reads and returns the saved wide table, only the given columns are
+        decoded and row groups which can't match the filters are skipped.
+
+        Args:
+            folder_directory:str   -> directory to save output
+            dataframe_name:str     -> name of the saved table/datafrmae
+            verbose:bool           ->  decides wheather to print putput
+            filters:list           -> (column, operator, value) tuples
+            columns:list           -> columns to return, all if None
+        """
+        path = self.get_saved_table_path(folder_directory, dataframe_name)
+
+        with profiler.stage('reload') as record:
+            df = read_parquet_table(path, filters, columns)
+            convert_date_column(df)
+            record['rows'], record['table'] = len(df), os.path.basename(path)
+
+        if verbose:
+            print('Location:', path)
+
+        return df
+
+    def iter_merged_table(self,
+                          folder_directory:str=None,
+                          dataframe_name:str=None,
+                          verbose:bool = True,
+                          filters:list = None,
+                          columns:list = None,
+                          chunksize:int = 64 * 1024)->Iterator[pd.core.frame.DataFrame]:
+        """
+        Yields the saved wide table in chunks of at most chunksize rows.
+
+        Args:
+            folder_directory:str   -> directory to save output
+            dataframe_name:str     -> name of the saved table/datafrmae
+            verbose:bool           ->  decides wheather to print putput
+            filters:list           -> (column, operator, value) tuples
+            columns:list           -> columns to return, all if None
+            chunksize:int          -> maximum number of rows per chunk
+        """
+        path = self.get_saved_table_path(folder_directory, dataframe_name)
+        expression = filters_to_expression(filters) if filters else None
+
+        if verbose:
+            print('Location:', path)
+
+        for batch in ds.dataset(path, format='parquet').to_batches(columns=columns, filter=expression, batch_size=chunksize):
+            chunk = batch.to_pandas(date_as_object=False)
+            if len(chunk):
+                yield chunk
+
+    def get_aggregates(self,
+                       folder_directory:str=None,
+                       dataframe_name:str=None)->KPIAggregates:
+        """
+        Returns the pre-aggregated KPI cubes saved next to the wide table or
+        None if they were not built.
+
+        Args:
+            folder_directory:str   -> directory to save output
+            dataframe_name:str     -> name of the saved table/datafrmae
+        """
+        return KPIAggregates.load(os.path.join(self.get_saved_directory(folder_directory, dataframe_name), '_aggregates'))
@@ -1,32 +1,110 @@
 import pandas as pd
+from typing import Iterable
+from .KPIAggregates import KPIAggregates
+from .Profiler import profiler
+from .SQLEngine import SQLEngine
+from .TopN import TopN
+from .utils import aggregate_by_period
+from .utils import period_granularities
 from .utils import replace_date_to_month_column
+from .utils import select_top_n
 
+@profiler.profile()
+def aggregate_chunks(chunks:Iterable[pd.core.frame.DataFrame],
+                     cubes:list = None)->KPIAggregates:
+    """
+    This function consumes an iterator of dataframe chunks (i.e. returned 
+    by iter_merged_table) and returns their KPIAggregates. Only one chunk 
+    and the partial aggregates (sums and counts per month, customer segment 
+    or customer) are held in memory. Aggregates of chunks consumed by 
+    separate workers can be combined with KPIAggregates.merge().
+
+    Args:
+        chunks:Iterable -> dataframe chunks
+        cubes:list -> names of the cubes to maintain (see KPIAggregates.cube_names), 
+                      all cubes if None
+
+    """
+    aggregates = KPIAggregates(cubes)
+    for chunk in chunks:
+        aggregates.update(chunk)
+    return aggregates
+
+def aggregate_chunks_by_period(chunks:Iterable[pd.core.frame.DataFrame],
+                               sum_columns:list,
+                               granularity:str = 'month')->pd.core.frame.DataFrame:
+    """
+    This function consumes an iterator of dataframe chunks and sums the 
+    given columns per period of ORDERDATE like aggregate_by_period. Every 
+    chunk is bucketed on its own and the partial sums are folded into the 
+    running result, so only one chunk and one row per period are held in 
+    memory.
+
+    Args:
+        chunks:Iterable -> dataframe chunks
+        sum_columns:list -> numeric columns to sum up
+        granularity:str -> any of ['day', 'week', 'month', 'quarter']
+
+    """
+    result = None
+    for chunk in chunks:
+        partial = aggregate_by_period(chunk, 'ORDERDATE', sum_columns, granularity=granularity)
+        if result is not None:
+            # the period starts of the partial sums fall into their own periods again
+            partial = aggregate_by_period(pd.concat([result, partial], ignore_index=True), 'ORDERDATE', 
+                                          sum_columns, granularity=granularity)
+        result = partial
+
+    if result is None:
+        raise ValueError('No chunk provided!!')
+    return result
+
+@profiler.profile()
 def get_revenues_sum(df:pd.core.frame.DataFrame,
                      variable:str = 'customersegment'):
     """
     This function calculates and returns total revenues according to 
-    the given column (i.e. customersegment or month)
+    the given column (i.e. customersegment or month). Dates are bucketed 
+    by day, week (starting on monday), month or quarter.
     
     Args:
-        df:pd.core.frame.DataFrame -> passed dataframe
+        df:pd.core.frame.DataFrame -> passed dataframe, the KPIAggregates saved 
+                                      next to the tables, an SQLEngine over them
+                                      or an iterator of dataframe chunks
         variable:str -> case and space(' ')  insensitive column name matches 
-                        any of ['CUSTOMERSEGMENT', 'MONTH']
+                        any of ['CUSTOMERSEGMENT', 'DAY', 'WEEK', 'MONTH', 'QUARTER'],
+                        only ['CUSTOMERSEGMENT', 'MONTH'] for KPIAggregates, 
+                        chunks are bucketed by day, week and quarter with 
+                        aggregate_chunks_by_period
 
     """
     try:    
+        if not isinstance(df, (pd.DataFrame, KPIAggregates, SQLEngine)):
+            granularity = variable.lower().replace(' ', '')
+            if granularity in period_granularities and granularity != 'month':
+                result = aggregate_chunks_by_period(df, ['REVENUE'], granularity)
+                return replace_date_to_month_column(result, granularity=granularity)
+
+            cube = 'monthly' if granularity=='month' else 'customer_segments'
+            df = aggregate_chunks(df, [cube])
+
+        if isinstance(df, (KPIAggregates, SQLEngine)):
+            return df.get_revenues_sum(variable)
+
         variable = variable.upper().replace(' ', '')
         
         if variable=='CUSTOMERSEGMENT':
-            result = df[[variable, 'REVENUE']].groupby(variable)['REVENUE'].sum().sort_values(ascending=False)
+            result = df[[variable, 'REVENUE']].groupby(variable, observed=True)['REVENUE'].sum().sort_values(ascending=False)
             return result.reset_index(name='REVENUE')
-        elif variable =='MONTH':
-            result = df[['ORDERDATE', 'REVENUE']].resample(rule='M', on='ORDERDATE').sum().reset_index()    
-            return replace_date_to_month_column(result)
+        elif variable.lower() in period_granularities:
+            result = aggregate_by_period(df, 'ORDERDATE', ['REVENUE'], granularity=variable.lower())
+            return replace_date_to_month_column(result, granularity=variable.lower())
         else:
             raise ValueError("Invalid column provided!!")
     except Exception as error:
         raise Exception('Caught this error: ' + repr(error))
 
+@profiler.profile()
 def orders_per_month(df:pd.core.frame.DataFrame,
                      aggregate_function:str='sum'):
     """
@@ -34,21 +112,28 @@ def orders_per_month(df:pd.core.frame.DataFrame,
     the given aggtegate function (i.e. sum or averageordervolume)
     
     Args:
-        df:pd.core.frame.DataFrame -> passed dataframe
+        df:pd.core.frame.DataFrame -> passed dataframe, the KPIAggregates saved 
+                                      next to the tables, an SQLEngine over them
+                                      or an iterator of dataframe chunks
         aggregate_function:str -> case and space(' ') insensitive column name matches any of
                                   can contain ['sum', 'averageordervolume']
 
     """     
     try: 
+        if not isinstance(df, (pd.DataFrame, KPIAggregates, SQLEngine)):
+            df = aggregate_chunks(df, ['monthly'])
+
+        if isinstance(df, (KPIAggregates, SQLEngine)):
+            return df.orders_per_month(aggregate_function)
+
         aggregate_function = aggregate_function.lower().replace(' ', '')
         if aggregate_function=='sum':
-            result = df[['ORDERDATE']].resample(rule='M', on='ORDERDATE').count().rename({'ORDERDATE':'ORDERSPERMONTH'}, axis=1).reset_index()
+            result = aggregate_by_period(df, 'ORDERDATE', count_column='ORDERSPERMONTH')
             return replace_date_to_month_column(result)
         
         elif aggregate_function=='averageordervolume':
-            result = df[['ORDERDATE']].resample(rule='M', on='ORDERDATE').count().rename({'ORDERDATE':'ORDERSPERMONTH'}, axis=1).reset_index()
+            result = aggregate_by_period(df, 'ORDERDATE', count_column='ORDERSPERMONTH')
             result['AVERAGEGORDERVOLUMEPERMONTH'] = result['ORDERSPERMONTH'].expanding().mean()
-            result = result.reset_index()
             result = replace_date_to_month_column(result)
             return result[['MONTH', 'AVERAGEGORDERVOLUMEPERMONTH']]
         
@@ -57,6 +142,7 @@ def orders_per_month(df:pd.core.frame.DataFrame,
     except Exception as error:
         raise Exception('Caught this error: ' + repr(error))
 
+@profiler.profile()
 def get_top_n_customers( df:pd.core.frame.DataFrame,
                          n:int = 10,
                          sort_column:str = 'LIFETIMEREVENUE')->pd.core.frame.DataFrame:
@@ -65,20 +151,170 @@ def get_top_n_customers( df:pd.core.frame.DataFrame,
     the given sort column (i.e. LIFETIMEREVENUE or LIFETIMEORDERVOLUME)
     
     Args:
-        df:pd.core.frame.DataFrame -> passed dataframe
+        df:pd.core.frame.DataFrame -> passed dataframe, the KPIAggregates saved 
+                                      next to the tables, an SQLEngine over them
+                                      or an iterator of dataframe chunks
         n:int  -> selects top n customers
         sort_column:str -> case and space(' ') insensitive column name matches any of
                            ['LIFETIMEREVENUE', 'LIFETIMEORDERVOLUME'] 
 
     """ 
     try:  
+        if not isinstance(df, (pd.DataFrame, KPIAggregates, SQLEngine)):
+            df = aggregate_chunks(df, ['customers'])
+
+        if isinstance(df, (KPIAggregates, SQLEngine)):
+            return df.get_top_n_customers(n, sort_column)
+
         sort_column = sort_column.upper().replace(' ', '')
         
         if sort_column =='LIFETIMEREVENUE':
-            return df[['CUSTOMERID','CUSTOMERNAME', 'REVENUE']].groupby(['CUSTOMERID', 'CUSTOMERNAME'])['REVENUE'].sum().sort_values(ascending=False)[:n].reset_index(name=sort_column)
+            result = df[['CUSTOMERID','CUSTOMERNAME', 'REVENUE']].groupby(['CUSTOMERID', 'CUSTOMERNAME'], observed=True)['REVENUE'].sum()
         elif sort_column =='LIFETIMEORDERVOLUME':
-            return df[['CUSTOMERID', 'CUSTOMERNAME', 'ORDERID']].groupby(['CUSTOMERID', 'CUSTOMERNAME'])['ORDERID'].count().sort_values(ascending=False)[:n].reset_index(name=sort_column)
+            result = df[['CUSTOMERID', 'CUSTOMERNAME', 'ORDERID']].groupby(['CUSTOMERID', 'CUSTOMERNAME'], observed=True)['ORDERID'].count()
         else:
             raise NotImplementedError
+
+        return select_top_n(result, n).reset_index(name=sort_column)
     except Exception as error:
-        raise Exception('Caught this error: ' + repr(error))
\ No newline at end of file
+        raise Exception('Caught this error: ' + repr(error))
+
+@profiler.profile()
+def get_top_n_customers_from_partitions(partitions:Iterable[pd.core.frame.DataFrame],
+                                        n:int = 10,
+                                        sort_column:str = 'LIFETIMEREVENUE')->pd.core.frame.DataFrame:
+    """
+    This function calculates and returns top n customers according to 
+    the given sort column like get_top_n_customers, but one partition of
+    rows at a time. Only the top n customers of the partitions seen so far 
+    are kept, so the partitions can be streamed. All rows of a customer
+    have to be in the same partition (i.e. partitioned by CUSTOMERID).
+
+    Args:
+        partitions:Iterable -> dataframes with disjoint customers
+        n:int  -> selects top n customers
+        sort_column:str -> case and space(' ') insensitive column name matches any of
+                           ['LIFETIMEREVENUE', 'LIFETIMEORDERVOLUME'] 
+
+    """
+    try:
+        sort_column = sort_column.upper().replace(' ', '')
+        top_n = TopN(n, sort_column, 'CUSTOMERID')
+
+        for partition in partitions:
+            top_n.update(get_top_n_customers(partition, n, sort_column))
+
+        return top_n.result()
+    except Exception as error:
+        raise Exception('Caught this error: ' + repr(error))
+
+kpi_names = ['monthlyrevenue',
+             'monthlyorders',
+             'monthlyaverageordervolume',
+             'customersegmentrevenue',
+             'topcustomersbyrevenue',
+             'topcustomersbyordervolume']
+
+@profiler.profile()
+def compute_kpis(df:pd.core.frame.DataFrame,
+                 kpis:list = None,
+                 n:int = 10)->dict:
+    """
+    This function calculates all requested KPIs together and returns them
+    in a dictionary keyed by KPI name. KPIs sharing a grouping are answered
+    from one aggregation, i.e. a single monthly bucketing feeds the monthly
+    revenue, order count and average order volume and a single per customer
+    groupby feeds the customer segment revenue and both top n rankings. Each
+    result has the same layout as the matching single KPI function.
+
+    Args:
+        df:pd.core.frame.DataFrame -> passed dataframe, the KPIAggregates saved 
+                                      next to the tables, an SQLEngine over them
+                                      or an iterator of dataframe chunks, which are aggregated 
+                                      into the cubes of the requested KPIs
+        kpis:list -> case and space(' ') insensitive KPI names, any of
+                     ['monthlyrevenue', 'monthlyorders', 'monthlyaverageordervolume',
+                      'customersegmentrevenue', 'topcustomersbyrevenue',
+                      'topcustomersbyordervolume'], all KPIs if None
+        n:int -> selects top n customers
+
+    """
+    try:
+        kpis = [kpi.lower().replace(' ', '') for kpi in (kpis or kpi_names)]
+        invalid_kpis = set(kpis) - set(kpi_names)
+        if invalid_kpis:
+            raise ValueError("Invalid KPI provided: {}".format(sorted(invalid_kpis)))
+
+        results = {}
+
+        if not isinstance(df, pd.DataFrame):
+            return compute_kpis_from_aggregates(df, kpis, n)
+
+        if {'monthlyrevenue', 'monthlyorders', 'monthlyaverageordervolume'} & set(kpis):
+            monthly = aggregate_by_period(df, 'ORDERDATE', ['REVENUE'], 'ORDERSPERMONTH')
+
+            if 'monthlyrevenue' in kpis:
+                results['monthlyrevenue'] = replace_date_to_month_column(monthly[['ORDERDATE', 'REVENUE']])
+            if 'monthlyorders' in kpis:
+                results['monthlyorders'] = replace_date_to_month_column(monthly[['ORDERDATE', 'ORDERSPERMONTH']])
+            if 'monthlyaverageordervolume' in kpis:
+                result = monthly[['ORDERDATE']].copy()
+                result['AVERAGEGORDERVOLUMEPERMONTH'] = monthly['ORDERSPERMONTH'].expanding().mean()
+                results['monthlyaverageordervolume'] = replace_date_to_month_column(result)
+
+        if {'customersegmentrevenue', 'topcustomersbyrevenue', 'topcustomersbyordervolume'} & set(kpis):
+            keys = ['CUSTOMERID', 'CUSTOMERNAME']
+            if 'customersegmentrevenue' in kpis:
+                keys.append('CUSTOMERSEGMENT')
+
+            customers = df[keys+['REVENUE', 'ORDERID']].groupby(keys, observed=True).agg({'REVENUE':'sum', 'ORDERID':'count'})
+
+            if 'customersegmentrevenue' in kpis:
+                result = customers.groupby(level='CUSTOMERSEGMENT', observed=True)['REVENUE'].sum().sort_values(ascending=False)
+                results['customersegmentrevenue'] = result.reset_index(name='REVENUE')
+                # a customer can be saved in more than one segment (i.e. slowly changing dimensions)
+                customers = customers.groupby(level=['CUSTOMERID', 'CUSTOMERNAME'], observed=True).sum()
+
+            if 'topcustomersbyrevenue' in kpis:
+                result = select_top_n(customers['REVENUE'], n)
+                results['topcustomersbyrevenue'] = result.reset_index(name='LIFETIMEREVENUE')
+            if 'topcustomersbyordervolume' in kpis:
+                result = select_top_n(customers['ORDERID'], n)
+                results['topcustomersbyordervolume'] = result.reset_index(name='LIFETIMEORDERVOLUME')
+
+        return results
+    except Exception as error:
+        raise Exception('Caught this error: ' + repr(error))
+
+kpi_cubes = {'monthlyrevenue': 'monthly',
+             'monthlyorders': 'monthly',
+             'monthlyaverageordervolume': 'monthly',
+             'customersegmentrevenue': 'customer_segments',
+             'topcustomersbyrevenue': 'customers',
+             'topcustomersbyordervolume': 'customers'}
+
+def compute_kpis_from_aggregates(aggregates:KPIAggregates,
+                                 kpis:list,
+                                 n:int = 10)->dict:
+    """
+    This function answers the given KPIs from the KPIAggregates or the
+    SQLEngine, or from an iterator of dataframe chunks which is aggregated
+    into only the cubes the KPIs need first. Returns the KPIs in the layout of compute_kpis.
+
+    Args:
+        aggregates:KPIAggregates -> cubes, an SQLEngine or an iterator of dataframe chunks
+        kpis:list -> normalized KPI names (see kpi_names)
+        n:int -> selects top n customers
+
+    """
+    if not isinstance(aggregates, (KPIAggregates, SQLEngine)):
+        aggregates = aggregate_chunks(aggregates, set(kpi_cubes[kpi] for kpi in kpis))
+
+    functions = {'monthlyrevenue': lambda: aggregates.get_revenues_sum('month'),
+                 'monthlyorders': lambda: aggregates.orders_per_month('sum'),
+                 'monthlyaverageordervolume': lambda: aggregates.orders_per_month('averageordervolume'),
+                 'customersegmentrevenue': lambda: aggregates.get_revenues_sum('customersegment'),
+                 'topcustomersbyrevenue': lambda: aggregates.get_top_n_customers(n, 'LIFETIMEREVENUE'),
+                 'topcustomersbyordervolume': lambda: aggregates.get_top_n_customers(n, 'LIFETIMEORDERVOLUME')}
+
+    return {kpi:functions[kpi]() for kpi in kpis}
@@ -0,0 +1,165 @@
+import pandas as pd
+from .LazyDimension import LazyDimension
+from .Profiler import profiler
+from .utils import aggregate_by_period
+from .utils import get_join_column
+from .utils import period_granularities
+from .utils import replace_date_to_month_column
+from .utils import top_n_positions
+
+def lookup_dimension_attributes(dimension_tables:dict,
+                                dimension_name:str,
+                                join_column:str,
+                                keys:pd.core.indexes.base.Index,
+                                attributes:list)->pd.core.frame.DataFrame:
+    """
+    This function looks up the given attributes of the dimension members
+    with the given keys through a hash index on the join column and returns
+    them in the order of the keys. LazyDimension tables only load the rows
+    of the given keys.
+
+    Args:
+        dimension_tables:dict -> dimension tables (i.e. returned by get_transformed_tables 
+                                 or get_lazy_dimension_tables)
+        dimension_name:str    -> name of the dimension (i.e. CUSTOMER)
+        join_column:str       -> column linking the fact table to the dimension
+        keys:pd.Index         -> keys of the members to look up
+        attributes:list       -> dimension columns to return
+
+    """
+    dimension = dimension_tables['dim_'+dimension_name]
+
+    if isinstance(dimension, LazyDimension):
+        return dimension.lookup(join_column, keys, attributes)
+
+    positions = pd.Index(dimension[join_column]).get_indexer(keys)
+
+    if (positions == -1).any():
+        raise KeyError('Keys missing in dim_{} found!'.format(dimension_name))
+
+    return dimension[attributes].iloc[positions].reset_index(drop=True)
+
+@profiler.profile()
+def get_revenues_sum(fact_table:pd.core.frame.DataFrame,
+                     dimension_tables:dict,
+                     variable:str = 'customersegment')->pd.core.frame.DataFrame:
+    """
+    This function calculates and returns total revenues according to
+    the given column (i.e. customersegment or month). The revenues are
+    summed up per customer or order key first, only the aggregated keys
+    are looked up in the dimension tables.
+
+    Args:
+        fact_table:pd.core.frame.DataFrame -> fact table
+        dimension_tables:dict -> dimension tables
+        variable:str -> case and space(' ')  insensitive column name matches
+                        any of ['CUSTOMERSEGMENT', 'DAY', 'WEEK', 'MONTH', 'QUARTER']
+
+    """
+    try:
+        variable = variable.upper().replace(' ', '')
+
+        if variable=='CUSTOMERSEGMENT':
+            join_column = get_join_column('CUSTOMER', fact_table.columns)
+            revenues = fact_table.groupby(join_column)['REVENUE'].sum()
+            segments = lookup_dimension_attributes(dimension_tables, 'CUSTOMER', join_column,
+                                                   revenues.index, [variable])
+            result = revenues.groupby(segments[variable].values, observed=True).sum().sort_values(ascending=False)
+            return result.rename_axis(variable).reset_index(name='REVENUE')
+        elif variable.lower() in period_granularities:
+            join_column = get_join_column('ORDER', fact_table.columns)
+            revenues = fact_table.groupby(join_column)['REVENUE'].sum()
+            result = lookup_dimension_attributes(dimension_tables, 'ORDER', join_column,
+                                                 revenues.index, ['ORDERDATE'])
+            result['REVENUE'] = revenues.values
+            result = aggregate_by_period(result, 'ORDERDATE', ['REVENUE'], granularity=variable.lower())
+            return replace_date_to_month_column(result, granularity=variable.lower())
+        else:
+            raise ValueError("Invalid column provided!!")
+    except Exception as error:
+        raise Exception('Caught this error: ' + repr(error))
+
+@profiler.profile()
+def orders_per_month(fact_table:pd.core.frame.DataFrame,
+                     dimension_tables:dict,
+                     aggregate_function:str='sum')->pd.core.frame.DataFrame:
+    """
+    This function calculates and returns total orders per month according to
+    the given aggtegate function (i.e. sum or averageordervolume). The fact
+    rows are counted per order key first, only the counted keys are looked
+    up in the order dimension.
+
+    Args:
+        fact_table:pd.core.frame.DataFrame -> fact table
+        dimension_tables:dict -> dimension tables
+        aggregate_function:str -> case and space(' ') insensitive column name matches any of
+                                  can contain ['sum', 'averageordervolume']
+
+    """
+    try:
+        aggregate_function = aggregate_function.lower().replace(' ', '')
+
+        if aggregate_function not in ['sum', 'averageordervolume']:
+            raise NotImplementedError
+
+        join_column = get_join_column('ORDER', fact_table.columns)
+        orders = fact_table.groupby(join_column).size()
+        result = lookup_dimension_attributes(dimension_tables, 'ORDER', join_column,
+                                             orders.index, ['ORDERDATE'])
+        result['ORDERSPERMONTH'] = orders.values
+        result = aggregate_by_period(result, 'ORDERDATE', ['ORDERSPERMONTH'])
+        result['ORDERSPERMONTH'] = result['ORDERSPERMONTH'].astype('int64')
+
+        if aggregate_function=='sum':
+            return replace_date_to_month_column(result)
+
+        result['AVERAGEGORDERVOLUMEPERMONTH'] = result['ORDERSPERMONTH'].expanding().mean()
+        result = replace_date_to_month_column(result)
+        return result[['MONTH', 'AVERAGEGORDERVOLUMEPERMONTH']]
+    except Exception as error:
+        raise Exception('Caught this error: ' + repr(error))
+
+@profiler.profile()
+def get_top_n_customers(fact_table:pd.core.frame.DataFrame,
+                        dimension_tables:dict,
+                        n:int = 10,
+                        sort_column:str = 'LIFETIMEREVENUE')->pd.core.frame.DataFrame:
+    """
+    This function calculates and returns top n customers according to
+    the given sort column (i.e. LIFETIMEREVENUE or LIFETIMEORDERVOLUME).
+    The customers are ranked on their keys, only the top n are looked up
+    in the customer dimension. Ties are ordered by CUSTOMERID.
+
+    Args:
+        fact_table:pd.core.frame.DataFrame -> fact table
+        dimension_tables:dict -> dimension tables
+        n:int  -> selects top n customers
+        sort_column:str -> case and space(' ') insensitive column name matches any of
+                           ['LIFETIMEREVENUE', 'LIFETIMEORDERVOLUME']
+
+    """
+    try:
+        sort_column = sort_column.upper().replace(' ', '')
+        join_column = get_join_column('CUSTOMER', fact_table.columns)
+
+        if sort_column =='LIFETIMEREVENUE':
+            result = fact_table.groupby(join_column)['REVENUE'].sum()
+        elif sort_column =='LIFETIMEORDERVOLUME':
+            result = fact_table.groupby(join_column)[get_join_column('ORDER', fact_table.columns)].count()
+        else:
+            raise NotImplementedError
+
+        tie_breakers = result.index.values
+        if join_column != 'CUSTOMERID':
+            tie_breakers = lookup_dimension_attributes(dimension_tables, 'CUSTOMER', join_column,
+                                                       result.index, ['CUSTOMERID'])['CUSTOMERID'].values
+
+        result = result.iloc[top_n_positions(result.values, n, tie_breakers)]
+        customers = lookup_dimension_attributes(dimension_tables, 'CUSTOMER', join_column,
+                                                result.index, ['CUSTOMERID', 'CUSTOMERNAME'])
+        # int64 like the group keys of calculate_kpi, also for ids saved as int32
+        customers['CUSTOMERID'] = customers['CUSTOMERID'].astype('int64')
+        customers[sort_column] = result.values
+        return customers
+    except Exception as error:
+        raise Exception('Caught this error: ' + repr(error))
@@ -1,21 +1,474 @@
+import numpy as np
+import openpyxl
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pa_csv
+import pyarrow.dataset as ds
+import pyarrow.feather as feather
+import pyarrow.parquet as pq
+import glob
+import hashlib
 import os
+import shutil
+import time
+from concurrent.futures import FIRST_COMPLETED
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import wait
+from typing import Iterator
+from Scripts.Profiler import profiler
 
-def read_xlsx(path:str, sheet_name:str)->pd.core.frame.DataFrame:
+# the user cache directory, XLSX_CACHE_DIRECTORY moves it and an empty value disables the cache
+xlsx_cache_directory = os.environ.get('XLSX_CACHE_DIRECTORY', 
+                                      os.path.join(os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache'),
+                                                   'flaconi_data_engineering', 'xlsx')) or None
+xlsx_cache_max_bytes = 512 * 1024 * 1024
+
+def get_file_fingerprint(path:str, *extra:str)->str:
+    """
+    Returns a hex digest identifying the file by its absolute path, size, 
+    modification time and content, so the digest changes whenever the 
+    file is rewritten.
+
+    Args:
+        path:str -> Path of the file
+        extra:str -> additional values (i.e. sheet name) to include
+    
+    """
+    stat = os.stat(path)
+    digest = hashlib.sha256()
+    digest.update(repr((os.path.abspath(path), stat.st_size, stat.st_mtime_ns) + extra).encode())
+
+    with open(path, 'rb') as file:
+        for block in iter(lambda: file.read(1024 * 1024), b''):
+            digest.update(block)
+
+    return digest.hexdigest()
+
+def evict_cache_files(directory:str, max_bytes:int)->None:
+    """
+    Removes the least recently used files (by modification time) of the 
+    cache directory until their total size is at most max_bytes.
+
+    Args:
+        directory:str -> cache directory
+        max_bytes:int -> maximum total size of the cached files
+    
+    """
+    files = [entry for entry in os.scandir(directory) if entry.is_file()]
+    files.sort(key=lambda entry: entry.stat().st_mtime_ns, reverse=True)
+
+    total_bytes = 0
+    for entry in files:
+        total_bytes += entry.stat().st_size
+        if total_bytes > max_bytes:
+            os.remove(entry.path)
+
+def read_xlsx(path:str, 
+              sheet_name:str, 
+              cache_directory:str = xlsx_cache_directory)->pd.core.frame.DataFrame:
     """
     Reads and returns the excel file as dataframe from the 
     provided path.
+
+    The parsed sheet is cached as uncompressed Arrow IPC (Feather) file 
+    in cache_directory (the user cache directory by default, see 
+    xlsx_cache_directory), keyed by the fingerprint of the source file. Later 
+    reads of the unchanged file memory-map the cached copy instead of 
+    parsing the excel again. The least recently used copies are evicted 
+    above xlsx_cache_max_bytes.
     
     Args:
         path:str -> Path of the dataframe
         sheet_name:str -> Sheet name in the excel
+        cache_directory:str -> directory of the cached sheets, None to disable caching
+
+    """
+    try:
+        if cache_directory is None:
+            return pd.read_excel(path, sheet_name = sheet_name)
+
+        cache_path = os.path.join(cache_directory, get_file_fingerprint(path, str(sheet_name))+'.arrow')
+
+        if os.path.exists(cache_path):
+            os.utime(cache_path)
+            return pa.ipc.open_file(pa.memory_map(cache_path)).read_all().to_pandas()
+
+        df = pd.read_excel(path, sheet_name = sheet_name)
+    except Exception as error:
+        raise Exception('Caught this error: ' + repr(error))
+
+    temporary_path = cache_path+'.{}.tmp'.format(os.getpid())
+    try:
+        os.makedirs(cache_directory, exist_ok=True)
+        feather.write_feather(df, temporary_path, compression='uncompressed')
+        os.replace(temporary_path, cache_path)
+        evict_cache_files(cache_directory, xlsx_cache_max_bytes)
+    except (OSError, pa.ArrowException):
+        # the cache is an optimization only, unsupported sheets or
+        # read-only directories are parsed again on the next read
+        if os.path.exists(temporary_path):
+            os.remove(temporary_path)
+
+    return df
+
+def read_xlsx_in_chunks(path:str, sheet_name:str, chunksize:int)->Iterator[pd.core.frame.DataFrame]:
+    """
+    Streams the excel sheet from the provided path as dataframes of at
+    most chunksize rows. The sheet is opened in openpyxl read-only mode
+    so only the current batch is held in memory.
+
+    Args:
+        path:str -> Path of the dataframe
+        sheet_name:str -> Sheet name in the excel
+        chunksize:int -> maximum number of rows per yielded dataframe
 
     """
     try:
-        return pd.read_excel(path, sheet_name = sheet_name)
+        workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+        worksheet = workbook[sheet_name]
     except Exception as error:
         raise Exception('Caught this error: ' + repr(error))
 
+    try:
+        rows = worksheet.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+
+        batch = []
+        for row in rows:
+            if all(value is None for value in row):
+                continue
+            batch.append(row)
+            if len(batch) == chunksize:
+                yield pd.DataFrame.from_records(batch, columns=header)
+                batch = []
+
+        if batch:
+            yield pd.DataFrame.from_records(batch, columns=header)
+    finally:
+        workbook.close()
+
+def read_csv_in_chunks(path:str, chunksize:int)->Iterator[pd.core.frame.DataFrame]:
+    """
+    Streams the csv file from the provided path as dataframes of at
+    most chunksize rows.
+
+    Args:
+        path:str -> Path of the dataframe
+        chunksize:int -> maximum number of rows per yielded dataframe
+
+    """
+    try:
+        reader = pd.read_csv(path, chunksize=chunksize)
+    except Exception as error:
+        raise Exception('Caught this error: ' + repr(error))
+
+    with reader:
+        for batch in reader:
+            yield batch
+
+def read_table_in_chunks(path:str, sheet_name:str, chunksize:int)->Iterator[pd.core.frame.DataFrame]:
+    """
+    Streams the given excel or csv file as bounded size dataframes.
+    The reader is selected by the file extension, sheet_name is
+    ignored for csv files.
+
+    Args:
+        path:str -> Path of the dataframe
+        sheet_name:str -> Sheet name in the excel
+        chunksize:int -> maximum number of rows per yielded dataframe
+
+    """
+    if not chunksize or chunksize < 1:
+        raise ValueError('chunksize must be a positive integer!')
+
+    if path.lower().endswith('.csv'):
+        return read_csv_in_chunks(path, chunksize)
+    else:
+        return read_xlsx_in_chunks(path, sheet_name, chunksize)
+
+def read_arrow_table(path:str, sheet_name:str)->pa.Table:
+    """
+    Reads and returns the excel or csv file from the provided path as
+    pyarrow table with normalized column names (see
+    remove_spaces_and_uppercase_df_columns) and timestamp date columns.
+    Csv files are parsed by the multithreaded pyarrow reader, excel sheets
+    are converted from pandas once.
+
+    Args:
+        path:str -> Path of the dataframe
+        sheet_name:str -> Sheet name in the excel, ignored for csv files
+
+    """
+    try:
+        if path.lower().endswith('.csv'):
+            table = pa_csv.read_csv(path)
+        else:
+            table = pa.Table.from_pandas(read_xlsx(path, sheet_name), preserve_index=False)
+    except Exception as error:
+        raise Exception('Caught this error: ' + repr(error))
+
+    table = table.replace_schema_metadata(None)
+    table = table.rename_columns([name.upper().replace(' ', '') for name in table.column_names])
+
+    for position, name in enumerate(table.column_names):
+        if "DATE" in name and not pa.types.is_timestamp(table.schema.field(name).type):
+            table = table.set_column(position, name, pc.cast(table.column(name), pa.timestamp('ns')))
+
+    return table
+
+def get_sources(paths, sheet_names)->list:
+    """
+    Returns a (path, sheet name) tuple per sheet of every given file.
+    Paths containing wildcards (i.e. regions/*.xlsx) are expanded in
+    sorted order, the sheet names are ignored for csv files.
+
+    Args:
+        paths -> path, glob pattern or list of them
+        sheet_names -> sheet name or list of sheet names read from every excel file
+
+    """
+    paths = [paths] if isinstance(paths, str) else list(paths)
+    sheet_names = [sheet_names] if isinstance(sheet_names, str) else list(sheet_names)
+
+    sources = []
+    for path in paths:
+        files = sorted(glob.glob(path)) if glob.has_magic(path) else [path]
+        if not files:
+            raise FileNotFoundError('No file matches {}!'.format(path))
+
+        for file in files:
+            if file.lower().endswith('.csv'):
+                sources.append((file, sheet_names[0]))
+            else:
+                sources.extend((file, sheet_name) for sheet_name in sheet_names)
+
+    if not sources:
+        raise ValueError('No source provided!')
+    return sources
+
+def read_source(path:str, sheet_name:str)->pd.core.frame.DataFrame:
+    """
+    Reads and returns the excel sheet or csv file as dataframe with
+    normalized column names (see remove_spaces_and_uppercase_df_columns)
+    and datetime date columns. Used by the workers of iter_sources().
+
+    Args:
+        path:str -> Path of the dataframe
+        sheet_name:str -> Sheet name in the excel, ignored for csv files
+
+    """
+    if path.lower().endswith('.csv'):
+        return read_arrow_table(path, sheet_name).to_pandas()
+
+    df = read_xlsx(path, sheet_name)
+    remove_spaces_and_uppercase_df_columns(df)
+    convert_date_column(df)
+    return df
+
+def read_source_columns(path:str, sheet_name:str)->list:
+    """
+    Returns the normalized column names (see remove_spaces_and_uppercase_df_columns)
+    of the excel sheet or csv file, only the header row is read.
+
+    Args:
+        path:str -> Path of the dataframe
+        sheet_name:str -> Sheet name in the excel, ignored for csv files
+
+    """
+    if path.lower().endswith('.csv'):
+        df = pd.read_csv(path, nrows=0)
+    else:
+        df = pd.read_excel(path, sheet_name = sheet_name, nrows=0)
+    remove_spaces_and_uppercase_df_columns(df)
+    return list(df.columns)
+
+def iter_sources(sources:list, workers:int = None)->Iterator[tuple]:
+    """
+    Parses the given sources in a pool of processes and yields a
+    (path, sheet name, dataframe, error, seconds) tuple per source in the
+    order they finish, so a slow file doesn't hold back the others. At most
+    workers sources are parsed or waiting to be consumed at the same time.
+    Failed sources are yielded with their error instead of a dataframe.
+
+    Args:
+        sources:list -> (path, sheet name) tuples, see get_sources()
+        workers:int -> number of processes, sources are parsed one after
+                       another if None or 1
+
+    """
+    if workers is not None and workers < 1:
+        raise ValueError('workers must be a positive integer!')
+
+    if not workers or workers == 1 or len(sources) < 2:
+        for path, sheet_name in sources:
+            started = time.perf_counter()
+            try:
+                df, error = read_source(path, sheet_name), None
+            except Exception as exception:
+                df, error = None, repr(exception)
+            yield path, sheet_name, df, error, time.perf_counter() - started
+        return
+
+    pending_sources = iter(sources)
+    with ProcessPoolExecutor(max_workers=min(workers, len(sources))) as executor:
+        def submit_next()->None:
+            source = next(pending_sources, None)
+            if source is not None:
+                futures[executor.submit(read_source, *source)] = (source, time.perf_counter())
+
+        futures = {}
+        for _ in range(min(workers, len(sources))):
+            submit_next()
+
+        while futures:
+            done, _ = wait(futures.keys(), return_when=FIRST_COMPLETED)
+            for future in done:
+                (path, sheet_name), started = futures.pop(future)
+                # the next source is parsed while this one is consumed
+                submit_next()
+                try:
+                    df, error = future.result(), None
+                except Exception as exception:
+                    df, error = None, repr(exception)
+                yield path, sheet_name, df, error, time.perf_counter() - started
+
+def get_categorical_columns(df:pd.core.frame.DataFrame, max_cardinality_ratio:float)->list:
+    """
+    Returns the text columns of the dataframe whose number of distinct 
+    values is at most max_cardinality_ratio times the number of rows. 
+    Key columns (ending with ID) are never returned.
+
+    Args:
+        df:pd.core.frame.DataFrame -> passed dataframe
+        max_cardinality_ratio:float -> maximum distinct values per row
+
+    """
+    return [column for column in df.columns 
+            if not column.endswith('ID') and df[column].dtype == object 
+            and df[column].nunique() <= max_cardinality_ratio * len(df)]
+
+def get_arrow_categorical_columns(table:pa.Table, max_cardinality_ratio:float)->list:
+    """
+    Returns the string columns of the pyarrow table whose number of 
+    distinct values is at most max_cardinality_ratio times the number 
+    of rows. Key columns (ending with ID) are never returned.
+
+    Args:
+        table:pa.Table -> passed table
+        max_cardinality_ratio:float -> maximum distinct values per row
+
+    """
+    return [column for column in table.column_names 
+            if not column.endswith('ID') and pa.types.is_string(table.schema.field(column).type)
+            and len(table.column(column).unique()) <= max_cardinality_ratio * table.num_rows]
+
+def get_arrow_row_codes(table:pa.Table, columns:list = None)->np.ndarray:
+    """
+    Returns one int64 code per row of the pyarrow table, equal codes
+    for equal values of the given columns (all columns if None). The
+    columns are dictionary encoded and their indices combined, so
+    no python objects are created.
+
+    Args:
+        table:pa.Table -> passed table
+        columns:list -> columns to compare
+
+    """
+    codes = np.zeros(table.num_rows, dtype='int64')
+
+    for column in (columns or table.column_names):
+        chunks = [chunk.cast(chunk.type.value_type) if pa.types.is_dictionary(chunk.type) else chunk 
+                  for chunk in table.column(column).chunks]
+        encoded = (pa.concat_arrays(chunks) if chunks else pa.array([], table.schema.field(column).type)).dictionary_encode()
+        indices = pc.fill_null(encoded.indices, pa.scalar(-1, encoded.indices.type)).to_numpy().astype('int64') + 1
+        cardinality = len(encoded.dictionary) + 1
+
+        if len(codes) and codes.max() > (np.iinfo('int64').max - cardinality) // cardinality:
+            codes = np.unique(codes, return_inverse=True)[1].astype('int64')
+        codes = codes * cardinality + indices
+
+    return codes
+
+def get_first_arrow_rows(table:pa.Table, subset:list = None)->np.ndarray:
+    """
+    Given a pyarrow table this function returns the sorted positions of 
+    the first row of every distinct combination of the subset columns 
+    (all columns if None).
+
+    Args:
+        table:pa.Table -> passed table
+        subset:list -> columns to compare
+
+    """
+    _, first_rows = np.unique(get_arrow_row_codes(table, subset), return_index=True)
+    return np.sort(first_rows)
+
+def drop_duplicate_arrow_rows(table:pa.Table, subset:list = None)->pa.Table:
+    """
+    Given a pyarrow table this function returns the first row of every
+    distinct combination of the subset columns (all columns if None),
+    in the order of the table like pandas drop_duplicates.
+
+    Args:
+        table:pa.Table -> passed table
+        subset:list -> columns to compare
+
+    """
+    first_rows = get_first_arrow_rows(table, subset)
+    if len(first_rows) == table.num_rows:
+        return table
+    return table.take(pa.array(first_rows))
+
+def save_arrow_table_as_parquet(directory:str,
+                                outname:str,
+                                table:pa.Table,
+                                verbose:bool,
+                                partition_columns:list = None,
+                                row_group_size:int = None,
+                                column_types:dict = None)->None:
+    """
+    Given a pyarrow table this function saves it as parquet file, or as hive
+    style partitioned parquet directory (i.e. outname/ORDERYEAR=2017/ORDERMONTH=3/
+    part-00000.parquet) if partition columns are given. The partition columns
+    are only stored in the directory names.
+
+    Args:
+        directory:str -> output file directory
+        outname:str -> output file name
+        table:pa.Table -> passed table
+        verbose:bool ->  decides wheather to print putput
+        partition_columns:list -> columns to partition the table by
+        row_group_size:int -> maximum number of rows per row group
+        column_types:dict -> pyarrow storage type per column name
+
+    """
+    full_name = os.path.join(directory, outname)
+    table = cast_arrow_table(table, column_types)
+
+    with profiler.stage('parquet_encoding', table.num_rows) as record:
+        record['table'] = outname
+        if not partition_columns:
+            pq.write_table(table, full_name, row_group_size=row_group_size)
+        else:
+            _, first_rows, inverse = np.unique(get_arrow_row_codes(table, partition_columns),
+                                               return_index=True, return_inverse=True)
+            rows = np.argsort(inverse, kind='stable')
+            data = table.drop(partition_columns)
+
+            for first_row, group_rows in zip(first_rows, np.split(rows, np.cumsum(np.bincount(inverse))[:-1])):
+                partition_directory = os.path.join(full_name, *['{}={}'.format(column, table.column(column)[first_row].as_py())
+                                                                for column in partition_columns])
+                create_directory(partition_directory)
+                pq.write_table(data.take(pa.array(group_rows)),
+                               os.path.join(partition_directory, 'part-00000.parquet'),
+                               row_group_size=row_group_size)
+
+    if verbose:
+        print('Table saved:{}'.format(full_name))
+
 def create_directory(directory:str)->None:
     """
     Given a directory this function checks and 
@@ -28,6 +481,21 @@ def create_directory(directory:str)->None:
     except Exception as error:
         raise Exception('Caught this error: ' + repr(error))
 
+def remove_files(files:list)->None:
+    """
+    Given a list of paths this function removes the files and 
+    directories which exist.
+
+    """
+    try:
+        for file in files:
+            if os.path.isdir(file):
+                shutil.rmtree(file)
+            elif os.path.exists(file):
+                os.remove(file)
+    except Exception as error:
+        raise Exception('Caught this error: ' + repr(error))
+
 def validate_directory(path1:str, path2:str)->str:
     """
     Given two seprate paths this function checks wheather combining 
@@ -51,9 +519,33 @@ def convert_date_column(df:pd.core.frame.DataFrame)->None:
     """
     date_columns = [column for column in df.columns if "DATE" in column]
     for column in date_columns:
-        df[column] = pd.to_datetime(df[column])
+        if not pd.api.types.is_datetime64_any_dtype(df[column]):
+            df[column] = pd.to_datetime(df[column])
+
+def cast_arrow_table(table:pa.Table, column_types:dict)->pa.Table:
+    """
+    Given a pyarrow table this function casts the columns listed in 
+    column_types to the given pyarrow types and returns the new table. 
+    Columns which are not part of the table are skipped, values which 
+    don't fit the type (i.e. a time in a date32 column) raise an error.
+
+    Args:
+        table:pa.Table -> passed table
+        column_types:dict -> pyarrow type per column name
+
+    """
+    for column, arrow_type in (column_types or {}).items():
+        if column in table.column_names and table.schema.field(column).type != arrow_type:
+            position = table.column_names.index(column)
+            table = table.set_column(position, column, table.column(column).cast(arrow_type))
+    return table
 
-def save_table_as_parquet(directory:str, outname:str, df:pd.core.frame.DataFrame, verbose:bool)->None:
+def save_table_as_parquet(directory:str, 
+                          outname:str, 
+                          df:pd.core.frame.DataFrame, 
+                          verbose:bool,
+                          drop_duplicates:bool = True,
+                          column_types:dict = None)->None:
     """
     Given a dataframe this function saves the dataframe as parquet file.
 
@@ -62,13 +554,268 @@ def save_table_as_parquet(directory:str, outname:str, df:pd.core.frame.DataFrame
         outname:str -> output file name
         df:pd.core.frame.DataFrame -> passed dataframe
         verbose:bool ->  decides wheather to print putput
+        drop_duplicates:bool -> decides wheather to drop duplicated rows,
+                                can be skipped if the rows are already unique
+        column_types:dict -> pyarrow storage type per column name
 
     """   
     full_name = os.path.join(directory, outname)
-    df.drop_duplicates().to_parquet(full_name)
+    if drop_duplicates:
+        with profiler.stage('drop_duplicates', len(df)) as record:
+            df = df.drop_duplicates()
+            record['table'] = outname
+    with profiler.stage('parquet_encoding', len(df)) as record:
+        record['table'] = outname
+        if column_types:
+            pq.write_table(cast_arrow_table(pa.Table.from_pandas(df), column_types), full_name)
+        else:
+            df.to_parquet(full_name)
     if verbose:
         print('Table saved:{}'.format(full_name))
 
+def save_tables_as_parquet(directory:str,
+                           tables:list,
+                           verbose:bool,
+                           workers:int = None,
+                           column_types:dict = None)->None:
+    """
+    Given a list of (outname, df, drop_duplicates) tuples this function saves
+    every dataframe as parquet file. With more than one worker the tables are
+    deduplicated and encoded in a pool of processes at the same time, every
+    table is still written by a single process to its own file so the output
+    doesn't depend on the number of workers.
+
+    Args:
+        directory:str -> output file directory
+        tables:list -> (outname, df, drop_duplicates) tuples
+        verbose:bool ->  decides wheather to print putput
+        workers:int -> number of processes, tables are saved one after
+                       another if None or 1
+        column_types:dict -> pyarrow storage type per column name
+
+    """
+    if workers is not None and workers < 1:
+        raise ValueError('workers must be a positive integer!')
+
+    if not workers or workers == 1 or len(tables) < 2:
+        for outname, df, drop_duplicates in tables:
+            save_table_as_parquet(directory, outname, df, verbose, drop_duplicates, column_types)
+        return
+
+    with ProcessPoolExecutor(max_workers=min(workers, len(tables))) as executor:
+        futures = [(outname, executor.submit(save_table_as_parquet, directory, outname, df, False, 
+                                                         drop_duplicates, column_types))
+                   for outname, df, drop_duplicates in tables]
+
+        for outname, future in futures:
+            try:
+                future.result()
+            except Exception as error:
+                raise Exception('Caught this error while saving {}: '.format(outname) + repr(error))
+
+            if verbose:
+                print('Table saved:{}'.format(os.path.join(directory, outname)))
+
+def append_table_to_parquet(writers:dict,
+                            directory:str, 
+                            outname:str, 
+                            df:pd.core.frame.DataFrame,
+                            row_group_size:int = None,
+                            column_types:dict = None)->None:
+    """
+    Given a dataframe this function appends it as row groups to the parquet
+    file. The writer is opened on the first call with the schema of the
+    first dataframe and stored in writers under outname, the caller is
+    responsible for closing it.
+
+    Args:
+        writers:dict -> open parquet writers keyed by output file name
+        directory:str -> output file directory
+        outname:str -> output file name
+        df:pd.core.frame.DataFrame -> passed dataframe
+        row_group_size:int -> maximum number of rows per row group
+        column_types:dict -> pyarrow storage type per column name
+
+    """
+    if outname not in writers:
+        table = cast_arrow_table(pa.Table.from_pandas(df, preserve_index=False), column_types)
+        writers[outname] = pq.ParquetWriter(os.path.join(directory, outname), 
+                                            table.schema,
+                                            write_statistics=True)
+    elif column_types:
+        table = cast_arrow_table(pa.Table.from_pandas(df, preserve_index=False), column_types).cast(writers[outname].schema)
+    else:
+        table = pa.Table.from_pandas(df, schema=writers[outname].schema, preserve_index=False)
+
+    writers[outname].write_table(table, row_group_size=row_group_size)
+
+def append_table_to_partitioned_parquet(writers:dict,
+                                        directory:str,
+                                        outname:str,
+                                        df:pd.core.frame.DataFrame,
+                                        partition_columns:list,
+                                        basename:str,
+                                        row_group_size:int = None,
+                                        column_types:dict = None)->None:
+    """
+    Given a dataframe this function appends it to a hive style partitioned
+    parquet dataset (i.e. outname/ORDERYEAR=2017/ORDERMONTH=3/basename).
+    The partition columns are only stored in the directory names.
+
+    Args:
+        writers:dict -> open parquet writers keyed by output file name
+        directory:str -> output file directory
+        outname:str -> name of the dataset directory
+        df:pd.core.frame.DataFrame -> passed dataframe
+        partition_columns:list -> columns to partition the dataset by
+        basename:str -> file name written inside every partition
+        row_group_size:int -> maximum number of rows per row group
+        column_types:dict -> pyarrow storage type per column name
+
+    """
+    for keys, partition in df.groupby(partition_columns, sort=True):
+        if not isinstance(keys, tuple):
+            keys = (keys,)
+
+        partition_directory = os.path.join(outname, *['{}={}'.format(column, value) 
+                                                      for column, value in zip(partition_columns, keys)])
+        create_directory(os.path.join(directory, partition_directory))
+        append_table_to_parquet(writers, 
+                                directory, 
+                                os.path.join(partition_directory, basename), 
+                                partition.drop(columns=partition_columns),
+                                row_group_size,
+                                column_types)
+
+def filters_to_expression(filters:list)->ds.Expression:
+    """
+    Given a list of (column, operator, value) tuples this function returns
+    the pyarrow dataset expression which combines them with AND. Supported
+    operators are =, ==, !=, <, <=, >, >=, in and not in.
+
+    Args:
+        filters:list -> list of (column, operator, value) tuples
+
+    """
+    operators = {'=': lambda field, value: field == value,
+                 '==': lambda field, value: field == value,
+                 '!=': lambda field, value: field != value,
+                 '<': lambda field, value: field < value,
+                 '<=': lambda field, value: field <= value,
+                 '>': lambda field, value: field > value,
+                 '>=': lambda field, value: field >= value,
+                 'in': lambda field, value: field.isin(list(value)),
+                 'not in': lambda field, value: ~field.isin(list(value))}
+
+    expression = None
+    for column, operator, value in filters:
+        if operator not in operators:
+            raise ValueError('Invalid filter operator: {}'.format(operator))
+
+        predicate = operators[operator](ds.field(column), value)
+        expression = predicate if expression is None else expression & predicate
+
+    return expression
+
+def get_parquet_columns(path:str)->list:
+    """
+    Returns the column names of the parquet file or hive style partitioned 
+    parquet directory (including the partition columns) without reading 
+    any data.
+
+    Args:
+        path:str -> Path of the parquet file or directory
+
+    """
+    names = ds.dataset(path, format='parquet', partitioning='hive').schema.names
+    return [name for name in names if not name.startswith('__index_level_')]
+
+def read_parquet_table(path:str, filters:list = None, columns:list = None)->pd.core.frame.DataFrame:
+    """
+    Reads and returns the parquet file or hive style partitioned parquet 
+    directory as dataframe. Only the given columns are decoded and 
+    partitions and row groups which can't match the filters are skipped 
+    without being read. date32 columns are returned as datetime64.
+
+    Args:
+        path:str -> Path of the parquet file or directory
+        filters:list -> list of (column, operator, value) tuples
+        columns:list -> columns to read, all columns if None
+
+    """
+    dataset = ds.dataset(path, format='parquet', partitioning='hive')
+    expression = filters_to_expression(filters) if filters else None
+    return dataset.to_table(columns=columns, filter=expression).to_pandas(date_as_object=False)
+
+def get_join_column(dimension_name:str, fact_columns:list)->str:
+    """
+    Returns the column linking the fact table to the given dimension, 
+    the surrogate key (i.e. CUSTOMERKEY) if the tables were saved with 
+    surrogate keys and the natural key (i.e. CUSTOMERID) otherwise.
+
+    Args:
+        dimension_name:str -> name of the dimension (i.e. CUSTOMER)
+        fact_columns:list  -> columns of the fact table
+
+    """
+    if dimension_name+'KEY' in fact_columns:
+        return dimension_name+'KEY'
+    return dimension_name+'ID'
+
+def hash_rows(df:pd.core.frame.DataFrame)->np.ndarray:
+    """
+    Given a dataframe this function returns one uint64 hash per row
+    computed from the values of all columns.
+
+    Args:
+        df:pd.core.frame.DataFrame -> passed dataframe
+
+    """
+    return pd.util.hash_pandas_object(df, index=False).values
+
+def top_n_positions(values:np.ndarray, n:int, keys:np.ndarray = None)->np.ndarray:
+    """
+    Returns the positions of the n largest values ordered from the largest
+    value down, ties ordered by the given keys (by position if None) and NaN
+    values last. The candidates are selected with np.partition in linear
+    time and only they are sorted, instead of sorting all values.
+
+    Args:
+        values:np.ndarray -> values to rank
+        n:int -> number of positions to return
+        keys:np.ndarray -> tie breaking keys aligned with the values
+
+    """
+    values = np.asarray(values)
+    if values.dtype.kind == 'f':
+        values = np.where(np.isnan(values), -np.inf, values)
+
+    n = max(min(n, len(values)), 0)
+    if n == 0:
+        return np.array([], dtype='int64')
+
+    if n < len(values):
+        threshold = np.partition(values, len(values)-n)[len(values)-n]
+        candidates = np.flatnonzero(values >= threshold)
+    else:
+        candidates = np.arange(len(values))
+
+    tie_breakers = candidates if keys is None else np.asarray(keys)[candidates]
+    order = np.lexsort((tie_breakers, -values[candidates]))
+    return candidates[order[:n]]
+
+def select_top_n(series:pd.core.series.Series, n:int)->pd.core.series.Series:
+    """
+    Given a series this function returns its n largest values ordered from
+    the largest value down, ties ordered by their position in the series.
+
+    Args:
+        series:pd.core.series.Series -> passed series
+        n:int -> number of values to return
+
+    """
+    return series.iloc[top_n_positions(series.values, n)]
+
 def remove_spaces_and_uppercase_df_columns(df:pd.core.frame.DataFrame)->None:
     """
     Given a directory this function remove whitespaces in the column names and 
@@ -77,16 +824,137 @@ def remove_spaces_and_uppercase_df_columns(df:pd.core.frame.DataFrame)->None:
     """    
     df.columns = df.columns.str.upper().str.replace(' ', '')
     
+period_granularities = ['day', 'week', 'month', 'quarter']
+
+def get_period_codes(dates:np.ndarray, granularity:str = 'month')->np.ndarray:
+    """
+    Given datetime64 values this function returns the number of the period 
+    of the given granularity (days, weeks starting on monday, months or 
+    quarters since 1970) containing each value, computed with datetime64 
+    arithmetic. Consecutive periods have consecutive codes.
+
+    Args:
+        dates:np.ndarray -> datetime64 values without NaT
+        granularity:str -> any of ['day', 'week', 'month', 'quarter']
+
+    """
+    dates = np.asarray(dates, dtype='datetime64[ns]')
+
+    if granularity == 'day':
+        return dates.astype('datetime64[D]').astype('int64')
+    elif granularity == 'week':
+        # 1970-01-01 is a thursday, shifting by 3 days lets the weeks start on monday
+        return (dates.astype('datetime64[D]').astype('int64') + 3) // 7
+    elif granularity == 'month':
+        return dates.astype('datetime64[M]').astype('int64')
+    elif granularity == 'quarter':
+        return dates.astype('datetime64[M]').astype('int64') // 3
+    else:
+        raise ValueError("Invalid granularity provided!!")
+
+def get_period_starts(codes:np.ndarray, granularity:str = 'month')->np.ndarray:
+    """
+    Given period codes (see get_period_codes) this function returns the 
+    first day of every period as datetime64[ns].
+
+    Args:
+        codes:np.ndarray -> period codes
+        granularity:str -> any of ['day', 'week', 'month', 'quarter']
+
+    """
+    codes = np.asarray(codes, dtype='int64')
+
+    if granularity == 'day':
+        starts = codes.astype('datetime64[D]')
+    elif granularity == 'week':
+        starts = (codes * 7 - 3).astype('datetime64[D]')
+    elif granularity == 'month':
+        starts = codes.astype('datetime64[M]')
+    elif granularity == 'quarter':
+        starts = (codes * 3).astype('datetime64[M]')
+    else:
+        raise ValueError("Invalid granularity provided!!")
+
+    return starts.astype('datetime64[ns]')
+
+def aggregate_by_period(df:pd.core.frame.DataFrame,
+                        date_column:str,
+                        sum_columns:list = None,
+                        count_column:str = None,
+                        granularity:str = 'month')->pd.core.frame.DataFrame:
+    """
+    Given a dataframe this function sums the given columns and counts the 
+    rows per period of the date column. The period codes are computed once 
+    per row, the rows are counted with np.bincount and the columns summed 
+    with a groupby on the codes. Every period between the first and the 
+    last one is returned, empty periods with 0 like resample. Rows without 
+    date are skipped. Returns the first day of each period in the 
+    date column followed by the sums and the count.
+
+    Args:
+        df:pd.core.frame.DataFrame -> passed dataframe
+        date_column:str -> datetime column to bucket by
+        sum_columns:list -> numeric columns to sum up
+        count_column:str -> name of the row count column, no count if None
+        granularity:str -> any of ['day', 'week', 'month', 'quarter']
+
+    """
+    dates = df[date_column].values
+    has_date = ~np.isnat(dates)
+    codes = get_period_codes(dates[has_date], granularity)
+
+    first = codes.min() if len(codes) else 0
+    size = codes.max() - first + 1 if len(codes) else 0
+    positions = codes - first
+
+    result = pd.DataFrame({date_column: get_period_starts(np.arange(first, first + size), granularity)})
+    for column in sum_columns or []:
+        # groupby sums with compensated summation like resample, np.bincount weights would drift in the last digits
+        sums = pd.Series(df[column].values[has_date]).groupby(positions).sum()
+        result[column] = sums.reindex(np.arange(size), fill_value=0).values
+    if count_column is not None:
+        result[count_column] = np.bincount(positions, minlength=size)
+
+    return result
+
+def get_period_labels(starts:np.ndarray, granularity:str = 'month')->np.ndarray:
+    """
+    Given the first days of periods this function returns their labels, 
+    containing the year so periods of different years don't collide 
+    (i.e. '2017-03-06' for days and weeks, 'Mar 2017' for months and 
+    'Q1 2017' for quarters). Only the given periods are formatted.
+
+    Args:
+        starts:np.ndarray -> first days of the periods
+        granularity:str -> any of ['day', 'week', 'month', 'quarter']
+
+    """
+    starts = pd.DatetimeIndex(starts)
+
+    if granularity in ['day', 'week']:
+        return np.asarray(starts.strftime('%Y-%m-%d'))
+    elif granularity == 'month':
+        return np.asarray(starts.strftime('%b %Y'))
+    elif granularity == 'quarter':
+        return np.asarray(['Q{} {}'.format(quarter, year) for quarter, year in zip(starts.quarter, starts.year)])
+    else:
+        raise ValueError("Invalid granularity provided!!")
+
 def replace_date_to_month_column(df:pd.core.frame.DataFrame, 
-                                 convert_column:str = 'ORDERDATE')->pd.core.frame.DataFrame:
+                                 convert_column:str = 'ORDERDATE',
+                                 granularity:str = 'month')->pd.core.frame.DataFrame:
     """
-    Given a dataframe this function converts the given datetime column to MONTH.
+    Given a dataframe holding the first days of periods (i.e. returned by 
+    aggregate_by_period) this function converts the given datetime column 
+    to the period labels, the column is named after the granularity (i.e. 
+    MONTH).
 
     Args:
         df:pd.core.frame.DataFrame -> passed dataframe
         convert_column:str -> datetime column to convert
+        granularity:str -> any of ['day', 'week', 'month', 'quarter']
 
     """ 
-    df = df.rename({convert_column:'MONTH'}, axis=1)
-    df['MONTH'] = df['MONTH'].dt.strftime('%b')  
-    return df
\ No newline at end of file
+    df = df.rename({convert_column:granularity.upper()}, axis=1)
+    df[granularity.upper()] = get_period_labels(df[granularity.upper()].values, granularity)
+    return df
@@ -1,14 +1,28 @@
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 import unittest
+import json
 import os
 import sys
+import tempfile
 sys.path.insert(0, os.getcwd()) #adding current directory to pythonpath
+from Benchmarks.synthetic_sales import generate_sales
+from Benchmarks.synthetic_sales import write_sales
+from Scripts.calculate_kpi import aggregate_chunks
+from Scripts.calculate_kpi import compute_kpis
 from Scripts.calculate_kpi import get_revenues_sum 
 from Scripts.calculate_kpi import get_top_n_customers
+from Scripts.calculate_kpi import get_top_n_customers_from_partitions
 from Scripts.calculate_kpi import orders_per_month
+from Scripts import calculate_star_kpi
 from Scripts.ETL import ETL
+from Scripts.Profiler import profiler
+from Scripts import utils
 from Scripts.utils import read_xlsx
 from Scripts.utils import remove_spaces_and_uppercase_df_columns
+from Scripts.utils import save_tables_as_parquet
 
 class TestStarSchemaMethods(unittest.TestCase):
     """
@@ -21,7 +35,23 @@ class TestStarSchemaMethods(unittest.TestCase):
 
     Methods
     -------
+    test_get_transformed_tables()
     test_get_merged_table_method()
+    test_streaming_transform_table()
+    test_surrogate_keys_transform_table()
+    test_incremental_transform_table()
+    test_scd2_transform_table()
+    test_partitioned_fact_table()
+    test_column_and_filter_pushdown()
+    test_parallel_transform_table()
+    test_multi_source_transform_table()
+    test_snowflake_and_wide_table_schemas()
+    test_arrow_transform_table()
+    test_categorical_columns()
+    test_column_schema()
+    test_iter_merged_table()
+    test_parallel_compute_aggregates()
+    test_profiler_report()
     """
 
 
@@ -64,6 +94,515 @@ class TestStarSchemaMethods(unittest.TestCase):
                                       merged_result_output, 
                                       check_like = True)
 
+    def test_streaming_transform_table(self):
+        """
+        method to check that the chunked ingestion of the StarSchema class
+        produces the same tables as the in-memory transformation
+        """
+        with tempfile.TemporaryDirectory() as save_directory:
+            streamed = ETL('starschema')
+            streamed.init_params(chunksize = 5000, **star_arguments)
+            streamed.transform_table(save_directory, verbose=False)
+            result = streamed.get_merged_table(verbose=False).sort_values(['PRODUCTID', 'ORDERID']).reset_index(drop=True)
+
+            # duplicated rows spanning the batches and a column without values in the first batch
+            duplicated = os.path.join(save_directory, 'duplicated.csv')
+            duplicated_dataframe = pd.concat([self.original_dataframe, self.original_dataframe.iloc[:50]])
+            duplicated_dataframe.to_csv(duplicated, index=False)
+            streamed.init_params(chunksize = 5000, **dict(star_arguments, dataframe_xlsx_path = duplicated))
+            streamed.transform_table(save_directory, verbose=False)
+            duplicated_result = streamed.get_merged_table(verbose=False).sort_values(['PRODUCTID', 'ORDERID']).reset_index(drop=True)
+
+            duplicated_dataframe['CUSTOMERREGION'] = duplicated_dataframe['CUSTOMERREGION'].where(
+                ~duplicated_dataframe['CUSTOMERID'].isin(duplicated_dataframe['CUSTOMERID'].iloc[:5000]))
+            duplicated_dataframe.to_csv(duplicated, index=False)
+            for schema in ['starschema', 'widetable']:
+                arguments = dict(star_arguments, dataframe_xlsx_path = duplicated)
+                if schema == 'widetable':
+                    arguments = {key:arguments[key] for key in ['dataframe_xlsx_path', 'xlsx_sheet_name']}
+                streamed = ETL(schema)
+                streamed.init_params(chunksize = 5000, **arguments)
+                streamed.transform_table(save_directory, verbose=False)
+                regions = streamed.get_merged_table(verbose=False, columns=['CUSTOMERREGION'])['CUSTOMERREGION']
+                self.assertEqual(len(regions), len(self.original_dataframe))
+                self.assertEqual(regions.isnull().sum(), duplicated_dataframe.iloc[:-50]['CUSTOMERREGION'].isnull().sum())
+
+        pd.testing.assert_frame_equal(merged_result_output,
+                                      result,
+                                      check_like = True)
+        pd.testing.assert_frame_equal(merged_result_output,
+                                      duplicated_result,
+                                      check_like = True)
+
+    def test_surrogate_keys_transform_table(self):
+        """
+        method to check that the fact table is linked through int32 surrogate 
+        keys which are stable across runs
+        """
+        with tempfile.TemporaryDirectory() as save_directory:
+            surrogate = ETL('starschema')
+            surrogate.init_params(**star_arguments)
+            surrogate.transform_table(save_directory, verbose=False, surrogate_keys=True)
+            fact_table, dimension_tables = surrogate.get_transformed_tables(verbose=False)
+
+            for key in ['PRODUCT', 'CUSTOMER', 'ORDER']:
+                self.assertEqual(fact_table[key+'KEY'].dtype, 'int32')
+                self.assertNotIn(key+'ID', fact_table.columns)
+                self.assertTrue(dimension_tables['dim_'+key][key+'ID'].is_unique)
+
+            surrogate.transform_table(save_directory, verbose=False, surrogate_keys=True)
+            rerun_fact_table, _ = surrogate.get_transformed_tables(verbose=False)
+            pd.testing.assert_frame_equal(fact_table, rerun_fact_table)
+
+            result = surrogate.get_merged_table(verbose=False).sort_values(['PRODUCTID', 'ORDERID']).reset_index(drop=True)
+
+        pd.testing.assert_frame_equal(merged_result_output,
+                                      result,
+                                      check_like = True)
+
+    def test_incremental_transform_table(self):
+        """
+        method to check that incremental runs only append the rows which
+        are not saved yet
+        """
+        with tempfile.TemporaryDirectory() as save_directory:
+            first_half = os.path.join(save_directory, 'first_half.csv')
+            full = os.path.join(save_directory, 'full.csv')
+            self.original_dataframe.iloc[:9000].to_csv(first_half, index=False)
+            self.original_dataframe.to_csv(full, index=False)
+
+            incremental = ETL('starschema')
+            arguments = dict(star_arguments, dataframe_xlsx_path = first_half)
+            incremental.init_params(chunksize = 5000, **arguments)
+            incremental.transform_table(save_directory, verbose=False, surrogate_keys=True)
+
+            arguments = dict(star_arguments, dataframe_xlsx_path = full)
+            incremental.init_params(chunksize = 5000, **arguments)
+            incremental.transform_table(save_directory, verbose=False, surrogate_keys=True, incremental=True)
+            incremental.transform_table(save_directory, verbose=False, surrogate_keys=True, incremental=True)
+
+            fact_table, dimension_tables = incremental.get_transformed_tables(verbose=False)
+            self.assertEqual(len(fact_table), len(self.original_dataframe))
+            self.assertTrue(dimension_tables['dim_ORDER']['ORDERID'].is_unique)
+
+            result = incremental.get_merged_table(verbose=False).sort_values(['PRODUCTID', 'ORDERID']).reset_index(drop=True)
+
+            # duplicated source rows, in memory and spanning the batches
+            duplicated = os.path.join(save_directory, 'duplicated.csv')
+            pd.concat([self.original_dataframe, self.original_dataframe.iloc[:50]]).to_csv(duplicated, index=False)
+            arguments = dict(star_arguments, dataframe_xlsx_path = duplicated)
+            for source_arguments in [{'engine': 'arrow'}, {'chunksize': 1000}]:
+                incremental.init_params(**source_arguments, **arguments)
+                incremental.transform_table(save_directory, verbose=False)
+                fact_table, _ = incremental.get_transformed_tables(verbose=False)
+                incremental.init_params(chunksize = 1000, **arguments)
+                incremental.transform_table(save_directory, verbose=False, incremental=True)
+                rerun_fact_table, _ = incremental.get_transformed_tables(verbose=False)
+                self.assertEqual(len(fact_table), len(self.original_dataframe))
+                self.assertEqual(len(rerun_fact_table), len(fact_table))
+
+        pd.testing.assert_frame_equal(merged_result_output,
+                                      result,
+                                      check_like = True)
+
+    def test_scd2_transform_table(self):
+        """
+        method to check that a changed customer segment is saved as new
+        version of the customer and that the fact rows keep the version
+        current when they were loaded
+        """
+        with tempfile.TemporaryDirectory() as save_directory:
+            first_half = os.path.join(save_directory, 'first_half.csv')
+            full = os.path.join(save_directory, 'full.csv')
+            self.original_dataframe.iloc[:9000].to_csv(first_half, index=False)
+
+            customer_ids = set(self.original_dataframe['CUSTOMERID'].iloc[:9000]) & set(self.original_dataframe['CUSTOMERID'].iloc[9000:])
+            changed_id = min(customer_ids)
+            changed_dataframe = self.original_dataframe.copy()
+            changed_dataframe.loc[changed_dataframe['CUSTOMERID'] == changed_id, 'CUSTOMERSEGMENT'] = 'Changed'
+            changed_dataframe.to_csv(full, index=False)
+
+            scd2 = ETL('starschema')
+            scd2.init_params(chunksize = 5000, **dict(star_arguments, dataframe_xlsx_path = first_half))
+            with self.assertRaises(ValueError):
+                scd2.transform_table(save_directory, verbose=False, scd2=True)
+            scd2.transform_table(save_directory, verbose=False, surrogate_keys=True, scd2=True)
+            with self.assertRaises(ValueError):
+                scd2.transform_table(save_directory, verbose=False, surrogate_keys=True, incremental=True)
+            with self.assertRaises(ValueError):
+                scd2.transform_table(save_directory, verbose=False, surrogate_keys=True, scd2=True)
+
+            scd2.init_params(chunksize = 5000, **dict(star_arguments, dataframe_xlsx_path = full))
+            scd2.transform_table(save_directory, verbose=False, surrogate_keys=True, scd2=True, incremental=True)
+            _, dimension_tables = scd2.get_transformed_tables(verbose=False)
+            scd2.transform_table(save_directory, verbose=False, surrogate_keys=True, scd2=True, incremental=True)
+            fact_table, rerun_dimension_tables = scd2.get_transformed_tables(verbose=False)
+            result = scd2.get_merged_table(verbose=False, columns=['PRODUCTID', 'ORDERID', 'CUSTOMERID', 'CUSTOMERSEGMENT'])
+
+        customers = rerun_dimension_tables['dim_CUSTOMER']
+        versions = customers[customers['CUSTOMERID'] == changed_id].sort_values('CUSTOMERKEY')
+        self.assertEqual(len(customers), len(dimension_tables['dim_CUSTOMER']))
+        self.assertTrue(customers['CUSTOMERKEY'].is_unique)
+        self.assertTrue(customers.loc[customers['CUSTOMERISCURRENT'], 'CUSTOMERID'].is_unique)
+        self.assertListEqual(list(versions['CUSTOMERISCURRENT']), [False, True])
+        self.assertEqual(versions['CUSTOMERVALIDTO'].iloc[0], versions['CUSTOMERVALIDFROM'].iloc[1])
+        self.assertTrue(pd.isnull(versions['CUSTOMERVALIDTO'].iloc[1]))
+        self.assertEqual(len(fact_table), len(self.original_dataframe))
+
+        first_rows = pd.MultiIndex.from_frame(self.original_dataframe[['PRODUCTID', 'ORDERID']].iloc[:9000])
+        segments = result[result['CUSTOMERID'] == changed_id]
+        is_first_row = pd.MultiIndex.from_frame(segments[['PRODUCTID', 'ORDERID']]).isin(first_rows)
+        self.assertTrue((segments.loc[is_first_row, 'CUSTOMERSEGMENT'] != 'Changed').all())
+        self.assertTrue((segments.loc[~is_first_row, 'CUSTOMERSEGMENT'] == 'Changed').all())
+        self.assertTrue((~is_first_row).any())
+
+    def test_partitioned_fact_table(self):
+        """
+        method to check that the fact table partitioned by ORDERDATE month
+        only returns the filtered partitions
+        """
+        with tempfile.TemporaryDirectory() as save_directory:
+            partitioned = ETL('starschema')
+            partitioned.init_params(**star_arguments)
+            partitioned.transform_table(save_directory, verbose=False, partition_fact_by='ORDERDATE')
+
+            self.assertTrue(os.path.isdir(os.path.join(save_directory, 'SALES', 'StarSchema', 
+                                                       'fact_SALES.parquet', 'ORDERYEAR=2017', 'ORDERMONTH=3')))
+
+            result = partitioned.get_merged_table(verbose=False, filters=[('ORDERYEAR', '=', 2017),
+                                                                          ('ORDERMONTH', '=', 3)])
+            self.assertEqual(len(result), 1597)
+            self.assertTrue((result['ORDERDATE'].dt.month == 3).all())
+
+            result = partitioned.get_merged_table(verbose=False).drop(columns=['ORDERYEAR', 'ORDERMONTH'])
+            result = result.sort_values(['PRODUCTID', 'ORDERID']).reset_index(drop=True)
+
+            # duplicated source rows and missing dates with the arrow engine
+            duplicated = os.path.join(save_directory, 'duplicated.csv')
+            pd.concat([self.original_dataframe, self.original_dataframe.iloc[:50]]).to_csv(duplicated, index=False)
+            partitioned.init_params(engine = 'arrow', **dict(star_arguments, dataframe_xlsx_path = duplicated))
+            partitioned.transform_table(save_directory, verbose=False, partition_fact_by='ORDERDATE')
+            duplicated_result = partitioned.get_merged_table(verbose=False).drop(columns=['ORDERYEAR', 'ORDERMONTH'])
+
+            missing_dates = self.original_dataframe.copy()
+            missing_dates.loc[0, 'ORDERDATE'] = pd.NaT
+            missing_dates.to_csv(duplicated, index=False)
+            for arguments in [{'engine': 'arrow'}, {'chunksize': 5000}]:
+                partitioned.init_params(**arguments, **dict(star_arguments, dataframe_xlsx_path = duplicated))
+                with self.assertRaises(ValueError):
+                    partitioned.transform_table(save_directory, verbose=False, partition_fact_by='ORDERDATE')
+
+        pd.testing.assert_frame_equal(merged_result_output,
+                                      result,
+                                      check_like = True)
+        pd.testing.assert_frame_equal(merged_result_output,
+                                      duplicated_result.sort_values(['PRODUCTID', 'ORDERID']).reset_index(drop=True),
+                                      check_like = True)
+
+    def test_column_and_filter_pushdown(self):
+        """
+        method to check that only the requested columns and the dimensions
+        providing them are read
+        """
+        columns = ['CUSTOMERID', 'CUSTOMERNAME', 'REVENUE']
+        fact_table, dimension_tables = star.get_transformed_tables(verbose=False, columns=columns)
+
+        self.assertListEqual(list(dimension_tables.keys()), ['dim_CUSTOMER'])
+        self.assertListEqual(list(fact_table.columns.values), ['CUSTOMERID', 'REVENUE'])
+
+        result = star.get_merged_table(verbose=False, columns=columns)
+        self.assertListEqual(list(result.columns.values), columns)
+        self.assertAlmostEqual(result['REVENUE'].sum(), merged_result_output['REVENUE'].sum(), places=2)
+
+        result = star.get_merged_table(verbose=False, 
+                                       columns=['ORDERID', 'REVENUE'],
+                                       filters=[('CUSTOMERSEGMENT', '=', 'Consumer')])
+        expected = merged_result_output[merged_result_output['CUSTOMERSEGMENT']=='Consumer']
+        self.assertEqual(len(result), len(expected))
+
+        # a filter on a column which is not saved is not silently dropped
+        filters = [('ORDERDAT', '>', '2099-01-01')]
+        for query in [dict(), dict(columns=['ORDERID', 'REVENUE'])]:
+            with self.assertRaisesRegex(ValueError, 'Invalid column provided'):
+                star.get_transformed_tables(verbose=False, filters=filters, **query)
+            with self.assertRaisesRegex(ValueError, 'Invalid column provided'):
+                next(star.iter_merged_table(verbose=False, filters=filters, **query))
+            with self.assertRaisesRegex(Exception, 'Invalid column provided'):
+                star.get_merged_table(verbose=False, filters=filters, **query)
+
+    def test_parallel_transform_table(self):
+        """
+        method to check that saving the tables in a process pool gives the
+        same tables as saving them one after another and names the table
+        of a failed worker
+        """
+        expected_fact_table, expected_dimension_tables = star.get_transformed_tables(verbose=False)
+
+        with tempfile.TemporaryDirectory() as save_directory:
+            parallel = ETL('starschema')
+            parallel.init_params(**star_arguments)
+            parallel.transform_table(save_directory, verbose=False, workers=2)
+            fact_table, dimension_tables = parallel.get_transformed_tables(verbose=False)
+
+            tables = [('dim_TEST.parquet', expected_dimension_tables['dim_ORDER'], True)] * 2
+            with self.assertRaisesRegex(Exception, 'dim_TEST.parquet'):
+                save_tables_as_parquet(os.path.join(save_directory, 'missing'), tables, False, workers=2)
+
+        pd.testing.assert_frame_equal(fact_table, expected_fact_table)
+        self.assertListEqual(list(dimension_tables.keys()), list(expected_dimension_tables.keys()))
+        for name, dimension_table in dimension_tables.items():
+            pd.testing.assert_frame_equal(dimension_table, expected_dimension_tables[name])
+
+    def test_multi_source_transform_table(self):
+        """
+        method to check that sources parsed by a pool of workers give the
+        same tables as the single source and that failed sources are
+        skipped and reported
+        """
+        original_dataframe = read_xlsx('sales.xlsx', 'Sales')
+
+        with tempfile.TemporaryDirectory() as save_directory:
+            for number, part in enumerate(np.array_split(original_dataframe, 3)):
+                part.to_csv(os.path.join(save_directory, 'sales_{}.csv'.format(number)), index=False)
+            original_dataframe.iloc[:5, :5].to_csv(os.path.join(save_directory, 'other.csv'), index=False)
+            with open(os.path.join(save_directory, 'broken.xlsx'), 'w') as file:
+                file.write('not a workbook')
+
+            # the smallest, malformed source is parsed in the first wave and finishes first
+            sources = [os.path.join(save_directory, name) for name in ['sales_0.csv', 'other.csv', 'sales_[12].csv', 'broken.xlsx']]
+            batched = ETL('starschema')
+            batched.init_params(ingest_workers = 2, chunksize = 4000, **dict(star_arguments, dataframe_xlsx_path = sources))
+            batched.transform_table(save_directory, verbose=False)
+            result = batched.get_merged_table(verbose=False).sort_values(['PRODUCTID', 'ORDERID']).reset_index(drop=True)
+            report = {os.path.basename(item['path']):item for item in batched.get_ingest_report()}
+
+            with self.assertRaises(FileNotFoundError):
+                batched.init_params(**dict(star_arguments, dataframe_xlsx_path = os.path.join(save_directory, '*.xlsm')))
+
+        pd.testing.assert_frame_equal(merged_result_output,
+                                      result,
+                                      check_like = True)
+        self.assertListEqual(sorted(report.keys()), ['broken.xlsx', 'other.csv', 'sales_0.csv', 'sales_1.csv', 'sales_2.csv'])
+        self.assertEqual(sum(report['sales_{}.csv'.format(number)]['rows'] for number in range(3)), len(original_dataframe))
+        self.assertIsNotNone(report['broken.xlsx']['error'])
+        self.assertIn('Columns differ', report['other.csv']['error'])
+
+    def test_snowflake_and_wide_table_schemas(self):
+        """
+        method to check that the snowflake schema and the wide table give
+        the same merged table and KPIs as the star schema
+        """
+        query = {'columns': ['CUSTOMERREGION', 'PRODUCTNAME', 'REVENUE'],
+                 'filters': [('PRODUCTCATEGORY', '=', 'Office')]}
+        sort_columns = ['PRODUCTID', 'ORDERID']
+        expected_query = star.get_merged_table(verbose=False, **query).sort_values(query['columns']).reset_index(drop=True)
+
+        with tempfile.TemporaryDirectory() as save_directory:
+            snowflake = ETL('snowflakeschema')
+            snowflake.init_params(**star_arguments)
+            snowflake.transform_table(save_directory, verbose=False, surrogate_keys=True)
+            _, dimension_tables = snowflake.get_transformed_tables(verbose=False)
+            snowflake_result = snowflake.get_merged_table(verbose=False).sort_values(sort_columns).reset_index(drop=True)
+            snowflake_query = snowflake.get_merged_table(verbose=False, **query).sort_values(query['columns']).reset_index(drop=True)
+            snowflake_chunks = pd.concat(snowflake.iter_merged_table(verbose=False, chunksize=4000), ignore_index=True)
+            snowflake_chunks = snowflake_chunks.sort_values(sort_columns).reset_index(drop=True)
+            snowflake_chunk_query = pd.concat(snowflake.iter_merged_table(verbose=False, **query), ignore_index=True)
+            snowflake_chunk_query = snowflake_chunk_query.sort_values(query['columns']).reset_index(drop=True)
+            snowflake_aggregates = snowflake.compute_aggregates(verbose=False, workers=2)
+            snowflake.transform_table(save_directory, verbose=False, partition_fact_by='ORDERDATE')
+            snowflake_parallel = snowflake.compute_aggregates(verbose=False, workers=2, cubes=['monthly'], filters=query['filters'])
+
+            wide = ETL('widetable')
+            wide.init_params(chunksize = 5000, **{key:star_arguments[key] for key in ['dataframe_xlsx_path', 'xlsx_sheet_name']})
+            wide.transform_table(save_directory, verbose=False, build_aggregates=True)
+            wide_result = wide.get_merged_table(verbose=False).sort_values(sort_columns).reset_index(drop=True)
+            wide_chunks = pd.concat(wide.iter_merged_table(verbose=False, chunksize=4000), ignore_index=True)
+            wide_query = wide.get_merged_table(verbose=False, **query).sort_values(query['columns']).reset_index(drop=True)
+            wide_aggregates = wide.get_aggregates()
+
+        self.assertListEqual(sorted(dimension_tables.keys()), ['dim_CUSTOMER', 'dim_CUSTOMERREGION', 'dim_ORDER',
+                                                               'dim_PRODUCT', 'dim_PRODUCTCATEGORY'])
+        self.assertIn('PRODUCTCATEGORYKEY', dimension_tables['dim_PRODUCT'].columns)
+        self.assertNotIn('PRODUCTCATEGORY', dimension_tables['dim_PRODUCT'].columns)
+
+        for result in [snowflake_result, snowflake_chunks, wide_result]:
+            pd.testing.assert_frame_equal(merged_result_output, result, check_like = True)
+        for result in [snowflake_query, snowflake_chunk_query, wide_query[query['columns']]]:
+            pd.testing.assert_frame_equal(expected_query, result)
+        self.assertEqual(len(wide_chunks), len(merged_result_output))
+        self.assertEqual(len(expected_query), 2054)
+
+        expected = compute_kpis(merged_result_output)
+        for result in [compute_kpis(wide_aggregates), compute_kpis(snowflake_result), compute_kpis(snowflake_aggregates)]:
+            for kpi, expected_result in expected.items():
+                pd.testing.assert_frame_equal(result[kpi], expected_result)
+        pd.testing.assert_frame_equal(get_revenues_sum(snowflake_parallel, variable = 'month'),
+                                      get_revenues_sum(merged_result_output[merged_result_output['PRODUCTCATEGORY']=='Office'], variable = 'month'))
+
+        for schema, arguments in [(snowflake, {'incremental': True}), (snowflake, {'scd2': True}), (wide, {'surrogate_keys': True})]:
+            with self.assertRaisesRegex(ValueError, list(arguments.keys())[0]):
+                schema.transform_table(verbose=False, **arguments)
+
+    def test_arrow_transform_table(self):
+        """
+        method to check that the tables written from the pyarrow table 
+        give the original merged table
+        """
+        with tempfile.TemporaryDirectory() as save_directory:
+            arrow = ETL('starschema')
+            arrow.init_params(engine = 'arrow', **star_arguments)
+            self.assertIsNone(arrow.schema_obj.dataframe)
+
+            for arguments in [{}, {'surrogate_keys': True, 'partition_fact_by': 'ORDERDATE'}]:
+                arrow.transform_table(save_directory, verbose=False, **arguments)
+                result = arrow.get_merged_table(verbose=False)
+                result = result.drop(columns=[column for column in ['ORDERYEAR', 'ORDERMONTH'] if column in result.columns])
+                result = result.sort_values(['PRODUCTID', 'ORDERID']).reset_index(drop=True)
+
+                pd.testing.assert_frame_equal(merged_result_output,
+                                              result,
+                                              check_like = True)
+
+    def test_categorical_columns(self):
+        """
+        method to check that the inferred categorical columns are kept in 
+        the saved tables and give the original merged table
+        """
+        categorical_columns = ['ORDERPRIORITY', 'BOXSIZE', 'CUSTOMERREGION', 'CUSTOMERSEGMENT', 'PRODUCTNAME', 'PRODUCTCATEGORY']
+
+        with tempfile.TemporaryDirectory() as save_directory:
+            categorical = ETL('starschema')
+            categorical.init_params(infer_categories = True, **star_arguments)
+            self.assertListEqual(sorted(categorical.schema_obj.categorical_columns), sorted(categorical_columns))
+
+            categorical.transform_table(save_directory, verbose=False)
+            result = categorical.get_merged_table(verbose=False)
+            result = result.sort_values(['PRODUCTID', 'ORDERID']).reset_index(drop=True)
+
+        for column in categorical_columns:
+            self.assertEqual(result[column].dtype.name, 'category')
+
+        pd.testing.assert_frame_equal(merged_result_output,
+                                      result.astype({column:object for column in categorical_columns}),
+                                      check_like = True)
+
+    def test_column_schema(self):
+        """
+        method to check that the declared column types are saved in the 
+        parquet files and the tables still give the original merged table
+        """
+        column_schema = {'ORDERID': 'int32', 'CUSTOMERID': 'int32', 'ORDERQUANTITY': 'int16', 
+                         'DISCOUNT': 'float32', 'ORDERDATE': 'date32', 'DELIVERYDATE': 'date32'}
+
+        with tempfile.TemporaryDirectory() as save_directory:
+            typed = ETL('starschema')
+            typed.init_params(column_schema = column_schema, **star_arguments)
+            typed.transform_table(save_directory, verbose=False)
+
+            saved_schema = pq.read_schema(os.path.join(save_directory, 'SALES', 'StarSchema', 'fact_SALES.parquet'))
+            for column, arrow_type in column_schema.items():
+                if column in saved_schema.names:
+                    self.assertEqual(str(saved_schema.field(column).type), str(pa.type_for_alias(arrow_type)))
+
+            result = typed.get_merged_table(verbose=False)
+            result = result.sort_values(['PRODUCTID', 'ORDERID']).reset_index(drop=True)
+
+        # the inferred types are kept by default, 'compact' opts into the compact schema
+        saved_schema = pq.read_schema(os.path.join(star.schema_obj.save_directory, 'fact_SALES.parquet'))
+        self.assertEqual(str(saved_schema.field('ORDERID').type), 'int64')
+
+        with tempfile.TemporaryDirectory() as save_directory:
+            typed.init_params(column_schema = 'compact', **star_arguments)
+            typed.transform_table(save_directory, verbose=False)
+            saved_schema = pq.read_schema(os.path.join(save_directory, 'SALES', 'StarSchema', 'fact_SALES.parquet'))
+        for column, arrow_type in {'ORDERID': 'int32', 'ORDERQUANTITY': 'int16', 'DISCOUNT': 'float32', 
+                                   'DELIVERYDATE': 'date32', 'REVENUE': 'float64'}.items():
+            self.assertEqual(saved_schema.field(column).type, pa.type_for_alias(arrow_type))
+
+        self.assertEqual(result['ORDERQUANTITY'].dtype, 'int16')
+        self.assertEqual(result['ORDERDATE'].dtype, 'datetime64[ns]')
+        pd.testing.assert_frame_equal(merged_result_output,
+                                      result,
+                                      check_like = True,
+                                      check_dtype = False)
+
+    def test_iter_merged_table(self):
+        """
+        method to check that the chunks of iter_merged_table give the
+        merged table, also with pushed down columns and filters
+        """
+        chunks = list(star.iter_merged_table(verbose=False, chunksize=5000))
+        self.assertTrue(all(len(chunk) <= 5000 for chunk in chunks))
+
+        result = pd.concat(chunks, ignore_index=True)
+        result = result.sort_values(['PRODUCTID', 'ORDERID']).reset_index(drop=True)
+        pd.testing.assert_frame_equal(merged_result_output,
+                                      result,
+                                      check_like = True)
+
+        query = {'columns': ['ORDERID', 'CUSTOMERNAME', 'REVENUE'],
+                 'filters': [('CUSTOMERSEGMENT', '=', 'Consumer'), ('REVENUE', '>', 100)]}
+        expected = star.get_merged_table(verbose=False, **query).sort_values(['ORDERID', 'REVENUE']).reset_index(drop=True)
+        result = pd.concat(star.iter_merged_table(verbose=False, chunksize=5000, **query), ignore_index=True)
+        pd.testing.assert_frame_equal(expected,
+                                      result.sort_values(['ORDERID', 'REVENUE']).reset_index(drop=True))
+
+    def test_parallel_compute_aggregates(self):
+        """
+        method to check that the KPI cubes computed by a pool of workers
+        over the row groups of the fact table answer the KPIs like the 
+        merged table
+        """
+        with tempfile.TemporaryDirectory() as save_directory:
+            partitioned = ETL('starschema')
+            partitioned.init_params(**star_arguments)
+            partitioned.transform_table(save_directory, verbose=False, partition_fact_by='ORDERDATE', surrogate_keys=True)
+
+            self.assertEqual(len(partitioned.schema_obj.get_fact_row_groups()), 12)
+
+            result = compute_kpis(partitioned.compute_aggregates(verbose=False, workers=3))
+            expected = compute_kpis(merged_result_output)
+            for kpi, expected_result in expected.items():
+                pd.testing.assert_frame_equal(result[kpi], expected_result)
+
+            query = {'filters': [('CUSTOMERSEGMENT', '=', 'Consumer')]}
+            result = partitioned.compute_aggregates(verbose=False, workers=2, cubes=['monthly'], **query)
+            pd.testing.assert_frame_equal(get_revenues_sum(result, variable = 'month'),
+                                          get_revenues_sum(partitioned.get_merged_table(verbose=False, **query), variable = 'month'))
+
+    def test_profiler_report(self):
+        """
+        method to check that the profiler records the stages of a run and
+        the KPI functions in the JSON report and nothing while stopped
+        """
+        with tempfile.TemporaryDirectory() as save_directory:
+            profiled = ETL('starschema')
+            try:
+                profiler.start(trace_memory=True)
+                profiled.init_params(**star_arguments)
+                profiled.transform_table(save_directory, verbose=False)
+                compute_kpis(profiled.get_merged_table(verbose=False))
+            finally:
+                profiler.stop()
+
+            report_path = os.path.join(save_directory, 'report.json')
+            profiler.save_report(report_path)
+            with open(report_path) as file:
+                report = json.load(file)
+
+            profiled.transform_table(save_directory, verbose=False)
+
+        stages = {record['name']:record for record in report['stages']}
+        for name in ['read', 'normalize_columns', 'deep_copy', 'dimension_projection', 'drop_duplicates', 'parquet_encoding', 'reload',
+                     'StarSchema.transform_table', 'calculate_kpi.compute_kpis']:
+            self.assertIn(name, report['totals'])
+
+        self.assertEqual(report['totals']['parquet_encoding']['calls'], 4)
+        self.assertEqual(stages['deep_copy']['rows'], len(merged_result_output))
+        self.assertEqual(stages['deep_copy']['parent'], 'StarSchema.transform_table')
+        self.assertEqual(stages['calculate_kpi.compute_kpis']['rows'], len(merged_result_output))
+        self.assertTrue(all(record['wall_time'] >= 0 and 'traced_memory_delta' in record for record in report['stages']))
+        self.assertEqual(len(profiler.records), len(report['stages']))
 
 class Test_calculate_kpi_Functions(unittest.TestCase):
     """
@@ -86,6 +625,11 @@ class Test_calculate_kpi_Functions(unittest.TestCase):
     test_get_revenues_sum()
     test_orders_per_month()
     test_top_10_customers
+    test_top_n_customers_from_partitions()
+    test_compute_kpis()
+    test_kpi_aggregates()
+    test_streaming_kpis()
+    test_sql_engine()
     """
 
     get_total_monthly_revenue = [353288.61, 300610.43, 344940.2 , 358513.21, 403075.57, 315658.33,
@@ -99,7 +643,7 @@ class Test_calculate_kpi_Functions(unittest.TestCase):
                                   1556.89, 1562.0, 1563.45, 1565.17]
 
     top_10_customerid_by_order = [100922787, 100922788, 100922789, 100922790, 100922791, 100922792,
-                                  100922793, 100922794, 100922795, 100922033]
+                                  100922793, 100922794, 100922795, 100922003]
 
     top_10_customerid_by_revenue = [100922376, 100922723, 100922321, 100922132, 100922322, 100922384,
                                     100922114, 100922375, 100922652, 100922295]
@@ -146,15 +690,329 @@ class Test_calculate_kpi_Functions(unittest.TestCase):
         self.assertListEqual(result,
                              self.top_10_customerid_by_revenue)
 
+    def test_top_n_customers_from_partitions(self):
+        """
+        method to check that merging the top n customers of customer partitions
+        matches top_10_customers method of the calculate_kpi module
+        """
+        partitions = [partition for _, partition in merged_result_output.groupby(merged_result_output['CUSTOMERID'] % 4)]
+
+        for sort_column in ['lifetimeordervolume', 'LIFETIMEREVENUE']:
+            pd.testing.assert_frame_equal(get_top_n_customers_from_partitions(iter(partitions), sort_column = sort_column),
+                                          get_top_n_customers(merged_result_output, sort_column = sort_column))
+
+    def test_compute_kpis(self):
+        """
+        method to check that compute_kpis method of the calculate_kpi module
+        matches the single KPI methods
+        """
+        result = compute_kpis(merged_result_output)
+
+        expected = {'monthlyrevenue': get_revenues_sum(merged_result_output, variable = 'month'),
+                    'monthlyorders': orders_per_month(merged_result_output, aggregate_function='sum'),
+                    'monthlyaverageordervolume': orders_per_month(merged_result_output, aggregate_function='average order volume'),
+                    'customersegmentrevenue': get_revenues_sum(merged_result_output, variable = 'customer segment'),
+                    'topcustomersbyrevenue': get_top_n_customers(merged_result_output, sort_column = 'LIFETIMEREVENUE'),
+                    'topcustomersbyordervolume': get_top_n_customers(merged_result_output, sort_column = 'lifetimeordervolume')}
+
+        self.assertListEqual(sorted(result.keys()), sorted(expected.keys()))
+        for kpi, expected_result in expected.items():
+            pd.testing.assert_frame_equal(result[kpi], expected_result)
+
+        result = compute_kpis(merged_result_output, kpis = ['Monthly Orders'])
+        self.assertListEqual(list(result.keys()), ['monthlyorders'])
+
+        # a customer saved in two segments keeps one lifetime row
+        df = pd.DataFrame({'CUSTOMERID': [1, 1, 2], 'CUSTOMERNAME': ['A', 'A', 'B'], 'CUSTOMERSEGMENT': ['X', 'Y', 'X'],
+                           'REVENUE': [5.0, 5.0, 8.0], 'ORDERID': [1, 2, 3]})
+        result = compute_kpis(df, kpis = ['customersegmentrevenue', 'topcustomersbyrevenue', 'topcustomersbyordervolume'], n = 2)
+        pd.testing.assert_frame_equal(result['topcustomersbyrevenue'], get_top_n_customers(df, n = 2, sort_column = 'LIFETIMEREVENUE'))
+        pd.testing.assert_frame_equal(result['topcustomersbyordervolume'], get_top_n_customers(df, n = 2, sort_column = 'LIFETIMEORDERVOLUME'))
+        self.assertListEqual(list(result['topcustomersbyrevenue']['LIFETIMEREVENUE']), [10.0, 8.0])
+
+    def test_kpi_aggregates(self):
+        """
+        method to check that the KPI cubes saved by transform_table, also when
+        maintained by incremental runs, answer the KPIs like the merged table
+        """
+        original_dataframe = read_xlsx('sales.xlsx', 'Sales')
+
+        with tempfile.TemporaryDirectory() as save_directory:
+            first_half = os.path.join(save_directory, 'first_half.csv')
+            full = os.path.join(save_directory, 'full.csv')
+            original_dataframe.iloc[:9000].to_csv(first_half, index=False)
+            original_dataframe.to_csv(full, index=False)
+
+            aggregated = ETL('starschema')
+            aggregated.init_params(chunksize = 5000, **dict(star_arguments, dataframe_xlsx_path = first_half))
+            aggregated.transform_table(save_directory, verbose=False, build_aggregates=True)
+            aggregated.init_params(chunksize = 5000, **dict(star_arguments, dataframe_xlsx_path = full))
+            aggregated.transform_table(save_directory, verbose=False, incremental=True)
+            aggregates = aggregated.get_aggregates()
+
+            # the cubes of a source with duplicated rows only count the saved rows
+            duplicated = os.path.join(save_directory, 'duplicated.xlsx')
+            pd.concat([original_dataframe.iloc[:5], original_dataframe.iloc[:2000]]).to_excel(duplicated, sheet_name='Sales', index=False)
+            for schema in ['starschema', 'widetable']:
+                for source_arguments in [{}, {'chunksize': 1000}, {'engine': 'arrow'}]:
+                    duplicated_schema = ETL(schema)
+                    arguments = dict(star_arguments, dataframe_xlsx_path = duplicated)
+                    if schema == 'widetable':
+                        arguments = {key:arguments[key] for key in ['dataframe_xlsx_path', 'xlsx_sheet_name']}
+                    duplicated_schema.init_params(**source_arguments, **arguments)
+                    duplicated_schema.transform_table(save_directory, verbose=False, build_aggregates=True)
+                    result = compute_kpis(duplicated_schema.get_aggregates())
+                    for kpi, expected_result in compute_kpis(duplicated_schema.get_merged_table(verbose=False)).items():
+                        pd.testing.assert_frame_equal(result[kpi], expected_result)
+
+        self.assertIsNotNone(aggregates)
+        pd.testing.assert_frame_equal(get_revenues_sum(aggregates, variable = 'month'),
+                                      get_revenues_sum(merged_result_output, variable = 'month'))
+        pd.testing.assert_frame_equal(get_revenues_sum(aggregates, variable = 'customer segment'),
+                                      get_revenues_sum(merged_result_output, variable = 'customer segment'))
+        pd.testing.assert_frame_equal(orders_per_month(aggregates, aggregate_function='sum'),
+                                      orders_per_month(merged_result_output, aggregate_function='sum'))
+        pd.testing.assert_frame_equal(orders_per_month(aggregates, aggregate_function='average order volume'),
+                                      orders_per_month(merged_result_output, aggregate_function='average order volume'))
+        for sort_column in ['lifetimeordervolume', 'LIFETIMEREVENUE']:
+            pd.testing.assert_frame_equal(get_top_n_customers(aggregates, sort_column = sort_column),
+                                          get_top_n_customers(merged_result_output, sort_column = sort_column))
+
+    def test_streaming_kpis(self):
+        """
+        method to check that the KPI methods consuming chunks, also when
+        partial aggregates of separate chunks are merged, match the
+        in-memory results
+        """
+        chunks = lambda: iter(np.array_split(merged_result_output, 7))
+
+        pd.testing.assert_frame_equal(get_revenues_sum(chunks(), variable = 'month'),
+                                      get_revenues_sum(merged_result_output, variable = 'month'))
+        pd.testing.assert_frame_equal(get_revenues_sum(chunks(), variable = 'customer segment'),
+                                      get_revenues_sum(merged_result_output, variable = 'customer segment'))
+        for variable in ['day', 'week', 'Quarter']:
+            pd.testing.assert_frame_equal(get_revenues_sum(chunks(), variable = variable),
+                                          get_revenues_sum(merged_result_output, variable = variable))
+        with self.assertRaisesRegex(Exception, 'Invalid column'):
+            get_revenues_sum(chunks(), variable = 'year')
+        pd.testing.assert_frame_equal(orders_per_month(chunks(), aggregate_function='average order volume'),
+                                      orders_per_month(merged_result_output, aggregate_function='average order volume'))
+        pd.testing.assert_frame_equal(get_top_n_customers(star.iter_merged_table(verbose=False, chunksize=4000), sort_column = 'LIFETIMEREVENUE'),
+                                      get_top_n_customers(merged_result_output, sort_column = 'LIFETIMEREVENUE'))
+
+        result = compute_kpis(chunks())
+        expected = compute_kpis(merged_result_output)
+        for kpi, expected_result in expected.items():
+            pd.testing.assert_frame_equal(result[kpi], expected_result)
+
+        partials = [aggregate_chunks(iter(np.array_split(part, 3))) for part in np.array_split(merged_result_output, 2)]
+        result = compute_kpis(partials[0].merge(partials[1]))
+        for kpi, expected_result in expected.items():
+            pd.testing.assert_frame_equal(result[kpi], expected_result)
+
+        self.assertEqual(aggregate_chunks(chunks(), ['monthly']).cubes, ['monthly'])
+        with self.assertRaises(ValueError):
+            aggregate_chunks(chunks(), ['weekly'])
+
+    def test_sql_engine(self):
+        """
+        method to check that the KPIs queried with SQL from the saved tables,
+        also when partitioned and joined through surrogate keys, match the
+        in-memory results
+        """
+        expected = compute_kpis(merged_result_output)
+
+        with tempfile.TemporaryDirectory() as save_directory:
+            partitioned = ETL('starschema')
+            partitioned.init_params(**star_arguments)
+            partitioned.transform_table(save_directory, verbose=False, partition_fact_by='ORDERDATE', surrogate_keys=True)
+
+            for etl in [star, partitioned]:
+                with etl.get_sql_engine(backend='sqlite') as engine:
+                    result = compute_kpis(engine)
+                    for kpi, expected_result in expected.items():
+                        pd.testing.assert_frame_equal(result[kpi], expected_result)
+
+                    pd.testing.assert_frame_equal(get_top_n_customers(engine, n=3, sort_column = 'life time order volume'),
+                                                  get_top_n_customers(merged_result_output, n=3, sort_column = 'life time order volume'))
+                    count = engine.query('SELECT COUNT(*) AS ROWS FROM fact_SALES')
+                    self.assertEqual(count['ROWS'][0], len(merged_result_output))
+
+            with self.assertRaises(ValueError):
+                partitioned.get_sql_engine(backend='postgres')
+
+class Test_calculate_star_kpi_Functions(unittest.TestCase):
+    """
+    A class which is used to test that the join-free KPI functions match the
+    KPI functions on the merged table.
+    ...
+
+    Methods
+    -------
+    test_get_revenues_sum()
+    test_orders_per_month()
+    test_top_10_customers()
+    test_lazy_dimension_tables()
+    """
+
+    def setUp(self):
+        """ Load the fact and dimension tables."""
+
+        self.fact_table, self.dimension_tables = star.get_transformed_tables(verbose=False)
+
+    def test_get_revenues_sum(self):
+        """
+        method to check get_revenues_sum method of the calculate_star_kpi module
+        """
+        for variable in ['month', 'customer segment']:
+            pd.testing.assert_frame_equal(calculate_star_kpi.get_revenues_sum(self.fact_table, self.dimension_tables, variable),
+                                          get_revenues_sum(merged_result_output, variable))
+
+    def test_orders_per_month(self):
+        """
+        method to check orders_per_month method of the calculate_star_kpi module
+        """
+        for aggregate_function in ['sum', 'average order volume']:
+            pd.testing.assert_frame_equal(calculate_star_kpi.orders_per_month(self.fact_table, self.dimension_tables, aggregate_function),
+                                          orders_per_month(merged_result_output, aggregate_function))
+
+    def test_top_10_customers(self):
+        """
+        method to check get_top_n_customers method of the calculate_star_kpi module
+        """
+        for sort_column in ['lifetimeordervolume', 'LIFETIMEREVENUE']:
+            pd.testing.assert_frame_equal(calculate_star_kpi.get_top_n_customers(self.fact_table, self.dimension_tables, sort_column=sort_column),
+                                          get_top_n_customers(merged_result_output, sort_column=sort_column))
+
+    def test_lazy_dimension_tables(self):
+        """
+        method to check that the KPI methods of the calculate_star_kpi module
+        give the same results on the memory-mapped dimension tables
+        """
+        lazy_dimension_tables = star.get_lazy_dimension_tables()
+        self.assertListEqual(sorted(lazy_dimension_tables.keys()), sorted(self.dimension_tables.keys()))
+
+        for name, dimension in lazy_dimension_tables.items():
+            pd.testing.assert_frame_equal(dimension.to_pandas(), 
+                                          self.dimension_tables[name].reset_index(drop=True))
+
+        for variable in ['month', 'customer segment']:
+            pd.testing.assert_frame_equal(calculate_star_kpi.get_revenues_sum(self.fact_table, lazy_dimension_tables, variable),
+                                          calculate_star_kpi.get_revenues_sum(self.fact_table, self.dimension_tables, variable))
+        for sort_column in ['lifetimeordervolume', 'LIFETIMEREVENUE']:
+            pd.testing.assert_frame_equal(calculate_star_kpi.get_top_n_customers(self.fact_table, lazy_dimension_tables, sort_column=sort_column),
+                                          calculate_star_kpi.get_top_n_customers(self.fact_table, self.dimension_tables, sort_column=sort_column))
+
+class Test_utils_Functions(unittest.TestCase):
+    """
+    A class which is used to test the functions of the utils module.
+    ...
+
+    Methods
+    -------
+    test_read_xlsx_cache()
+    test_period_buckets()
+    """
+
+    def test_read_xlsx_cache(self):
+        """
+        method to check that read_xlsx caches the parsed sheet, detects a 
+        changed source file and evicts the least recently used copies
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'source.xlsx')
+            cache_directory = os.path.join(directory, 'cache')
+            first = pd.DataFrame({'ORDER ID': [1, 2], 'ORDER DATE': pd.to_datetime(['2017-01-01', '2017-02-01'])})
+            second = pd.DataFrame({'ORDER ID': [3], 'ORDER DATE': pd.to_datetime(['2017-03-01'])})
+
+            first.to_excel(path, sheet_name='Sales', index=False)
+            pd.testing.assert_frame_equal(read_xlsx(path, 'Sales', cache_directory), first)
+            pd.testing.assert_frame_equal(read_xlsx(path, 'Sales', cache_directory), first)
+            self.assertEqual(len(os.listdir(cache_directory)), 1)
+
+            second.to_excel(path, sheet_name='Sales', index=False)
+            pd.testing.assert_frame_equal(read_xlsx(path, 'Sales', cache_directory), second)
+            self.assertEqual(len(os.listdir(cache_directory)), 2)
+
+            max_bytes = utils.xlsx_cache_max_bytes
+            try:
+                utils.xlsx_cache_max_bytes = 0
+                first.to_excel(path, sheet_name='Sales', index=False)
+                read_xlsx(path, 'Sales', cache_directory)
+            finally:
+                utils.xlsx_cache_max_bytes = max_bytes
+            self.assertEqual(len(os.listdir(cache_directory)), 0)
+
+    def test_period_buckets(self):
+        """
+        method to check that the period buckets match resample, keep the
+        periods of different years apart and that the KPIs accept them
+        """
+        dates = pd.to_datetime(['2016-12-31', '2017-01-02', '2017-01-01', '2018-01-15', pd.NaT])
+        df = pd.DataFrame({'ORDERDATE': dates, 'REVENUE': [1.0, 2.0, 4.0, 8.0, 16.0]})
+
+        for granularity, rule in [('day', 'D'), ('week', 'W-SUN'), ('month', 'MS'), ('quarter', 'QS')]:
+            result = utils.aggregate_by_period(df, 'ORDERDATE', ['REVENUE'], 'COUNT', granularity)
+            expected = df.resample(rule, on='ORDERDATE')['REVENUE'].agg(['sum', 'size'])
+            self.assertListEqual(list(result['REVENUE']), list(expected['sum']))
+            self.assertListEqual(list(result['COUNT']), list(expected['size']))
+
+        self.assertListEqual(list(get_revenues_sum(df, variable = 'month')['MONTH'].iloc[[0, 1, -1]]), 
+                             ['Dec 2016', 'Jan 2017', 'Jan 2018'])
+        self.assertListEqual(list(get_revenues_sum(df, variable = 'quarter')['QUARTER'].iloc[[0, 1, -1]]), 
+                             ['Q4 2016', 'Q1 2017', 'Q1 2018'])
+        self.assertListEqual(list(get_revenues_sum(df, variable = 'week')['WEEK'].iloc[:2]), 
+                             ['2016-12-26', '2017-01-02'])
+
+class Test_synthetic_sales_Functions(unittest.TestCase):
+    """
+    A class which is used to test the synthetic sales generator of the benchmarks.
+    ...
+
+    Methods
+    -------
+    test_generate_sales()
+    """
+
+    def test_generate_sales(self):
+        """
+        method to check that the generator is reproducible, keeps the columns 
+        and the keys of the Sales sheet and that its tables can be transformed
+        """
+        original_dataframe = read_xlsx('sales.xlsx', 'Sales')
+        result = generate_sales(5000, seed = 1)
+
+        pd.testing.assert_frame_equal(result, generate_sales(5000, seed = 1))
+        self.assertFalse(result.equals(generate_sales(5000, seed = 2)))
+        self.assertListEqual(list(result.columns), list(original_dataframe.columns))
+        self.assertListEqual(list(result.dtypes), list(original_dataframe.dtypes))
+
+        for key, attributes in [('Product ID', ['Product name', 'Unit Price', 'Product Category', 'Box Size']),
+                                ('Order ID', ['Order Date']),
+                                ('Customer Id', ['Customer Name', 'Customer Segment'])]:
+            self.assertTrue((result.groupby(key)[attributes].nunique() == 1).all().all())
+
+        with tempfile.TemporaryDirectory() as save_directory:
+            path = write_sales(os.path.join(save_directory, 'sales.csv'), 5000, seed = 1)
+            synthetic = ETL('starschema')
+            synthetic.init_params(engine = 'arrow', **dict(star_arguments, dataframe_xlsx_path = path))
+            synthetic.transform_table(save_directory, verbose=False)
+            merged = synthetic.get_merged_table(verbose=False)
+
+        self.assertEqual(len(merged), len(result.drop_duplicates()))
+        self.assertAlmostEqual(merged['REVENUE'].sum(), result['Revenue'].sum(), places=4)
+
 if __name__ == "__main__":
 
+    star_arguments = {'dataframe_xlsx_path': 'sales.xlsx',
+                      'xlsx_sheet_name': 'Sales',
+                      'dimension_features_without_dimension_name_substring': {'PRODUCT': ['UNITPRICE'],
+                                                                              'CUSTOMER': [],
+                                                                              'ORDER':[]},
+                      'fact_table_columns_containing_dimension_name': ['ORDERPRIORITY', 'ORDERQUANTITY']}
+
     star = ETL('starschema')
-    star.init_params(dataframe_xlsx_path = 'sales.xlsx',
-                     xlsx_sheet_name = 'Sales',
-                     dimension_features_without_dimension_name_substring = {'PRODUCT': ['UNITPRICE'],
-                                                           'CUSTOMER': [],
-                                                           'ORDER':[]},
-                     fact_table_columns_containing_dimension_name = ['ORDERPRIORITY', 'ORDERQUANTITY'])
+    star.init_params(**star_arguments)
 
     star.transform_table(verbose=False)
     merged_result_output = star.get_merged_table(verbose=False).sort_values(['PRODUCTID', 'ORDERID']).reset_index(drop=True)